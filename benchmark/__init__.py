@@ -0,0 +1,23 @@
+"""Database benchmarks.
+
+These are stand-alone programs which run against seeded synthetic catalogs.
+They are not part of the test suite. Run a benchmark from the project
+directory, for example:
+    python -m benchmark.match_movies --movies 100000
+
+The suite module times the whole database API and writes JSON results which
+can be compared between commits. The migration module times the update of a
+generated v0 database.
+"""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,145 @@
+"""Benchmark of the match_movies query plans.
+
+This compares the original plan, which intersected one full select per
+criterion, with the current single statement plan, which uses a WHERE
+conjunction and semi-joins against the link tables. Both plans are run for 1,
+3, and 8 criteria and must select the same movies.
+
+    python -m benchmark.match_movies --movies 100000
+"""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import statistics
+import time
+from collections.abc import Callable
+
+from sqlalchemy import select, intersect, CompoundSelect, Select
+
+from benchmark import synthetic
+from database import schema, tables
+from globalconstants import MovieBag, MovieInteger
+
+REPEATS = 5
+CRITERIA = {
+    1: MovieBag(title="river"),
+    3: MovieBag(
+        title="river",
+        year=MovieInteger("1950-1990"),
+        movie_tags={"drama"},
+    ),
+    8: MovieBag(
+        title="e",
+        year=MovieInteger("1930-2010"),
+        duration=MovieInteger("100-180"),
+        synopsis="night",
+        notes="r",
+        stars={"an"},
+        directors={"a"},
+        movie_tags={"r"},
+    ),
+}
+
+
+def intersect_statement(match: MovieBag) -> CompoundSelect:
+    """Returns the original INTERSECT plan for the match criteria.
+
+    Args:
+        match: See tables.match_movies.
+    """
+    statements = []
+    for column, criteria in match.items():
+        match column:
+            case "notes" | "title" | "synopsis":
+                attribute = getattr(schema.Movie, column)
+                statements.append(
+                    select(schema.Movie.id).where(attribute.like(f"%{criteria}%"))
+                )
+            case "year" | "duration":
+                attribute = getattr(schema.Movie, column)
+                statements.append(
+                    select(schema.Movie.id).where(attribute.in_(list(criteria)))
+                )
+            case "stars" | "directors":
+                for name in criteria:
+                    statements.append(
+                        select(schema.Movie.id)
+                        .join(getattr(schema.Movie, column))
+                        .where(schema.Person.name.like(f"%{name}%"))
+                    )
+            case "movie_tags":
+                for movie_tag in criteria:
+                    statements.append(
+                        select(schema.Movie.id)
+                        .join(schema.Movie.tags)
+                        .where(schema.Tag.text.like(f"%{movie_tag}%"))
+                    )
+    return intersect(*statements)
+
+
+def single_statement(match: MovieBag) -> Select:
+    """Returns the current single statement plan for the match criteria.
+
+    Args:
+        match: See tables.match_movies.
+    """
+    statement, parameters = tables._match_movies_statement(match=match)
+    return select(schema.Movie.id).where(statement.whereclause).params(parameters)
+
+
+def time_statement(statement: Select | CompoundSelect) -> tuple[float, set[int]]:
+    """Returns the median run time in milliseconds and the selected ids.
+
+    Args:
+        statement: A statement which selects movie ids.
+    """
+    timings = []
+    with tables.session_factory() as session:
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            ids = set(session.scalars(statement).all())
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), ids
+
+
+def main(argv: list[str] = None):
+    """Runs the benchmark and prints a table of results.
+
+    Args:
+        argv: Command line arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    synthetic.create_catalog(args.movies)
+    print(f"Created {args.movies} movies in {time.perf_counter() - start:.1f}s")
+
+    plans: dict[str, Callable] = dict(
+        intersect=intersect_statement, single=single_statement
+    )
+    print(f"{'criteria':>8} {'plan':>10} {'median ms':>10} {'rows':>7}")
+    for count, match in CRITERIA.items():
+        results = {}
+        for name, plan in plans.items():
+            elapsed, ids = time_statement(plan(match))
+            results[name] = ids
+            print(f"{count:>8} {name:>10} {elapsed:>10.2f} {len(ids):>7}")
+        if results["intersect"] != results["single"]:
+            raise AssertionError(f"The plans disagree for {count} criteria.")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
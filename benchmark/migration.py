@@ -0,0 +1,149 @@
+"""Benchmark of the migration of a v0 database.
+
+This generates a v0 database of synthetic movies and times its update to the
+current database with update.update_old_database and the bulk functions of
+database.tables, as environment._update_database does. The peak resident
+memory of the process is reported so the streaming of the old rows can be
+checked.
+
+    python -m benchmark.migration --movies 500000
+"""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import resource
+import sqlite3
+import tempfile
+import time
+from itertools import batched
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmark import synthetic
+from database import schema, tables, update
+
+MOVIES = 500_000
+INSERT_BATCH_SIZE = 10_000
+V0_TABLES = (
+    "CREATE TABLE tags (id INTEGER PRIMARY KEY, tag VARCHAR)",
+    "CREATE TABLE movies (id INTEGER PRIMARY KEY, title VARCHAR, director VARCHAR, "
+    "minutes INTEGER, year INTEGER, notes VARCHAR)",
+    "CREATE TABLE movie_tag (movies_id INTEGER, tag_id INTEGER)",
+)
+
+
+def create_v0_database(count: int, path: Path, *, seed: int = synthetic.SEED):
+    """Creates a v0 database of synthetic movies.
+
+    Args:
+        count: The number of movies.
+        path: The database file.
+        seed: The random seed.
+    """
+    connection = sqlite3.connect(path)
+    for statement in V0_TABLES:
+        connection.execute(statement)
+    tag_ids = {text: ix for ix, text in enumerate(sorted(synthetic.tag_texts()), 1)}
+    connection.executemany(
+        "INSERT INTO tags (id, tag) VALUES (?, ?)",
+        ((tag_id, text) for text, tag_id in tag_ids.items()),
+    )
+    movie_bags = enumerate(synthetic.movie_bags(count, seed=seed), 1)
+    for chunk in batched(movie_bags, INSERT_BATCH_SIZE):
+        connection.executemany(
+            "INSERT INTO movies VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    movie_id,
+                    movie_bag["title"],
+                    ", ".join(sorted(movie_bag["directors"])),
+                    int(movie_bag["duration"]),
+                    int(movie_bag["year"]),
+                    movie_bag["synopsis"],
+                )
+                for movie_id, movie_bag in chunk
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO movie_tag VALUES (?, ?)",
+            (
+                (movie_id, tag_ids[text])
+                for movie_id, movie_bag in chunk
+                for text in movie_bag["movie_tags"]
+            ),
+        )
+        connection.commit()
+    connection.close()
+
+
+def migrate(old_database_fn: Path, new_database_fn: Path) -> int:
+    """Updates a v0 database to a new database.
+
+    Args:
+        old_database_fn:
+        new_database_fn:
+
+    Returns:
+        The number of rejected movies.
+    """
+    engine = create_engine(f"sqlite+pysqlite:///{new_database_fn}")
+    schema.Base.metadata.create_all(engine)
+    tables.session_factory = sessionmaker(engine)
+    movie_bags, tag_texts = update.update_old_database("DBv0", old_database_fn)
+    tables.add_tags(tag_texts=tag_texts)
+    rejects = tables.add_movies(movie_bags=movie_bags)
+    engine.dispose()
+    return len(rejects)
+
+
+def main(argv: list[str] = None):
+    """Runs the benchmark and prints the results.
+
+    Args:
+        argv: Command line arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=MOVIES)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        old_database_fn = Path(directory) / "movie_database_DBv0.sqlite3"
+        start = time.perf_counter()
+        create_v0_database(args.movies, old_database_fn)
+        print(
+            f"Created a v0 database of {args.movies} movies in "
+            f"{time.perf_counter() - start:.1f}s"
+        )
+        rss_before = _peak_rss_mb()
+
+        start = time.perf_counter()
+        rejects = migrate(old_database_fn, Path(directory) / "new.sqlite3")
+        elapsed = time.perf_counter() - start
+
+    print(
+        f"Migrated {args.movies} movies in {elapsed:.1f}s, "
+        f"{args.movies / elapsed:.0f} movies/s, {rejects} rejected"
+    )
+    print(f"Peak RSS {_peak_rss_mb():.0f} MB, {rss_before:.0f} MB before migrating")
+
+
+def _peak_rss_mb() -> float:
+    """Returns the peak resident memory of the process in megabytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
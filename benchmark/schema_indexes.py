@@ -0,0 +1,88 @@
+"""Benchmark of the DBv2 secondary indexes.
+
+This times the lookups which the DBv2 indexes serve, from a person or a tag to
+their movies and by year or duration range. Each lookup is run with the
+indexes and again after they have been dropped, and must select the same
+movies both times.
+
+    python -m benchmark.schema_indexes --movies 100000
+"""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import time
+
+from sqlalchemy import Index
+
+from benchmark import synthetic
+from benchmark.match_movies import single_statement, time_statement
+from database import schema
+from globalconstants import MovieBag, MovieInteger
+
+LOOKUPS = {
+    "star": MovieBag(stars={"Walsh 12"}),
+    "director": MovieBag(directors={"Sato 7"}),
+    "tag": MovieBag(movie_tags={"noir"}),
+    "year": MovieBag(year=MovieInteger("1950-1951")),
+    "duration": MovieBag(duration=MovieInteger("95")),
+}
+
+
+def secondary_indexes() -> list[Index]:
+    """Returns the secondary indexes of the schema."""
+    return [
+        index
+        for table in schema.Base.metadata.tables.values()
+        for index in table.indexes
+    ]
+
+
+def main(argv: list[str] = None):
+    """Runs the benchmark and prints a table of results.
+
+    Args:
+        argv: Command line arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    engine = synthetic.create_catalog(args.movies)
+    print(f"Created {args.movies} movies in {time.perf_counter() - start:.1f}s")
+
+    indexed = {
+        name: time_statement(single_statement(match)) for name, match in LOOKUPS.items()
+    }
+    for index in secondary_indexes():
+        index.drop(engine)
+    unindexed = {
+        name: time_statement(single_statement(match)) for name, match in LOOKUPS.items()
+    }
+
+    print(
+        f"{'lookup':>10} {'indexed ms':>11} {'dropped ms':>11} {'speedup':>8} {'rows':>7}"
+    )
+    for name in LOOKUPS:
+        (with_ms, with_ids), (without_ms, without_ids) = indexed[name], unindexed[name]
+        if with_ids != without_ids:
+            raise AssertionError(f"The {name} lookups disagree.")
+        print(
+            f"{name:>10} {with_ms:>11.2f} {without_ms:>11.2f} "
+            f"{without_ms / with_ms:>7.1f}x {len(with_ids):>7}"
+        )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark of the in-memory catalog snapshot.
+
+This compares the single statement SQL plan of match_movies with the
+vectorized masks of the catalog snapshot. Both must select the same movies.
+The snapshot requires NumPy.
+
+    python -m benchmark.snapshot --movies 100000
+"""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import statistics
+import time
+
+from benchmark import synthetic
+from benchmark.match_movies import CRITERIA, REPEATS, single_statement, time_statement
+from database import snapshot, tables
+from globalconstants import MovieBag, MovieInteger
+
+LOOKUPS = {
+    "year": MovieBag(year=MovieInteger("1950-1959")),
+    "tag": MovieBag(movie_tags={"noir"}),
+    "star": MovieBag(stars={"Walsh 12"}),
+    **{f"{count} criteria": match for count, match in CRITERIA.items()},
+}
+
+
+def time_snapshot(
+    catalog: "snapshot.CatalogSnapshot", match: MovieBag
+) -> tuple[float, set[int]]:
+    """Returns the median run time in milliseconds and the selected ids.
+
+    Args:
+        catalog:
+        match: See tables.match_movies.
+    """
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        ids = catalog.match_ids(match)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), set(ids.tolist())
+
+
+def main(argv: list[str] = None):
+    """Runs the benchmark and prints a table of results.
+
+    Args:
+        argv: Command line arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=100_000)
+    args = parser.parse_args(argv)
+    if not snapshot.AVAILABLE:
+        parser.exit(1, f"{tables.SNAPSHOT_UNAVAILABLE_MSG}\n")
+
+    start = time.perf_counter()
+    synthetic.create_catalog(args.movies)
+    print(f"Created {args.movies} movies in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    catalog = snapshot.CatalogSnapshot()
+    with tables.session_factory() as session:
+        catalog.load(session)
+    print(f"Built the snapshot in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'lookup':>12} {'sql ms':>9} {'snapshot ms':>12} {'rows':>7}")
+    for name, match in LOOKUPS.items():
+        sql_ms, sql_ids = time_statement(single_statement(match))
+        snapshot_ms, snapshot_ids = time_snapshot(catalog, match)
+        if sql_ids != snapshot_ids:
+            raise AssertionError(f"The {name} results disagree.")
+        print(f"{name:>12} {sql_ms:>9.2f} {snapshot_ms:>12.2f} {len(sql_ids):>7}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
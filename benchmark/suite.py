@@ -0,0 +1,380 @@
+"""Benchmark suite of the database API.
+
+This times the public functions of database.tables against seeded synthetic
+catalogs and writes the results as JSON so runs can be compared between
+commits. Each operation is timed over several repeats and the statements
+executed per call are counted with the statement timing of tables.stats. The
+match cache is disabled so every match_movies call is a search.
+
+    python -m benchmark.suite --movies 10000 100000 --output results.json
+    python -m benchmark.suite --compare baseline.json results.json
+"""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import datetime
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
+from pathlib import Path
+
+import sqlalchemy
+
+from benchmark import synthetic
+from database import instrumentation, tables
+from globalconstants import MovieBag, MovieInteger
+
+FORMAT_VERSION = 1
+SIZES = (10_000, 100_000, 1_000_000)
+REPEATS = 5
+BULK_SIZE = 1_000
+ORPHANS = 100
+# A result slower than the baseline by more than this ratio is a regression.
+REGRESSION_RATIO = 1.2
+MATCH_CRITERIA = {
+    "title": MovieBag(title="river"),
+    "year": MovieBag(year=MovieInteger("1950-1959")),
+    "duration": MovieBag(duration=MovieInteger("90-95")),
+    "star": MovieBag(stars={"walsh"}),
+    "director": MovieBag(directors={"sato"}),
+    "tag": MovieBag(movie_tags={"noir"}),
+    "synopsis": MovieBag(synopsis="silent garden"),
+    "3 criteria": MovieBag(
+        title="river", year=MovieInteger("1950-1990"), movie_tags={"drama"}
+    ),
+    "8 criteria": MovieBag(
+        title="e",
+        year=MovieInteger("1930-2010"),
+        duration=MovieInteger("100-180"),
+        synopsis="night",
+        notes="r",
+        stars={"an"},
+        directors={"a"},
+        movie_tags={"r"},
+    ),
+}
+
+
+def run(count: int, *, repeats: int = REPEATS) -> list[dict]:
+    """Creates a catalog and times every operation against it.
+
+    The catalog is a temporary file database so the timings include the
+    cost of committing to disk.
+
+    Args:
+        count: The number of movies in the catalog.
+        repeats: The number of timed calls of each operation.
+
+    Returns:
+        A result for each operation. See time_calls.
+    """
+    hold_session_factory = tables.session_factory
+    hold_match_cache_size = tables.MATCH_CACHE_SIZE
+    tables.MATCH_CACHE_SIZE = 0
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        engine = synthetic.create_catalog(
+            count, url=f"sqlite+pysqlite:///{Path(directory) / 'catalog.sqlite3'}"
+        )
+        results.append(
+            _result(count, "create_catalog", "", [time.perf_counter() - start])
+        )
+        tables.enable_stats()
+        try:
+            results.extend(_run_operations(count, repeats=repeats))
+        finally:
+            tables.disable_stats()
+            tables.MATCH_CACHE_SIZE = hold_match_cache_size
+            tables.session_factory = hold_session_factory
+            engine.dispose()
+    return results
+
+
+def time_calls(
+    count: int, operation: str, case: str, calls: Iterable[Callable[[], object]]
+) -> dict:
+    """Times a sequence of calls of one operation.
+
+    Args:
+        count: The number of movies in the catalog.
+        operation: The name of the timed tables function.
+        case: The variant of the operation, for example the match criteria.
+        calls: The calls to be timed. Any preparation for a call is done by
+            the iterator and is not timed.
+
+    Returns:
+        See _result.
+    """
+    instrumentation.reset()
+    timings = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    summary = instrumentation.summary().get(operation, {})
+    statements = summary.get("statements", 0) / max(1, summary.get("calls", 1))
+    return _result(count, operation, case, timings, statements=statements)
+
+
+def compare(baseline: dict, current: dict, *, ratio: float = REGRESSION_RATIO):
+    """Prints the change of each result and returns the regressions.
+
+    Args:
+        baseline: A results document written by main.
+        current: A results document written by main.
+        ratio: A median time more than this multiple of the baseline is a
+            regression. Any increase in the statements per call is also a
+            regression.
+
+    Returns:
+        The keys of the regressed results.
+    """
+    old = {_key(result): result for result in baseline["results"]}
+    regressions = []
+    print(
+        f"{'movies':>8} {'operation':>18} {'case':>12} "
+        f"{'old ms':>9} {'new ms':>9} {'change':>7}"
+    )
+    for result in current["results"]:
+        key = _key(result)
+        if key not in old:
+            continue
+        before, after = old[key], result
+        change = after["median_ms"] / before["median_ms"] if before["median_ms"] else 1
+        regressed = change > ratio or after["statements"] > before["statements"]
+        if regressed:
+            regressions.append(key)
+        print(
+            f"{key[0]:>8} {key[1]:>18} {key[2]:>12} {before['median_ms']:>9.2f} "
+            f"{after['median_ms']:>9.2f} {change:>6.2f}x{' !' if regressed else ''}"
+        )
+    return regressions
+
+
+def main(argv: list[str] = None) -> int:
+    """Runs the suite or compares two results documents.
+
+    Args:
+        argv: Command line arguments.
+
+    Returns:
+        The exit status. A comparison which finds a regression returns 1.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, nargs="+", default=SIZES[:1])
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--output", type=Path, default=Path("benchmark.json"))
+    parser.add_argument(
+        "--compare", type=Path, nargs=2, metavar=("BASELINE", "CURRENT")
+    )
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        baseline, current = (json.loads(path.read_text()) for path in args.compare)
+        return 1 if compare(baseline, current) else 0
+
+    results = []
+    print(
+        f"{'movies':>8} {'operation':>18} {'case':>12} {'median ms':>10} {'stmts':>6}"
+    )
+    for count in args.movies:
+        for result in run(count, repeats=args.repeats):
+            results.append(result)
+            print(
+                f"{count:>8} {result['operation']:>18} {result['case']:>12} "
+                f"{result['median_ms']:>10.2f} {result['statements']:>6.1f}"
+            )
+    document = dict(
+        format=FORMAT_VERSION,
+        created=datetime.datetime.now(datetime.UTC).isoformat(timespec="seconds"),
+        commit=_commit(),
+        python=platform.python_version(),
+        sqlalchemy=sqlalchemy.__version__,
+        sqlite=sqlite3.sqlite_version,
+        repeats=args.repeats,
+        results=results,
+    )
+    args.output.write_text(json.dumps(document, indent=2))
+    print(f"Wrote {args.output}")
+    return 0
+
+
+def _run_operations(count: int, *, repeats: int) -> list[dict]:
+    """Times each operation against the bound catalog.
+
+    Args:
+        count: The number of movies in the catalog.
+        repeats: The number of timed calls of each operation.
+    """
+    # New movies have a suffix so they cannot clash with the catalog's movies.
+    new_movies = [
+        MovieBag(movie_bag, title=f"{movie_bag['title']} new")
+        for movie_bag in synthetic.movie_bags(
+            repeats * (BULK_SIZE + 1), seed=synthetic.SEED + 1
+        )
+    ]
+    single, bulk = new_movies[:repeats], new_movies[repeats:]
+    victims, _ = tables.page_movies(page_size=repeats * 2)
+    edits, deletes = victims[:repeats], victims[repeats:]
+
+    results = [
+        time_calls(
+            count,
+            "add_movie",
+            "",
+            [partial(tables.add_movie, movie_bag=movie_bag) for movie_bag in single],
+        ),
+        time_calls(
+            count,
+            "add_movies",
+            f"{BULK_SIZE} movies",
+            [
+                partial(tables.add_movies, movie_bags=bulk[ix : ix + BULK_SIZE])
+                for ix in range(0, len(bulk), BULK_SIZE)
+            ],
+        ),
+    ]
+    for case, match in MATCH_CRITERIA.items():
+        results.append(
+            time_calls(
+                count,
+                "match_movies",
+                case,
+                [partial(tables.match_movies, match)] * repeats,
+            )
+        )
+    full_text = partial(
+        tables.match_movies,
+        MovieBag(title="riv", synopsis="silent"),
+        mode=tables.FULL_TEXT_SEARCH,
+    )
+    results.append(
+        time_calls(count, "match_movies", "full text", [full_text] * repeats)
+    )
+    results.append(
+        time_calls(count, "page_movies", "first page", [tables.page_movies] * repeats)
+    )
+    replacement_fields = MovieBag(
+        notes="edited", stars={"Bench Mark"}, movie_tags={"drama"}
+    )
+    results.append(
+        time_calls(
+            count,
+            "edit_movie",
+            "",
+            [
+                partial(
+                    tables.edit_movie,
+                    old_movie_bag=movie_bag,
+                    replacement_fields=replacement_fields,
+                )
+                for movie_bag in edits
+            ],
+        )
+    )
+    results.append(
+        time_calls(
+            count,
+            "delete_movie",
+            "",
+            [
+                partial(tables.delete_movie, movie_bag=movie_bag)
+                for movie_bag in deletes
+            ],
+        )
+    )
+    results.append(
+        time_calls(
+            count,
+            "delete_all_orphans",
+            f"{ORPHANS} orphans",
+            _orphaned(repeats),
+        )
+    )
+    return results
+
+
+def _orphaned(repeats: int) -> Iterator[Callable[[], None]]:
+    """Yields calls of delete_all_orphans each preceded by adding ORPHANS
+    people who are in no movie.
+
+    Args:
+        repeats:
+    """
+    for repeat in range(repeats):
+        with tables.session_factory() as session:
+            tables._getadd_person_ids(
+                session, names={f"Orphan {repeat} {ix}" for ix in range(ORPHANS)}
+            )
+            session.commit()
+        yield tables.delete_all_orphans
+
+
+def _result(
+    count: int,
+    operation: str,
+    case: str,
+    timings: list[float],
+    *,
+    statements: float = 0.0,
+) -> dict:
+    """Returns the summary of an operation's timings.
+
+    Args:
+        count: The number of movies in the catalog.
+        operation:
+        case:
+        timings: The duration of each call in seconds.
+        statements: The mean number of SQL statements per call.
+    """
+    return dict(
+        movies=count,
+        operation=operation,
+        case=case,
+        calls=len(timings),
+        median_ms=statistics.median(timings) * 1000,
+        min_ms=min(timings) * 1000,
+        max_ms=max(timings) * 1000,
+        statements=statements,
+    )
+
+
+def _key(result: dict) -> tuple[int, str, str]:
+    """Returns the key which identifies a result across runs."""
+    return result["movies"], result["operation"], result["case"]
+
+
+def _commit() -> str | None:
+    """Returns the current git commit or None if it is not known."""
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+"""Seeded synthetic movie catalogs."""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import random
+from collections.abc import Iterator
+from itertools import accumulate
+
+from sqlalchemy import create_engine, Engine
+from sqlalchemy.orm import sessionmaker
+
+from database import schema, tables
+from globalconstants import MovieBag, MovieInteger
+
+SEED = 42
+WORDS = (
+    "the night river city last love dark house star road king war moon "
+    "blue silent secret long island summer winter storm shadow fire glass "
+    "iron golden lost little big great wild empire ghost dream heart "
+    "garden queen sea mountain letter train paper crown bridge stranger"
+).split()
+FIRST_NAMES = (
+    "Ada Alan Anna Bette Carl Clara David Edith Frank Grace Henry Ida James "
+    "Joan Karl Lena Marco Nina Omar Paula Quinn Rosa Sam Tara Umar Vera Walt"
+).split()
+LAST_NAMES = (
+    "Abbott Baker Castillo Dunn Ellis Fischer Garcia Hughes Ivanov Jensen "
+    "Kowalski Lambert Moreau Novak Okafor Price Quinlan Rossi Sato Tanaka "
+    "Ueda Vargas Walsh Xu Young Zeller"
+).split()
+TAG_TEXTS = tuple(
+    "action adventure animation biography comedy crime documentary drama "
+    "family fantasy film-noir history horror music musical mystery romance "
+    "sci-fi sport thriller war western classic cult foreign silent short "
+    "festival favourite rewatch".split()
+)
+
+
+def tag_texts() -> set[str]:
+    """Returns the tag texts used by the synthetic movies."""
+    return set(TAG_TEXTS)
+
+
+def movie_bags(count: int, *, seed: int = SEED) -> Iterator[MovieBag]:
+    """Yields reproducible synthetic movie bags.
+
+    The people have a long tailed popularity so a few appear in many movies
+    and most appear in only one or two, as in a real catalog. The pool of
+    people grows with the number of movies.
+
+    Args:
+        count: The number of movies.
+        seed: The random seed.
+    """
+    rng = random.Random(seed)
+    people = [
+        f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {ix}"
+        for ix in range(max(1, count // 2))
+    ]
+    weights = list(accumulate(1 / (rank + 1) for rank in range(len(people))))
+
+    for ix in range(count):
+        words = rng.choices(WORDS, k=rng.randint(1, 4))
+        yield MovieBag(
+            title=f"{' '.join(words).title()} {ix}",
+            year=MovieInteger(rng.randint(1920, 2024)),
+            duration=MovieInteger(rng.randint(70, 200)),
+            directors=set(
+                rng.choices(people, cum_weights=weights, k=rng.randint(1, 2))
+            ),
+            stars=set(rng.choices(people, cum_weights=weights, k=rng.randint(3, 12))),
+            synopsis=" ".join(rng.choices(WORDS, k=rng.randint(20, 60))),
+            notes=" ".join(rng.choices(WORDS, k=rng.randint(0, 10))),
+            movie_tags=set(rng.sample(TAG_TEXTS, rng.randint(0, 4))),
+        )
+
+
+def create_catalog(count: int, *, url: str = "sqlite://", seed: int = SEED) -> Engine:
+    """Creates and loads a synthetic catalog.
+
+    The database.tables session factory is bound to the new catalog.
+
+    Args:
+        count: The number of movies.
+        url: The database URL. The default is an in-memory database.
+        seed: The random seed.
+
+    Returns:
+        The catalog's engine.
+    """
+    engine = create_engine(url)
+    schema.Base.metadata.create_all(engine)
+    tables.session_factory = sessionmaker(engine)
+    tables.add_tags(tag_texts=tag_texts())
+    tables.add_movies(movie_bags=movie_bags(count, seed=seed))
+    return engine
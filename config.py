@@ -102,6 +102,20 @@ class PersistentConfig:
     _tmdb_api_key: str = ""
     use_tmdb: bool = True
 
+    # SQLite performance profile. See database.environment.SQLITE_PROFILES.
+    sqlite_profile: str = "safe"
+
+    # Filter searches with the in-memory catalog snapshot. Requires NumPy.
+    use_catalog_snapshot: bool = False
+
+    # Time the database statements. See database.tables.stats.
+    collect_database_stats: bool = False
+
+    # Back up the database when the program starts. Each backup is a full copy
+    # of the database, so this is opt-in.
+    # See database.environment.backup_database.
+    backup_on_start: bool = False
+
     @property
     def tmdb_api_key(self):
         """Return the tmdb_api_key but raise exceptions for missing key and user suppressed access."""
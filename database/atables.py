@@ -0,0 +1,353 @@
+"""Asynchronous database table functions.
+
+This module provides the operations of the tables module as coroutines over
+an aiosqlite engine. Each aiosqlite connection runs its queries in its own
+thread, so a long search or a bulk import can be awaited alongside the user
+interface and TMDB I/O without blocking the event loop.
+
+The statement builders and the session level helpers of the tables module are
+shared. Statements are awaited directly and the ORM units of work, with their
+error handling, run unchanged through AsyncSession.run_sync. Writes invalidate
+the caches and the catalog snapshot of the tables module.
+
+This module is optional. It requires aiosqlite and greenlet, and AVAILABLE is
+False if either is not installed.
+"""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from collections.abc import AsyncIterator, Iterable
+from importlib.util import find_spec
+from itertools import batched
+
+from sqlalchemy import select, Select
+from sqlalchemy.exc import NoResultFound, IntegrityError
+from sqlalchemy.orm import Session
+
+from database import schema, tables
+from database.tables import (
+    ADD_MOVIES_CHUNK_SIZE,
+    SUBSTRING_SEARCH,
+    YIELD_PER_BATCH_SIZE,
+    PAGE_SIZE,
+)
+from globalconstants import *
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+except ImportError:  # pragma nocover
+    AsyncSession = async_sessionmaker = None
+
+AVAILABLE = async_sessionmaker is not None and all(
+    find_spec(name) for name in ("aiosqlite", "greenlet")
+)
+
+session_factory: "async_sessionmaker[AsyncSession] | None" = None
+
+
+async def select_movie(*, movie_bag: MovieBag) -> MovieBag:
+    """Selects and returns a single movie.
+
+    Args:
+        movie_bag: See tables.select_movie.
+
+    Returns:
+        A movie bag populated with every field in the database.
+
+    Raises and logs:
+        See tables.select_movie.
+    """
+    async with session_factory() as session:
+        try:
+            return await session.run_sync(_select_movie_bag, movie_bag=movie_bag)
+
+        except NoResultFound as exc:
+            tables._note_movie_not_found(
+                exc, title=movie_bag["title"], year=movie_bag["year"]
+            )
+            raise
+
+
+async def select_all_movies() -> list[MovieBag]:
+    """Selects and returns all movies."""
+    async with session_factory() as session:
+        movies = await session.run_sync(tables._select_all_movies)
+    return [tables._convert_to_movie_bag(movie) for movie in movies]
+
+
+async def match_movies(
+    match: MovieBag, *, mode: str = SUBSTRING_SEARCH
+) -> list[MovieBag]:
+    """Selects and returns the intersection of matching movies.
+
+    Unlike tables.match_movies the results are neither cached nor filtered by
+    the catalog snapshot.
+
+    Args:
+        match: See tables.match_movies.
+        mode: See tables.match_movies.
+
+    Returns:
+        The intersection of the records selected by each field's search criteria.
+    """
+    match_statement = tables._match_movies_statement(match=match, mode=mode)
+    if match_statement is None:
+        return []
+    statement, parameters = match_statement
+    async with session_factory() as session:
+        movies = (await session.scalars(statement, parameters)).all()
+    return [tables._convert_to_movie_bag(movie) for movie in movies]
+
+
+async def iter_all_movies(
+    *, batch_size: int = YIELD_PER_BATCH_SIZE
+) -> AsyncIterator[MovieBag]:
+    """Yields all movies.
+
+    Args:
+        batch_size: See tables.iter_all_movies.
+    """
+    statement = select(schema.Movie).options(*tables.MOVIE_BAG_LOADER_OPTIONS)
+    async for movie_bag in _iter_movie_bags(statement, batch_size=batch_size):
+        yield movie_bag
+
+
+async def iter_match_movies(
+    match: MovieBag,
+    *,
+    mode: str = SUBSTRING_SEARCH,
+    batch_size: int = YIELD_PER_BATCH_SIZE,
+) -> AsyncIterator[MovieBag]:
+    """Yields matching movies.
+
+    Args:
+        match: See tables.match_movies.
+        mode: See tables.match_movies.
+        batch_size: See tables.iter_match_movies.
+    """
+    match_statement = tables._match_movies_statement(match=match, mode=mode)
+    if match_statement is None:
+        return
+    statement, parameters = match_statement
+    async for movie_bag in _iter_movie_bags(
+        statement, batch_size=batch_size, parameters=parameters
+    ):
+        yield movie_bag
+
+
+async def page_movies(
+    *,
+    match: MovieBag = None,
+    cursor: tuple[str, int] = None,
+    page_size: int = PAGE_SIZE,
+    mode: str = SUBSTRING_SEARCH,
+) -> tuple[list[MovieBag], tuple[str, int] | None]:
+    """Returns one page of movies in title and year order.
+
+    Args:
+        match: See tables.page_movies.
+        cursor: See tables.page_movies.
+        page_size: See tables.page_movies.
+        mode: See tables.page_movies.
+
+    Returns:
+        A list of movie bags.
+        The cursor for the next page or None if this is the last page.
+    """
+    page_statement = tables._page_movies_statement(
+        match=match, cursor=cursor, page_size=page_size, mode=mode
+    )
+    if page_statement is None:
+        return tables._page([], more=False)
+    statement, parameters = page_statement
+    async with session_factory() as session:
+        movies = (await session.scalars(statement, parameters)).all()
+    movie_bags = [tables._convert_to_movie_bag(movie) for movie in movies[:page_size]]
+    return tables._page(movie_bags, more=len(movies) > page_size)
+
+
+async def add_movie(*, movie_bag: MovieBag):
+    """Adds a movie.
+
+    Args:
+        movie_bag: See tables.add_movie.
+
+    Raises and logs:
+        See tables.add_movie.
+    """
+    async with session_factory() as session:
+        await session.run_sync(tables._commit_add_movie, movie_bag=movie_bag)
+
+
+async def add_movies(
+    *, movie_bags: Iterable[MovieBag], chunk_size: int = ADD_MOVIES_CHUNK_SIZE
+) -> list[tuple[MovieBag, NoResultFound | IntegrityError]]:
+    """Adds many movies.
+
+    Each chunk is committed in its own transaction. Other coroutines run
+    between the chunks.
+
+    Args:
+        movie_bags: See tables.add_movies.
+        chunk_size: The number of movie bags committed in one transaction.
+
+    Returns:
+        See tables.add_movies.
+    """
+    rejects = []
+    for chunk in batched(movie_bags, chunk_size):
+        async with session_factory() as session:
+            rejects.extend(
+                await session.run_sync(tables._commit_add_movies, movie_bags=chunk)
+            )
+    return rejects
+
+
+async def edit_movie(*, old_movie_bag: MovieBag, replacement_fields: MovieBag):
+    """Edits a movie.
+
+    Args:
+        old_movie_bag: See tables.edit_movie.
+        replacement_fields: See tables.edit_movie.
+
+    Raises and logs:
+        See tables.edit_movie.
+    """
+    async with session_factory() as session:
+        await session.run_sync(
+            tables._commit_edit_movie,
+            old_movie_bag=old_movie_bag,
+            replacement_fields=replacement_fields,
+        )
+
+
+async def delete_movie(*, movie_bag: MovieBag):
+    """Deletes a movie and its orphans.
+
+    Args:
+        movie_bag: See tables.delete_movie.
+    """
+    async with session_factory() as session:
+        await session.run_sync(tables._commit_delete_movie, movie_bag=movie_bag)
+
+
+async def delete_all_orphans():
+    """Deletes all orphans. See tables.delete_all_orphans."""
+    async with session_factory() as session:
+        await session.run_sync(tables._commit_delete_all_orphans)
+
+
+async def select_all_tags() -> set[str]:
+    """Returns a set of all tag texts.
+
+    Unlike tables.select_all_tags the texts are always read from the database.
+    """
+    async with session_factory() as session:
+        texts = (await session.scalars(select(schema.Tag.text))).all()
+    return set(texts)
+
+
+async def match_tags(*, match: str) -> set[str]:
+    """Returns tag texts which match the substring.
+
+    Args:
+        match: A substring which will be used to select matching tag texts.
+    """
+    async with session_factory() as session:
+        tags = await session.run_sync(tables._match_tags, match=match)
+    return {tag.text for tag in tags}
+
+
+async def add_tag(*, tag_text: str):
+    """Adds a tag.
+
+    Args:
+        tag_text:
+    """
+    async with session_factory() as session:
+        await session.run_sync(tables._commit_add_tag, text=tag_text)
+
+
+async def add_tags(*, tag_texts: set[str]):
+    """Adds a set of tags.
+
+    Args:
+        tag_texts:
+    """
+    async with session_factory() as session:
+        await session.run_sync(tables._commit_add_tags, texts=tag_texts)
+
+
+async def edit_tag(*, old_tag_text: str, new_tag_text: str):
+    """Edits the text of an existing tag.
+
+    Args:
+        old_tag_text:
+        new_tag_text:
+
+    Raises and logs:
+        See tables.edit_tag.
+    """
+    async with session_factory() as session:
+        await session.run_sync(
+            tables._commit_edit_tag,
+            old_tag_text=old_tag_text,
+            new_tag_text=new_tag_text,
+        )
+
+
+async def delete_tag(*, tag_text: str):
+    """Deletes a tag. A missing tag is ignored.
+
+    Args:
+        tag_text:
+    """
+    async with session_factory() as session:
+        await session.run_sync(tables._commit_delete_tag, tag_text=tag_text)
+
+
+def _select_movie_bag(session: Session, *, movie_bag: MovieBag) -> MovieBag:
+    """Selects a single movie and returns it as a movie bag.
+
+    The conversion lazy loads the movie's relationships so it must run in the
+    same run_sync call as the select.
+
+    Args:
+        session:
+        movie_bag: See tables.select_movie.
+
+    Raises:
+        NoResultFound
+    """
+    return tables._convert_to_movie_bag(
+        tables._select_movie(session, movie_bag=movie_bag)
+    )
+
+
+async def _iter_movie_bags(
+    statement: Select, *, batch_size: int, parameters: dict[str, str | int] = None
+) -> AsyncIterator[MovieBag]:
+    """Yields movie bags converted from a statement's ORM movies.
+
+    Args:
+        statement: A select of ORM movies with eager loading of their
+            relationships.
+        batch_size: The number of rows fetched from the database at a time.
+        parameters: The values of the statement's bound parameters.
+    """
+    async with session_factory() as session:
+        movies = await session.stream_scalars(
+            statement.execution_options(yield_per=batch_size), parameters
+        )
+        async for movie in movies:
+            yield tables._convert_to_movie_bag(movie)
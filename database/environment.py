@@ -15,12 +15,20 @@
 
 import json
 import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime
+from functools import partial
 from pathlib import Path
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, Engine
 from sqlalchemy.orm import sessionmaker
 
-from database import schema, tables, update
+import config
+from database import atables, schema, tables, update
 
 DATA_DIR_NAME = "Movies-Database"
 SAVED_VERSION = "saved_version"
@@ -28,10 +36,71 @@ DATABASE_STEM = "movie_database_"
 NO_MOVIE_DATA_DIRECTORY_MSG = "Missing movie data directory."
 NO_DATABASE_DIRECTORY_MSG = "Missing database directory."
 UPDATE_SUCCESSFUL_MSG = "The database was successfully updated to "
+UPDATE_RESUMED_MSG = "The interrupted database update is resuming after old id"
+UPDATE_PROGRESS_MSG = "Database update progress"
+# The least number of seconds between two logged progress reports.
+UPDATE_PROGRESS_LOG_INTERVAL = 5.0
 DATABASE_REOPENED_MSG = "The database has been opened for use: Version "
-
-
-def start_engine():
+SQLITE_PROFILE_MSG = "SQLite performance profile"
+UNKNOWN_SQLITE_PROFILE_MSG = "Unknown SQLite performance profile"
+READONLY_NO_DATABASE_MSG = "The readonly SQLite profile needs an existing database."
+READONLY_UPDATE_MSG = "The readonly SQLite profile cannot update an old database."
+BACKUP_DIR_NAME = "Backups"
+BACKUP_COMPLETE_MSG = "The database backup is complete"
+BACKUP_FAILED_MSG = "The database backup failed."
+# The backup copies BACKUP_PAGES pages at a time and pauses for BACKUP_PAUSE
+# seconds between steps. A step of 64 pages of 4 KiB takes well under a
+# millisecond.
+BACKUP_PAGES = 64
+BACKUP_PAUSE = 0.005
+# The number of backups kept. Older backups are deleted.
+BACKUP_COUNT = 5
+BACKUP_TIME_FORMAT = "%Y%m%dT%H%M%S"
+PARTIAL_BACKUP_SUFFIX = ".partial"
+# The files which SQLite may leave next to a database which has been opened.
+SQLITE_SIDECAR_SUFFIXES = ("-wal", "-shm", "-journal")
+
+# Named sets of pragmas which are applied to every new SQLite connection. The
+# pragmas are applied in order, so query_only must be last.
+#   safe: Write-ahead logging with a full sync on every commit.
+#   fast: Syncs only at WAL checkpoints, with a larger cache and memory mapped
+#       reads. A power failure may lose the most recent commits but will not
+#       corrupt the database.
+#   readonly: As fast but any attempt to write raises an exception. The
+#       database must already exist and be the current version. The startup
+#       and close down writes are skipped. See is_readonly.
+DEFAULT_SQLITE_PROFILE = "safe"
+READONLY_SQLITE_PROFILE = "readonly"
+SQLITE_PROFILES = {
+    "safe": dict(
+        journal_mode="WAL",
+        synchronous="FULL",
+        cache_size=-8_000,
+        mmap_size=0,
+        temp_store="DEFAULT",
+        busy_timeout=5_000,
+    ),
+    "fast": dict(
+        journal_mode="WAL",
+        synchronous="NORMAL",
+        cache_size=-64_000,
+        mmap_size=268_435_456,
+        temp_store="MEMORY",
+        busy_timeout=5_000,
+    ),
+    READONLY_SQLITE_PROFILE: dict(
+        journal_mode="WAL",
+        synchronous="NORMAL",
+        cache_size=-64_000,
+        mmap_size=268_435_456,
+        temp_store="MEMORY",
+        busy_timeout=5_000,
+        query_only="ON",
+    ),
+}
+
+
+def start_engine(*, progress: Callable[[update.MigrationProgress], None] = None):
     """Creates the database environment.
 
     This will:
@@ -48,7 +117,9 @@ def start_engine():
 
     Otherwise, a new current version database will be created. Data from
     the old database will be copied and transformed before loading into
-    the new database.
+    the new database. An old database of an update.IN_PLACE_VERSIONS version
+    is copied whole and its copy is upgraded in place when the tables are
+    created.
 
     Naming conventions:
         data_dir_name = DATA_DIR_NAME
@@ -67,18 +138,191 @@ def start_engine():
 
         Note: 'movie_database_DBv1' will change depending on the actual
         version.
+
+    With the readonly SQLite profile the database is opened without creating
+    or changing anything in it.
+
+    Args:
+        progress: Called with the progress of an update from an old database
+            after each committed chunk of movies. If None the progress is
+            logged. See _update_database.
+
+    Raises and logs:
+        ReadonlyProfileError if the readonly SQLite profile is used and the
+        database does not exist or is an old version.
     """
     data_dir_path, database_dir_path = _getcreate_directories(
         DATA_DIR_NAME, DATABASE_STEM + schema.VERSION
     )
+    readonly = is_readonly()
+    if readonly and not _database_fn(database_dir_path).exists():
+        logging.error(READONLY_NO_DATABASE_MSG)
+        raise ReadonlyProfileError(READONLY_NO_DATABASE_MSG)
     saved_version = _getcreate_metadata(data_dir_path)
+    if readonly and saved_version != schema.VERSION:
+        logging.error(READONLY_UPDATE_MSG)
+        raise ReadonlyProfileError(READONLY_UPDATE_MSG)
+    if saved_version in update.IN_PLACE_VERSIONS:
+        update.copy_old_database(
+            _old_database_fn(saved_version, data_dir_path),
+            _database_fn(database_dir_path),
+        )
     _register_session_factory(database_dir_path)
+    if config.persistent and config.persistent.use_catalog_snapshot:
+        tables.enable_snapshot()
+    if config.persistent and config.persistent.collect_database_stats:
+        tables.enable_stats()
 
     if saved_version != schema.VERSION:
-        _update_database(saved_version, data_dir_path)
+        _update_database(saved_version, data_dir_path, progress=progress)
     else:
         logging.info(DATABASE_REOPENED_MSG + schema.VERSION)
 
+    if config.persistent and config.persistent.backup_on_start:
+        start_backup(data_dir_path, database_dir_path)
+
+
+def is_readonly() -> bool:
+    """Returns True if the persistent config selects the readonly SQLite profile.
+
+    Nothing may be written to the database, so callers skip their maintenance
+    writes.
+    """
+    return bool(
+        config.persistent
+        and config.persistent.sqlite_profile == READONLY_SQLITE_PROFILE
+    )
+
+
+class ReadonlyProfileError(Exception):
+    """The readonly SQLite profile cannot open the database."""
+
+
+def start_backup(data_dir: Path, database_dir: Path) -> threading.Thread:
+    """Starts a backup of the database in a background thread.
+
+    The backup is written to the BACKUP_DIR_NAME directory which is a sibling
+    of the database directory. See backup_database.
+
+    Args:
+        data_dir: The directory containing the database directory.
+        database_dir: The directory containing the database.
+
+    Returns:
+        The started thread.
+    """
+    thread = threading.Thread(
+        target=backup_database,
+        name="database backup",
+        args=(_database_fn(database_dir),),
+        kwargs=dict(backup_dir=data_dir / BACKUP_DIR_NAME),
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def backup_database(
+    database_fn: Path,
+    *,
+    backup_dir: Path,
+    pages: int = BACKUP_PAGES,
+    pause: float = BACKUP_PAUSE,
+    keep: int = BACKUP_COUNT,
+) -> Path:
+    """Copies the database to a timestamped backup file.
+
+    The copy is made with the SQLite online backup API while the database is
+    in use. The pause between steps gives the disk and the GIL back to the
+    rest of the program. The backup reads from a single read transaction.
+    With write-ahead logging, which every SQLite profile uses, this snapshot
+    does not block writers and their commits do not restart the copy. The
+    copy is written to a partial file which is renamed when it is complete, so
+    an interrupted backup is never mistaken for a good one.
+
+    A backup made in the same second as an earlier one is given a numbered
+    name. Only the newest keep backups are retained. The SQLite sidecar files
+    of a deleted backup are deleted with it.
+
+    Args:
+        database_fn: The database file.
+        backup_dir: The directory of the backups. It is created if missing.
+        pages: The number of pages copied in each step.
+        pause: The number of seconds between steps.
+        keep: The number of backups retained.
+
+    Returns:
+        The backup file.
+
+    Raises and logs:
+        sqlite3.Error if the backup fails.
+    """
+    backup_dir.mkdir(exist_ok=True)
+    # Partial files are left by backups interrupted at program exit.
+    for partial_fn in backup_dir.glob(f"*{PARTIAL_BACKUP_SUFFIX}"):
+        partial_fn.unlink()
+
+    stamp = datetime.now().strftime(BACKUP_TIME_FORMAT)
+    backup_fn = backup_dir / f"{database_fn.stem}_{stamp}{database_fn.suffix}"
+    count = 0
+    while backup_fn.exists():
+        count += 1
+        backup_fn = backup_fn.with_name(
+            f"{database_fn.stem}_{stamp}_{count}{database_fn.suffix}"
+        )
+    partial_fn = backup_fn.with_name(backup_fn.name + PARTIAL_BACKUP_SUFFIX)
+    start = time.perf_counter()
+    source = sqlite3.connect(database_fn, isolation_level=None)
+    target = sqlite3.connect(partial_fn)
+    # An incomplete partial file is discarded, so the copy needs neither a
+    # journal nor syncs. It is synced once before the rename.
+    target.execute("PRAGMA journal_mode = OFF")
+    target.execute("PRAGMA synchronous = OFF")
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_schema").fetchone()
+        # The sleep argument of backup only applies when the source is busy.
+        source.backup(target, pages=pages, progress=lambda *_: time.sleep(pause))
+        source.execute("COMMIT")
+    except sqlite3.Error as exc:
+        logging.error(f"{BACKUP_FAILED_MSG} {exc}")
+        exc.add_note(BACKUP_FAILED_MSG)
+        exc.add_note(str(database_fn))
+        raise
+    finally:
+        target.close()
+        source.close()
+
+    with partial_fn.open("rb+") as partial_file:
+        os.fsync(partial_file.fileno())
+    partial_fn.replace(backup_fn)
+    backups = sorted(
+        backup_dir.glob(f"{database_fn.stem}_*{database_fn.suffix}"),
+        key=partial(_backup_age, database_fn),
+    )
+    for old_backup_fn in backups[:-keep]:
+        old_backup_fn.unlink()
+        for sidecar in SQLITE_SIDECAR_SUFFIXES:
+            old_backup_fn.with_name(old_backup_fn.name + sidecar).unlink(
+                missing_ok=True
+            )
+    logging.info(
+        f"{BACKUP_COMPLETE_MSG}: {backup_fn} in {time.perf_counter() - start:.1f}s."
+    )
+    return backup_fn
+
+
+def _backup_age(database_fn: Path, backup_fn: Path) -> tuple[str, int]:
+    """Returns a sort key which orders backups from the oldest to the newest.
+
+    Args:
+        database_fn: The database file.
+        backup_fn: One of its backups. See backup_database.
+    """
+    name = backup_fn.name.removeprefix(f"{database_fn.stem}_")
+    stamp, _, count = name.removesuffix(database_fn.suffix).partition("_")
+    return stamp, int(count) if count.isdigit() else 0
+
 
 def _getcreate_directories(
     data_dir_name: str, database_dir_name: str
@@ -144,36 +388,161 @@ def _register_session_factory(database_dir: Path):
     This creates the SQL engine, creates all the tables from the schema, and
     registers a session factory.
 
+    The pragmas of the SQLite performance profile named in the persistent
+    config are applied to every connection and the effective values are
+    logged.
+
+    If aiosqlite is installed an asynchronous session factory for the same
+    database is registered with the atables module.
+
+    The tables are not created with the readonly profile. Its database already
+    exists.
+
     Args:
         database_dir:
     """
-    database_name = DATABASE_STEM + schema.VERSION + ".sqlite3"
-    database_fn = database_dir / database_name
+    database_fn = _database_fn(database_dir)
     engine = create_engine(f"sqlite+pysqlite:///{database_fn}", echo=False)
+    profile = _sqlite_profile()
+    event.listen(engine, "connect", _pragma_setter(SQLITE_PROFILES[profile]))
     tables.session_factory = sessionmaker(engine)
-    schema.Base.metadata.create_all(engine)
+    if profile != READONLY_SQLITE_PROFILE:
+        schema.Base.metadata.create_all(engine)
+    _log_pragmas(engine, profile)
+
+    if atables.AVAILABLE:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        async_engine = create_async_engine(
+            f"sqlite+aiosqlite:///{database_fn}", echo=False
+        )
+        event.listen(
+            async_engine.sync_engine,
+            "connect",
+            _pragma_setter(SQLITE_PROFILES[profile]),
+        )
+        atables.session_factory = async_sessionmaker(
+            async_engine, expire_on_commit=False
+        )
+
+
+def _database_fn(database_dir: Path) -> Path:
+    """Returns the database file of the current version.
+
+    Args:
+        database_dir:
+    """
+    return database_dir / (DATABASE_STEM + schema.VERSION + ".sqlite3")
+
+
+def _old_database_fn(old_version: str, data_dir: Path) -> Path:
+    """Returns the database file of an old version.
+
+    Args:
+        old_version: example 'DBv42'
+        data_dir: The directory containing the database directories.
+    """
+    stem = DATABASE_STEM + old_version
+    return data_dir / stem / (stem + ".sqlite3")
+
+
+def _sqlite_profile() -> str:
+    """Returns the name of the SQLite performance profile.
+
+    The name is taken from the persistent config. The default profile is used
+    if there is no persistent config.
+
+    Returns:
+        A key of SQLITE_PROFILES.
+
+    Logs:
+        An unknown profile name. The default profile is used.
+    """
+    profile = (
+        config.persistent.sqlite_profile
+        if config.persistent
+        else DEFAULT_SQLITE_PROFILE
+    )
+    if profile not in SQLITE_PROFILES:
+        logging.error(
+            f"{UNKNOWN_SQLITE_PROFILE_MSG}: {profile!r}. "
+            f"Using {DEFAULT_SQLITE_PROFILE!r}."
+        )
+        profile = DEFAULT_SQLITE_PROFILE
+    return profile
+
+
+def _pragma_setter(pragmas: dict[str, str | int]) -> Callable:
+    """Returns a connect event listener which sets the pragmas.
 
+    Args:
+        pragmas: The pragma names and values in the order they are to be set.
+    """
+
+    def func(dbapi_connection, _):
+        """Sets the pragmas on a new DBAPI connection."""
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    return func
+
+
+def _log_pragmas(engine: Engine, profile: str):
+    """Logs the effective values of the profile's pragmas.
+
+    SQLite silently ignores some pragma settings. For example, an in-memory
+    database cannot use write-ahead logging. The logged values are read back
+    from a connection.
 
-def _update_database(old_version: str, data_dir_path: Path):
+    Args:
+        engine:
+        profile: A key of SQLITE_PROFILES.
+    """
+    with engine.connect() as connection:
+        effective = {
+            name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in SQLITE_PROFILES[profile]
+        }
+    logging.info(f"{SQLITE_PROFILE_MSG} {profile!r}: {effective}")
+
+
+def _update_database(
+    old_version: str,
+    data_dir_path: Path,
+    *,
+    progress: Callable[[update.MigrationProgress], None] = None,
+):
     """Update the database with data from a previous version.
 
+    The database of an update.IN_PLACE_VERSIONS version has already been
+    copied and upgraded by start_engine, so only the saved version is updated.
+
     This will call code which will extract data from the old version by
     schema reflection. The database is updated with data converted from old
-    formats.
+    formats. The movies are streamed from the old database and added in
+    chunks, each in its own transaction, so memory does not grow with the
+    size of the old database.
+
+    Each chunk's transaction also records the last migrated old id in the
+    migration checkpoint. If an update is interrupted the next start resumes
+    after that id. The checkpoint is deleted when the saved version file has
+    been updated.
 
     Args:
         old_version: example 'DBv42'
         data_dir_path: example
-    """
-    old_database_dir_name = DATABASE_STEM + old_version
-    old_database_dir = data_dir_path / old_database_dir_name
-    old_database_name = DATABASE_STEM + old_version + ".sqlite3"
-    old_database_fn = data_dir_path / old_database_dir / old_database_name
+        progress: Called after each committed chunk of movies. If None the
+            progress is logged at most every UPDATE_PROGRESS_LOG_INTERVAL
+            seconds.
 
-    movies, tags = update.update_old_database(old_version, old_database_fn)
-    tables.add_tags(tag_texts=tags)
-    for movie in movies:
-        tables.add_movie(movie_bag=movie)
+    Raises and logs:
+        update.DatabaseUpdateCheckZeroError if old movies were not copied. The
+        saved version file is not updated. See _copy_movies.
+    """
+    if old_version not in update.IN_PLACE_VERSIONS:
+        _copy_movies(old_version, data_dir_path, progress=progress)
 
     # Update saved version file with new version number.
     saved_version_fn = data_dir_path / (SAVED_VERSION + ".json")
@@ -184,5 +553,105 @@ def _update_database(old_version: str, data_dir_path: Path):
         # noinspection PyTypeChecker
         json.dump(data, fp)
 
+    tables.delete_checkpoint(old_version=old_version)
+
     # Log the update as being successfully completed.
     logging.info(UPDATE_SUCCESSFUL_MSG + schema.VERSION)
+
+
+def _copy_movies(
+    old_version: str,
+    data_dir_path: Path,
+    *,
+    progress: Callable[[update.MigrationProgress], None] = None,
+):
+    """Copies the movies and tags of an old database into the database.
+
+    Old movies which the database rejects, for example duplicates or movies
+    with an invalid year, are logged by tables.add_movies. The count of movies
+    is checked after the copy, so an update which was resumed after an
+    earlier run's rejects also fails.
+
+    Args:
+        old_version: See _update_database.
+        data_dir_path: See _update_database.
+        progress: See _update_database.
+
+    Raises and logs:
+        update.DatabaseUpdateCheckZeroError if the number of movies in the
+        database is not equal to the number of old movies.
+    """
+    last_old_id, done = tables.select_checkpoint(old_version=old_version)
+    if last_old_id:
+        logging.info(f"{UPDATE_RESUMED_MSG} {last_old_id}.")
+    movies, tags = update.update_old_database(
+        old_version, _old_database_fn(old_version, data_dir_path), after_id=last_old_id
+    )
+    total = update.count_old_movies(old_version)
+    tables.add_tags(tag_texts=tags)
+    tables.add_movies(
+        movie_bags=movies,
+        checkpoint=old_version,
+        progress=_progress_counter(
+            done=done, total=total, progress=progress or _progress_logger()
+        ),
+    )
+
+    # Check zero for migrated movies
+    if tables.count_movies() != total:
+        logging.error(
+            update.DatabaseUpdateCheckZeroError, update.CHECK_ZERO_MIGRATED_MOVIES
+        )
+        raise update.DatabaseUpdateCheckZeroError(update.CHECK_ZERO_MIGRATED_MOVIES)
+
+
+def _progress_counter(
+    *, done: int, total: int, progress: Callable[[update.MigrationProgress], None]
+) -> Callable[[int], None]:
+    """Returns a progress callback for tables.add_movies.
+
+    Args:
+        done: The old movies migrated before this run.
+        total: The number of old movies.
+        progress: Called with the progress after each chunk.
+    """
+    start = time.perf_counter()
+    migration_progress = update.MigrationProgress(
+        done=done, total=total, rows=0, seconds=0.0
+    )
+
+    def func(rows: int):
+        """Reports the progress after a chunk of rows."""
+        migration_progress.done += rows
+        migration_progress.rows += rows
+        migration_progress.seconds = time.perf_counter() - start
+        progress(migration_progress)
+
+    return func
+
+
+def _progress_logger() -> Callable[[update.MigrationProgress], None]:
+    """Returns a progress callback which logs the progress.
+
+    A report is logged at most every UPDATE_PROGRESS_LOG_INTERVAL seconds. The
+    final report is always logged.
+    """
+    last_logged = time.perf_counter()
+
+    def func(migration_progress: update.MigrationProgress):
+        """Logs the progress."""
+        nonlocal last_logged
+        now = time.perf_counter()
+        finished = migration_progress.done >= migration_progress.total
+        if not finished and now - last_logged < UPDATE_PROGRESS_LOG_INTERVAL:
+            return
+        last_logged = now
+        eta = migration_progress.eta_seconds
+        logging.info(
+            f"{UPDATE_PROGRESS_MSG}: {migration_progress.done} of "
+            f"{migration_progress.total} movies, "
+            f"{migration_progress.rows_per_second:.0f} movies/s, "
+            f"ETA {'unknown' if eta is None else f'{eta:.0f}s'}."
+        )
+
+    return func
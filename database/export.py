@@ -0,0 +1,246 @@
+"""Export of the catalog to JSON Lines and CSV files.
+
+Movies are streamed from the database in batches with yield_per and each
+movie is written as soon as it has been converted, so memory does not grow with
+the size of the catalog. The file is written through a buffer of
+WRITE_BUFFER_SIZE bytes.
+
+The movies are read as plain rows rather than ORM objects. The people and tags
+of each batch are read with one query per link table. This avoids the cost of
+building and tracking an ORM object for every movie, person, and tag.
+"""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import csv
+import json
+import logging
+import time
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import select, Column
+from sqlalchemy.orm import Session
+
+from database import instrumentation, schema, tables
+from database.tables import YIELD_PER_BATCH_SIZE
+from globalconstants import *
+
+JSONL = "jsonl"
+CSV = "csv"
+# The export format of each file suffix.
+FORMATS = {".jsonl": JSONL, ".csv": CSV}
+WRITE_BUFFER_SIZE = 64 * 1024
+CSV_FIELDS = (
+    "title",
+    "year",
+    "duration",
+    "directors",
+    "stars",
+    "synopsis",
+    "notes",
+    "movie_tags",
+    "created",
+    "updated",
+)
+# Separates the names or the tags of a CSV field.
+CSV_SEPARATOR = "; "
+UNKNOWN_FORMAT = "The export format is not recognized."
+EXPORT_MSG = "Exported movies"
+
+
+@dataclass
+class ExportStats:
+    """The outcome of an export."""
+
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        """Returns the throughput of the export."""
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+@instrumentation.instrumented
+def export_movies(
+    path: Path,
+    *,
+    export_format: str = None,
+    batch_size: int = YIELD_PER_BATCH_SIZE,
+) -> ExportStats:
+    """Writes every movie with its people and tags to a file.
+
+    Args:
+        path: The export file. An existing file is replaced.
+        export_format: JSONL or CSV. If None the format is chosen by the file
+            suffix. See FORMATS.
+        batch_size: The number of rows fetched from the database at a time.
+
+    Returns:
+        The number of movies written and the duration of the export.
+
+    Raises and logs:
+        ValueError if the format is not recognized.
+    """
+    if export_format is None:
+        export_format = FORMATS.get(path.suffix.lower())
+    if export_format not in FORMATS.values():
+        exc = ValueError(export_format)
+        logging.error(f"{UNKNOWN_FORMAT} {path}.")
+        exc.add_note(UNKNOWN_FORMAT)
+        exc.add_note(str(path))
+        raise exc
+
+    start = time.perf_counter()
+    rows = 0
+    with (
+        tables.session_factory() as session,
+        path.open(
+            "w", encoding="utf-8", newline="", buffering=WRITE_BUFFER_SIZE
+        ) as file,
+    ):
+        movie_bags = _iter_movie_bags(session, batch_size=batch_size)
+        if export_format == JSONL:
+            for movie_bag in movie_bags:
+                file.write(json.dumps(_jsonl_record(movie_bag), ensure_ascii=False))
+                file.write("\n")
+                rows += 1
+        else:
+            writer = csv.DictWriter(file, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            for movie_bag in movie_bags:
+                writer.writerow(_csv_record(movie_bag))
+                rows += 1
+
+    export_stats = ExportStats(rows=rows, seconds=time.perf_counter() - start)
+    logging.info(
+        f"{EXPORT_MSG}: {rows} to {path} in {export_stats.seconds:.1f}s, "
+        f"{export_stats.rows_per_second:.0f} rows/s."
+    )
+    return export_stats
+
+
+def _iter_movie_bags(session: Session, *, batch_size: int) -> Iterator[MovieBag]:
+    """Yields every movie in id order.
+
+    Args:
+        session:
+        batch_size: The number of movies fetched from the database at a time.
+    """
+    movie = schema.Movie.__table__
+    person = schema.Person.__table__
+    tag = schema.Tag.__table__
+    result = session.execute(
+        select(movie).order_by(movie.c.id).execution_options(yield_per=batch_size)
+    )
+    for rows in result.partitions():
+        ids = [row.id for row in rows]
+        stars = _linked_texts(
+            session, schema.movie_star_table.c.person_id, person.c.name, ids=ids
+        )
+        directors = _linked_texts(
+            session, schema.movie_director_table.c.person_id, person.c.name, ids=ids
+        )
+        movie_tags = _linked_texts(
+            session, schema.movie_tag_table.c.tag_id, tag.c.text, ids=ids
+        )
+        for row in rows:
+            movie_bag = MovieBag(
+                id=row.id,
+                created=row.created,
+                updated=row.updated,
+                title=row.title,
+                year=MovieInteger(row.year),
+            )
+            if row.notes:
+                movie_bag["notes"] = row.notes
+            if row.duration:
+                movie_bag["duration"] = MovieInteger(row.duration)
+            if row.synopsis:
+                movie_bag["synopsis"] = row.synopsis
+            if row.id in stars:
+                movie_bag["stars"] = stars[row.id]
+            if row.id in directors:
+                movie_bag["directors"] = directors[row.id]
+            if row.id in movie_tags:
+                movie_bag["movie_tags"] = movie_tags[row.id]
+            yield movie_bag
+
+
+def _linked_texts(
+    session: Session,
+    link_column: Column,
+    text_column: Column,
+    *,
+    ids: Sequence[int],
+) -> dict[int, set[str]]:
+    """Returns the names or tag texts linked to each of a batch of movies.
+
+    Args:
+        session:
+        link_column: The person_id or tag_id column of a movie link table.
+        text_column: The person name or the tag text.
+        ids: The movie ids.
+
+    Returns:
+        The texts of each movie with at least one link.
+    """
+    link_table = link_column.table
+    statement = (
+        select(link_table.c.movie_id, text_column)
+        .join(text_column.table, link_column == text_column.table.c.id)
+        .where(link_table.c.movie_id.in_(ids))
+    )
+    texts = defaultdict(set)
+    for movie_id, linked_text in session.execute(statement):
+        texts[movie_id].add(linked_text)
+    return texts
+
+
+def _jsonl_record(movie_bag: MovieBag) -> dict:
+    """Returns a movie bag as a JSON serializable dict.
+
+    Args:
+        movie_bag:
+    """
+    record = {}
+    for key, value in movie_bag.items():
+        if key == "id":
+            continue
+        match value:
+            case MovieInteger():
+                record[key] = int(value)
+            case set():
+                record[key] = sorted(value)
+            case datetime():
+                record[key] = value.isoformat()
+            case _:
+                record[key] = value
+    return record
+
+
+def _csv_record(movie_bag: MovieBag) -> dict:
+    """Returns a movie bag as a CSV row.
+
+    Args:
+        movie_bag:
+    """
+    record = _jsonl_record(movie_bag)
+    for key, value in record.items():
+        if isinstance(value, list):
+            record[key] = CSV_SEPARATOR.join(value)
+    return record
@@ -0,0 +1,196 @@
+"""Statement timing for the database API.
+
+Every SQL statement executed during a call of an instrumented function is
+timed by the before_cursor_execute and after_cursor_execute events of all
+engines. The statement count, the statement time, and the rows changed as
+reported by the driver are attributed to the outermost instrumented call, so
+a call of add_movies which calls other instrumented functions is recorded
+once. Statements which missed the engine's compiled cache and so were
+compiled to SQL are also counted.
+
+Instrumentation is disabled by default. When disabled the event listeners are
+removed and an instrumented function costs one extra flag test per call.
+"""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import functools
+import statistics
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event, Engine
+from sqlalchemy.engine.interfaces import CacheStats as CompiledCacheStats
+
+# The number of most recent call times kept for the percentiles.
+SAMPLE_SIZE = 1000
+PERCENTILES = (50, 95, 99)
+QUERY_START = "instrumentation_query_start"
+
+
+@dataclass
+class CallStats:
+    """The cost of the calls of one instrumented function."""
+
+    calls: int = 0
+    statements: int = 0
+    statement_seconds: float = 0.0
+    # The rows inserted, updated, or deleted. Rows which are selected or
+    # returned by RETURNING are not counted.
+    rows_changed: int = 0
+    compiles: int = 0
+    seconds: deque[float] = field(default_factory=lambda: deque(maxlen=SAMPLE_SIZE))
+
+    def summary(self) -> dict[str, int | float]:
+        """Returns the counts and the latencies in milliseconds.
+
+        The percentiles are of the most recent SAMPLE_SIZE calls.
+        """
+        result = dict(
+            calls=self.calls,
+            statements=self.statements,
+            statement_ms=self.statement_seconds * 1000,
+            rows_changed=self.rows_changed,
+            compiles=self.compiles,
+        )
+        samples = list(self.seconds)
+        for percentile in PERCENTILES:
+            result[f"p{percentile}_ms"] = (
+                _percentile(samples, percentile) * 1000 if samples else 0.0
+            )
+        return result
+
+
+enabled = False
+_stats: dict[str, CallStats] = {}
+_stats_lock = threading.Lock()
+# The stats of the outermost instrumented call in the current thread or task.
+_current: ContextVar[CallStats | None] = ContextVar("current", default=None)
+
+
+def enable():
+    """Enables instrumentation."""
+    global enabled
+    if not enabled:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        enabled = True
+
+
+def disable():
+    """Disables instrumentation. The statistics are kept."""
+    global enabled
+    if enabled:
+        event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+        enabled = False
+
+
+def reset():
+    """Discards the statistics."""
+    with _stats_lock:
+        _stats.clear()
+
+
+def summary() -> dict[str, dict[str, int | float]]:
+    """Returns the summary of each instrumented function which has been called.
+
+    See CallStats.summary.
+    """
+    with _stats_lock:
+        return {name: call_stats.summary() for name, call_stats in _stats.items()}
+
+
+def instrumented(func: Callable) -> Callable:
+    """Decorates a function so its calls are recorded.
+
+    Generator functions are not supported as their statements execute after
+    the call has returned.
+
+    Args:
+        func:
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not enabled or _current.get() is not None:
+            return func(*args, **kwargs)
+        call_stats = CallStats()
+        token = _current.set(call_stats)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+            _record(func.__name__, call_stats, time.perf_counter() - start)
+
+    return wrapper
+
+
+def _record(name: str, call_stats: CallStats, elapsed: float):
+    """Adds the stats of a finished outermost call to the function's stats.
+
+    Args:
+        name: The function's name.
+        call_stats: The stats of this call.
+        elapsed: The duration of the call in seconds.
+    """
+    with _stats_lock:
+        total = _stats.setdefault(name, CallStats())
+        total.calls += 1
+        total.statements += call_stats.statements
+        total.statement_seconds += call_stats.statement_seconds
+        total.rows_changed += call_stats.rows_changed
+        total.compiles += call_stats.compiles
+        total.seconds.append(elapsed)
+
+
+# noinspection PyUnusedLocal
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Records the start time of a statement."""
+    if _current.get() is not None:
+        conn.info.setdefault(QUERY_START, []).append(time.perf_counter())
+
+
+# noinspection PyUnusedLocal
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Attributes a statement's time, changed rows, and compilation to the
+    current call."""
+    call_stats = _current.get()
+    starts = conn.info.get(QUERY_START)
+    if call_stats is None or not starts:
+        return
+    call_stats.statements += 1
+    call_stats.statement_seconds += time.perf_counter() - starts.pop()
+    # SQLite reports -1 for a SELECT and 0 for a statement with RETURNING
+    # as its rows are only counted as they are fetched.
+    if cursor.rowcount > 0:
+        call_stats.rows_changed += cursor.rowcount
+    if context is not None and context.cache_hit is CompiledCacheStats.CACHE_MISS:
+        call_stats.compiles += 1
+
+
+def _percentile(samples: list[float], percentile: int) -> float:
+    """Returns a percentile of the samples by linear interpolation.
+
+    Args:
+        samples:
+        percentile: 1 to 99.
+    """
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[percentile - 1]
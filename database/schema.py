@@ -1,4 +1,4 @@
-"""Schema v1"""
+"""Schema v2"""
 
 #  Copyright© 2025. Stephen Rigden.
 #  Last modified 1/8/25, 1:01 PM by stephen.
@@ -13,31 +13,59 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import string
 from datetime import datetime
 from sqlalchemy import (
     Table,
     Column,
+    Computed,
     ForeignKey,
+    Index,
     UniqueConstraint,
     CheckConstraint,
     func,
+    event,
+    text,
+    table,
+    column,
+    Connection,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
-VERSION = "DBv1"
+VERSION = "DBv2"
 MUYBRIDGE = 1878
 MAX_YEAR = 10000
 
+# The normalized keys of titles and names for indexed prefix searches. A title
+# key is the lower case title without a leading English article. A name key is
+# the lower case name. SQLite's lower() only folds ASCII letters so the keys
+# computed in Python by title_key and name_key do the same.
+ARTICLES = ("the ", "an ", "a ")
+TITLE_KEY_SQL = (
+    "CASE "
+    + " ".join(
+        f"WHEN substr(lower(title), 1, {len(article)}) = '{article}' "
+        f"THEN ltrim(substr(lower(title), {len(article) + 1}), ' ')"
+        for article in ARTICLES
+    )
+    + " ELSE lower(title) END"
+)
+NAME_KEY_SQL = "lower(name)"
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
 
 class Base(DeclarativeBase):
     pass
 
 
+# The primary keys of the link tables are led by movie_id. The reverse indexes
+# are covering indexes for going from a tag or a person to their movies.
 movie_tag_table = Table(
     "movie_tag_table",
     Base.metadata,
     Column("movie_id", ForeignKey("movie.id"), primary_key=True),
     Column("tag_id", ForeignKey("tag.id"), primary_key=True),
+    Index("ix_movie_tag_table_tag_id_movie_id", "tag_id", "movie_id"),
 )
 
 movie_star_table = Table(
@@ -45,6 +73,7 @@ movie_star_table = Table(
     Base.metadata,
     Column("movie_id", ForeignKey("movie.id"), primary_key=True),
     Column("person_id", ForeignKey("person.id"), primary_key=True),
+    Index("ix_movie_star_table_person_id_movie_id", "person_id", "movie_id"),
 )
 
 movie_director_table = Table(
@@ -52,6 +81,7 @@ movie_director_table = Table(
     Base.metadata,
     Column("movie_id", ForeignKey("movie.id"), primary_key=True),
     Column("person_id", ForeignKey("person.id"), primary_key=True),
+    Index("ix_movie_director_table_person_id_movie_id", "person_id", "movie_id"),
 )
 
 
@@ -69,8 +99,11 @@ class Movie(Base):
     notes: Mapped[str | None]
 
     title: Mapped[str]
-    year: Mapped[int]
-    duration: Mapped[int | None]
+    title_key: Mapped[str] = mapped_column(
+        Computed(TITLE_KEY_SQL, persisted=False), index=True
+    )
+    year: Mapped[int] = mapped_column(index=True)
+    duration: Mapped[int | None] = mapped_column(index=True)
     synopsis: Mapped[str | None]
 
     stars: Mapped[set["Person"]] = relationship(
@@ -110,6 +143,9 @@ class Person(Base):
     notes: Mapped[str | None]
 
     name: Mapped[str] = mapped_column(unique=True)
+    name_key: Mapped[str] = mapped_column(
+        Computed(NAME_KEY_SQL, persisted=False), index=True
+    )
 
     director_of_movies: Mapped[set[Movie]] = relationship(
         secondary=movie_director_table, back_populates="directors"
@@ -138,3 +174,174 @@ class Tag(Base):
 
     def __repr__(self) -> str:  # pragma nocover
         return f"{self.__class__.__qualname__}(id={self.id!r}, text={self.text!r})"
+
+
+# The progress of an update from an old database. A row is written in the same
+# transaction as each chunk of migrated movies, so an interrupted update can
+# resume after the last committed chunk.
+class MigrationCheckpoint(Base):
+    __tablename__ = "migration_checkpoint"
+
+    old_version: Mapped[str] = mapped_column(primary_key=True)
+    updated: Mapped[datetime] = mapped_column(default=func.now(), onupdate=func.now())
+
+    # The largest old movie id which has been migrated.
+    last_old_id: Mapped[int]
+    # The number of old movies which have been migrated.
+    done: Mapped[int]
+
+    def __repr__(self) -> str:  # pragma nocover
+        return (
+            f"{self.__class__.__qualname__}(old_version={self.old_version!r}, "
+            f"last_old_id={self.last_old_id!r}, done={self.done!r})"
+        )
+
+
+# Search indexes.
+# These FTS5 tables are external content tables which hold only an index of
+# columns of the movie and person tables. Triggers keep them in step with their
+# content tables. They are not part of Base.metadata because create_all cannot
+# create a virtual table.
+
+# The full text index of the movie's title, synopsis, and notes.
+movie_fts = table(
+    "movie_fts",
+    column("rowid"),
+    column("title"),
+    column("synopsis"),
+    column("notes"),
+    column("rank"),
+)
+
+MOVIE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS movie_fts USING fts5("
+    "title, synopsis, notes, content='movie', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS movie_fts_insert AFTER INSERT ON movie BEGIN "
+    "INSERT INTO movie_fts(rowid, title, synopsis, notes) "
+    "VALUES (new.id, new.title, new.synopsis, new.notes); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS movie_fts_delete AFTER DELETE ON movie BEGIN "
+    "INSERT INTO movie_fts(movie_fts, rowid, title, synopsis, notes) "
+    "VALUES ('delete', old.id, old.title, old.synopsis, old.notes); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS movie_fts_update "
+    "AFTER UPDATE OF title, synopsis, notes ON movie BEGIN "
+    "INSERT INTO movie_fts(movie_fts, rowid, title, synopsis, notes) "
+    "VALUES ('delete', old.id, old.title, old.synopsis, old.notes); "
+    "INSERT INTO movie_fts(rowid, title, synopsis, notes) "
+    "VALUES (new.id, new.title, new.synopsis, new.notes); "
+    "END",
+)
+
+# The trigram index of person names. It turns `name LIKE '%x%'` into an index
+# lookup for substrings of three or more characters.
+person_trigram = table(
+    "person_trigram",
+    column("rowid"),
+    column("name"),
+)
+
+PERSON_TRIGRAM_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS person_trigram USING fts5("
+    "name, content='person', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS person_trigram_insert AFTER INSERT ON person BEGIN "
+    "INSERT INTO person_trigram(rowid, name) VALUES (new.id, new.name); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS person_trigram_delete AFTER DELETE ON person BEGIN "
+    "INSERT INTO person_trigram(person_trigram, rowid, name) "
+    "VALUES ('delete', old.id, old.name); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS person_trigram_update "
+    "AFTER UPDATE OF name ON person BEGIN "
+    "INSERT INTO person_trigram(person_trigram, rowid, name) "
+    "VALUES ('delete', old.id, old.name); "
+    "INSERT INTO person_trigram(rowid, name) VALUES (new.id, new.name); "
+    "END",
+)
+
+SEARCH_INDEXES = {
+    "movie_fts": MOVIE_FTS_DDL,
+    "person_trigram": PERSON_TRIGRAM_DDL,
+}
+
+# The generated key columns which are added to the tables of a database created
+# before they existed. SQLite can add a virtual generated column to an existing
+# table. Their indexes are created by create_missing_indexes.
+KEY_COLUMNS = {
+    ("movie", "title_key"): TITLE_KEY_SQL,
+    ("person", "name_key"): NAME_KEY_SQL,
+}
+
+
+def title_key(title: str) -> str:
+    """Returns the value of a title's title_key column.
+
+    Args:
+        title:
+    """
+    key = title.translate(_ASCII_LOWER)
+    for article in ARTICLES:
+        if key.startswith(article):
+            return key[len(article) :].lstrip(" ")
+    return key
+
+
+def name_key(name: str) -> str:
+    """Returns the value of a person's name_key column.
+
+    Args:
+        name:
+    """
+    return name.translate(_ASCII_LOWER)
+
+
+# noinspection PyUnusedLocal
+@event.listens_for(Base.metadata, "after_create")
+def create_search_indexes(target, connection: Connection, **kw):
+    """Creates the search indexes and their triggers.
+
+    This runs after every create_all. A new index of an existing database is
+    populated from its content table. Missing key columns are added.
+
+    Args:
+        target: Base.metadata
+        connection:
+        **kw:
+    """
+    for name, ddls in SEARCH_INDEXES.items():
+        statement = text("SELECT 1 FROM sqlite_master WHERE name = :name")
+        is_new = connection.execute(statement, dict(name=name)).first() is None
+        for ddl in ddls:
+            connection.execute(text(ddl))
+        if is_new:
+            connection.execute(text(f"INSERT INTO {name}({name}) VALUES ('rebuild')"))
+
+    for (table_name, column_name), expression in KEY_COLUMNS.items():
+        statement = text(f"SELECT name FROM pragma_table_xinfo('{table_name}')")
+        if column_name not in connection.scalars(statement).all():
+            connection.execute(
+                text(
+                    f"ALTER TABLE {table_name} ADD COLUMN {column_name} VARCHAR "
+                    f"GENERATED ALWAYS AS ({expression}) VIRTUAL"
+                )
+            )
+
+
+# noinspection PyUnusedLocal
+@event.listens_for(Base.metadata, "after_create")
+def create_missing_indexes(target, connection: Connection, **kw):
+    """Creates the indexes which are missing from existing tables.
+
+    create_all only creates the indexes of the tables it creates. This runs
+    after create_search_indexes has added any missing key columns, so a
+    database of an older version with the same tables is upgraded in place.
+
+    Args:
+        target: Base.metadata
+        connection:
+        **kw:
+    """
+    for table_obj in target.sorted_tables:
+        for index in table_obj.indexes:
+            index.create(connection, checkfirst=True)
@@ -0,0 +1,360 @@
+"""An in-memory columnar snapshot of the movie catalog.
+
+The snapshot holds the columns which match_movies filters on as NumPy arrays
+so the match criteria can be evaluated as vectorized masks without touching
+SQLite. This module is optional. It requires NumPy 2, and AVAILABLE is False if
+NumPy is not installed.
+"""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import string
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from sqlalchemy import select, ColumnElement, Select
+from sqlalchemy.orm import Session
+
+from database import schema
+from globalconstants import *
+
+try:
+    import numpy as np
+except ModuleNotFoundError:  # pragma nocover
+    np = None
+
+AVAILABLE = np is not None
+NO_DURATION = -1
+TEXT_COLUMNS = ("title", "synopsis", "notes")
+# The relative cost of evaluating each match criterion.
+CRITERIA_COSTS = dict(
+    year=0, duration=0, movie_tags=1, stars=2, directors=2, title=3, notes=3, synopsis=4
+)
+
+# SQLite's LIKE folds the case of ASCII letters only.
+ASCII_FOLD = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+@dataclass
+class Links:
+    """A CSR adjacency of the movie rows to the rows of a people or tags table.
+
+    The targets of movie row r are targets[offsets[r]:offsets[r + 1]]. The
+    movie row of each link is held in rows.
+    """
+
+    offsets: "np.ndarray"
+    targets: "np.ndarray"
+    rows: "np.ndarray"
+
+
+class CatalogSnapshot:
+    """A columnar copy of the movie table and its links.
+
+    Movies are held in rows. A deleted or edited movie's row is marked as dead
+    and an edited movie is appended as a new row, so the arrays only grow
+    between builds.
+
+    Use:
+        >> catalog = CatalogSnapshot()
+        >> catalog.load(session)
+        >> catalog.match_ids(MovieBag(year=MovieInteger('1950-1959')))
+        array([  12,   57, …])
+    """
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.alive = np.empty(0, dtype=bool)
+        self.years = np.empty(0, dtype=np.int64)
+        self.durations = np.empty(0, dtype=np.int64)
+        # Texts are held as folded UTF-8 bytes. NumPy searches fixed width
+        # bytes several times faster than its variable width strings, and a
+        # substring search of UTF-8 gives the same result as of the text.
+        self.texts = {column: np.empty(0, dtype=np.bytes_) for column in TEXT_COLUMNS}
+        self.has_texts = {column: np.empty(0, dtype=bool) for column in TEXT_COLUMNS}
+
+        self.names = np.empty(0, dtype=np.bytes_)
+        self.tag_texts = np.empty(0, dtype=np.bytes_)
+        self._name_rows: dict[int, int] = {}
+        self._tag_rows: dict[int, int] = {}
+
+        self.links = {
+            key: Links(
+                offsets=np.zeros(1, dtype=np.int64),
+                targets=np.empty(0, dtype=np.int64),
+                rows=np.empty(0, dtype=np.int64),
+            )
+            for key in ("stars", "directors", "movie_tags")
+        }
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    def load(self, session: Session, *, where: ColumnElement = None):
+        """Appends movies from the database.
+
+        Args:
+            session:
+            where: A condition on schema.Movie which selects the movies. All
+                movies are loaded if this is None.
+        """
+        statement = select(
+            schema.Movie.id,
+            schema.Movie.year,
+            schema.Movie.duration,
+            schema.Movie.title,
+            schema.Movie.synopsis,
+            schema.Movie.notes,
+        ).order_by(schema.Movie.id)
+        if where is not None:
+            statement = statement.where(where)
+        movies = session.execute(statement).all()
+        if not movies:
+            return
+
+        first_row = len(self.ids)
+        ids, years, durations, *texts = zip(*movies)
+        self.ids = np.concatenate((self.ids, np.array(ids, dtype=np.int64)))
+        self.alive = np.concatenate((self.alive, np.ones(len(ids), dtype=bool)))
+        self.years = np.concatenate((self.years, np.array(years, dtype=np.int64)))
+        durations = [NO_DURATION if value is None else value for value in durations]
+        self.durations = np.concatenate(
+            (self.durations, np.array(durations, dtype=np.int64))
+        )
+        for column, values in zip(TEXT_COLUMNS, texts):
+            folded = [b"" if value is None else _fold(value) for value in values]
+            self.texts[column] = np.concatenate(
+                (self.texts[column], np.array(folded, dtype=np.bytes_))
+            )
+            present = np.array([value is not None for value in values], dtype=bool)
+            self.has_texts[column] = np.concatenate((self.has_texts[column], present))
+
+        movie_ids = select(schema.Movie.id)
+        if where is not None:
+            movie_ids = movie_ids.where(where)
+        movie_rows = {movie_id: first_row + ix for ix, movie_id in enumerate(ids)}
+        for key, table, column in (
+            ("stars", schema.movie_star_table, "person_id"),
+            ("directors", schema.movie_director_table, "person_id"),
+            ("movie_tags", schema.movie_tag_table, "tag_id"),
+        ):
+            statement = select(table.c.movie_id, table.c[column])
+            if where is not None:
+                statement = statement.where(table.c.movie_id.in_(movie_ids))
+            links = session.execute(statement).all()
+            # Every target is loaded by a full load. An incremental load only
+            # loads the targets which are new to the snapshot.
+            target_ids = None if where is None else {target for _, target in links}
+            if key == "movie_tags":
+                self.tag_texts = _append_targets(
+                    session,
+                    select(schema.Tag.id, schema.Tag.text),
+                    targets=self.tag_texts,
+                    target_rows=self._tag_rows,
+                    target_ids=target_ids,
+                )
+                target_rows = self._tag_rows
+            else:
+                self.names = _append_targets(
+                    session,
+                    select(schema.Person.id, schema.Person.name),
+                    targets=self.names,
+                    target_rows=self._name_rows,
+                    target_ids=target_ids,
+                )
+                target_rows = self._name_rows
+            self._append_links(
+                key,
+                links=[
+                    (movie_rows[movie_id], target_rows[target_id])
+                    for movie_id, target_id in links
+                ],
+                first_row=first_row,
+            )
+
+    def discard(self, movie_ids: Iterable[int]):
+        """Marks the rows of deleted movies as dead.
+
+        Args:
+            movie_ids:
+        """
+        self.alive &= ~np.isin(self.ids, np.fromiter(movie_ids, dtype=np.int64))
+
+    def refresh(self, session: Session, *, movie_ids: Iterable[int]):
+        """Replaces the rows of edited movies.
+
+        Args:
+            session:
+            movie_ids:
+        """
+        movie_ids = list(movie_ids)
+        self.discard(movie_ids)
+        self.load(session, where=schema.Movie.id.in_(movie_ids))
+
+    def load_new(self, session: Session):
+        """Appends the movies which were added since the last load.
+
+        SQLite gives a new movie an id greater than any present movie's id.
+
+        Args:
+            session:
+        """
+        live_ids = self.ids[self.alive]
+        last_id = int(live_ids.max()) if len(live_ids) else 0
+        self.load(session, where=schema.Movie.id > last_id)
+
+    def match_ids(self, match: MovieBag) -> "np.ndarray":
+        """Returns the ids of the matching movies.
+
+        The criteria have the same meaning as for tables.match_movies in
+        substring search mode. A substring containing one of LIKE's % or _
+        wildcards is matched literally.
+
+        Args:
+            match: See tables.match_movies.
+
+        Returns:
+            The ids of the matching movies in ascending order.
+        """
+        mask = self.alive.copy()
+        # The cheap criteria are applied first so that the substring searches
+        # only examine the rows which are still candidates.
+        for column, criteria in sorted(
+            match.items(), key=lambda item: CRITERIA_COSTS.get(item[0], 0)
+        ):
+            match column:
+                case "title" | "synopsis" | "notes":
+                    rows = np.flatnonzero(mask & self.has_texts[column])
+                    found = np.strings.find(self.texts[column][rows], _fold(criteria))
+                    mask[:] = False
+                    mask[rows[found >= 0]] = True
+                case "year":
+                    mask &= _in_ranges(self.years, criteria)
+                case "duration":
+                    mask &= _in_ranges(self.durations, criteria)
+                case "stars" | "directors":
+                    for name in criteria:
+                        mask = self._linked_to(
+                            self.links[column], self.names, name, mask=mask
+                        )
+                case "movie_tags":
+                    for tag_text in criteria:
+                        mask = self._linked_to(
+                            self.links[column], self.tag_texts, tag_text, mask=mask
+                        )
+        return np.sort(self.ids[mask])
+
+    def _linked_to(
+        self, links: Links, targets: "np.ndarray", match: str, *, mask: "np.ndarray"
+    ) -> "np.ndarray":
+        """Returns the mask of the candidate rows linked to a matching target.
+
+        If the candidates have fewer links than there are targets, only the
+        linked targets are searched.
+
+        Args:
+            links:
+            targets: The folded names or tag texts.
+            match: Substring.
+            mask: The candidate rows.
+        """
+        linked = mask[links.rows]
+        rows = links.rows[linked]
+        result = np.zeros(len(self.ids), dtype=bool)
+        if len(rows) < len(targets):
+            linked_targets, inverse = np.unique(
+                links.targets[linked], return_inverse=True
+            )
+            hits = np.strings.find(targets[linked_targets], _fold(match)) >= 0
+            result[rows[hits[inverse]]] = True
+        else:
+            hits = np.strings.find(targets, _fold(match)) >= 0
+            result[rows[hits[links.targets[linked]]]] = True
+        return result
+
+    def _append_links(self, key: str, *, links: list[tuple[int, int]], first_row: int):
+        """Appends the links of the rows loaded since first_row.
+
+        Args:
+            key: stars, directors, or movie_tags.
+            links: Pairs of movie row and target row.
+            first_row: The first of the new movie rows.
+        """
+        old = self.links[key]
+        rows = np.array([row for row, _ in links], dtype=np.int64)
+        targets = np.array([target for _, target in links], dtype=np.int64)
+        order = np.argsort(rows, kind="stable")
+        rows, targets = rows[order], targets[order]
+        counts = np.bincount(rows - first_row, minlength=len(self.ids) - first_row)
+        self.links[key] = Links(
+            offsets=np.concatenate((old.offsets, old.offsets[-1] + np.cumsum(counts))),
+            targets=np.concatenate((old.targets, targets)),
+            rows=np.concatenate((old.rows, rows)),
+        )
+
+
+def _fold(text: str) -> bytes:
+    """Returns the text encoded as UTF-8 with the case of its ASCII letters
+    folded as LIKE does."""
+    return text.translate(ASCII_FOLD).encode()
+
+
+def _append_targets(
+    session: Session,
+    statement: Select,
+    *,
+    targets: "np.ndarray",
+    target_rows: dict[int, int],
+    target_ids: set[int] | None,
+) -> "np.ndarray":
+    """Returns the targets with the folded texts of any new or renamed targets
+    appended.
+
+    Args:
+        session:
+        statement: Selects the id and text of a person or a tag.
+        targets: The folded names or tag texts.
+        target_rows: The target's row indexed by its database id. New targets
+            are added.
+        target_ids: The ids of the targets which must be present and current,
+            or None for every target in the database.
+    """
+    if target_ids is not None:
+        if not target_ids:
+            return targets
+        statement = statement.where(statement.selected_columns[0].in_(target_ids))
+
+    new = []
+    for target_id, text in session.execute(statement):
+        folded = _fold(text)
+        row = target_rows.get(target_id)
+        # SQLite may reuse the id of a deleted person for a new person.
+        if row is None or targets[row] != folded:
+            new.append((target_id, folded))
+    for ix, (target_id, _) in enumerate(new):
+        target_rows[target_id] = len(targets) + ix
+    values = np.array([folded for _, folded in new], dtype=np.bytes_)
+    return np.concatenate((targets, values))
+
+
+def _in_ranges(values: "np.ndarray", criteria: MovieInteger) -> "np.ndarray":
+    """Returns a mask of the values which are in any of the ranges.
+
+    Args:
+        values:
+        criteria:
+    """
+    mask = np.zeros(len(values), dtype=bool)
+    for low, high in criteria.ranges:
+        mask |= (values >= low) & (values <= high)
+    return mask
@@ -20,12 +20,33 @@ movies, tags, and people (directors and stars).
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import logging
-
-from sqlalchemy import select, intersect
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, asdict
+from itertools import batched
+
+from sqlalchemy import (
+    select,
+    insert,
+    delete,
+    exists,
+    tuple_,
+    text,
+    or_,
+    and_,
+    bindparam,
+    BindParameter,
+    Select,
+    Table,
+    Column,
+    ColumnElement,
+    func,
+)
 from sqlalchemy.exc import NoResultFound, IntegrityError
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm import Session, sessionmaker, selectinload, InstrumentedAttribute
 
-from database import schema
+from database import instrumentation, schema, snapshot
 from globalconstants import *
 
 MOVIE_NOT_FOUND = "No matching movies were found."
@@ -33,10 +54,73 @@ MOVIE_EXISTS = "This movie is already present in the database."
 INVALID_YEAR = "This year is likely incorrect."
 TAG_NOT_FOUND = "The tag was not found."
 TAG_EXISTS = "This tag is already present in the database."
+ADD_MOVIES_CHUNK_SIZE = 500
+PEOPLE_BY_NAME = "people_by_name"
+SUBSTRING_SEARCH = "substring"
+FULL_TEXT_SEARCH = "full text"
+PREFIX_SEARCH = "prefix"
+YIELD_PER_BATCH_SIZE = 1000
+PAGE_SIZE = 100
+SELECT_BY_ID_BATCH_SIZE = 1000
+SNAPSHOT_UNAVAILABLE_MSG = "The catalog snapshot requires NumPy which is not installed."
+STATS_MSG = "Database statistics"
 
 session_factory: sessionmaker[Session] | None = None
 
 
+@dataclass
+class CacheStats:
+    """Hit and miss counts of an in-process cache."""
+
+    hits: int = 0
+    misses: int = 0
+
+
+# The tag cache holds the tag texts of the database bound to session_factory.
+# Every tag write through this module bumps the version, so select_all_tags
+# never returns texts read before the latest write.
+tag_cache_stats = CacheStats()
+_tag_cache_version = 0
+_tag_cache: tuple[sessionmaker, int, frozenset[str]] | None = None
+
+# The match cache holds the results of the most recent match_movies calls for
+# the database bound to session_factory. Every write through this module bumps
+# the write generation, which empties the cache. The handlers call this module
+# from the threadpool so the cache is only changed while holding its lock.
+MATCH_CACHE_SIZE = 128
+match_cache_stats = CacheStats()
+write_generation = 0
+_match_cache: OrderedDict[tuple, list[MovieBag]] = OrderedDict()
+_match_cache_owner: tuple[sessionmaker, int] | None = None
+_match_cache_lock = threading.Lock()
+
+# The statement cache holds a match statement for each shape of match criteria.
+# See _match_shape. The criteria values are bound parameters, so a statement is
+# reused for every search of the same shape. Reusing the statement object also
+# reuses its memoized key into SQLAlchemy's compiled cache.
+STATEMENT_CACHE_SIZE = 64
+statement_cache_stats = CacheStats()
+_statement_cache: OrderedDict[tuple, Select] = OrderedDict()
+_statement_cache_lock = threading.Lock()
+
+# The optional in-memory catalog snapshot of the database bound to
+# session_factory. See enable_snapshot. Writes change the snapshot's arrays in
+# place while searches on other threads read them, so the snapshot is only
+# built, changed, read, or dropped while holding its lock.
+_snapshot_enabled = False
+_catalog_snapshot: tuple[sessionmaker, "snapshot.CatalogSnapshot"] | None = None
+_snapshot_lock = threading.Lock()
+
+# Loads every relationship read by _convert_to_movie_bag with one extra SELECT per
+# relationship instead of three lazy loads per movie.
+MOVIE_BAG_LOADER_OPTIONS = (
+    selectinload(schema.Movie.stars),
+    selectinload(schema.Movie.directors),
+    selectinload(schema.Movie.tags),
+)
+
+
+@instrumentation.instrumented
 def select_movie(*, movie_bag: MovieBag) -> MovieBag:
     """Selects and returns a single movie.
 
@@ -77,12 +161,7 @@ def select_movie(*, movie_bag: MovieBag) -> MovieBag:
             movie = _select_movie(session, movie_bag=movie_bag)
 
         except NoResultFound as exc:
-            title = movie_bag["title"]
-            year = movie_bag["year"]
-            logging.error(f"{MOVIE_NOT_FOUND} {title}, {year}.")
-            exc.add_note(MOVIE_NOT_FOUND)
-            exc.add_note(title)
-            exc.add_note(str(int(year)))
+            _note_movie_not_found(exc, title=movie_bag["title"], year=movie_bag["year"])
             raise
 
         movie_bag = _convert_to_movie_bag(movie)
@@ -90,6 +169,7 @@ def select_movie(*, movie_bag: MovieBag) -> MovieBag:
     return movie_bag
 
 
+@instrumentation.instrumented
 def select_all_movies() -> list[MovieBag]:
     """Selects and returns all movies."""
     with session_factory() as session:
@@ -100,7 +180,15 @@ def select_all_movies() -> list[MovieBag]:
     return movie_bags
 
 
-def match_movies(match: MovieBag) -> list[MovieBag]:
+@instrumentation.instrumented
+def count_movies() -> int:
+    """Returns the number of movies."""
+    with session_factory() as session:
+        return session.scalar(select(func.count()).select_from(schema.Movie))
+
+
+@instrumentation.instrumented
+def match_movies(match: MovieBag, *, mode: str = SUBSTRING_SEARCH) -> list[MovieBag]:
     """Selects and returns the intersection of matching movies.
 
     Match patterns are specified in a MovieBag object which can contain none, any,
@@ -135,18 +223,145 @@ def match_movies(match: MovieBag) -> list[MovieBag]:
                     {'ethel', 'worth'} will match
                     {'ethel', 'bogart'} will not match.
             Contains match. A movie.year of `1955 in MovieInteger('1950-1960')` is a match.
+        mode:
+            SUBSTRING_SEARCH. The default. Title, synopsis, and notes use
+                substring matches.
+            FULL_TEXT_SEARCH. Title, synopsis, and notes use the full text index.
+                Every word of the criteria must match the start of a word in the
+                field. 'brid riv' will match 'Bridge on the River Kwai'. The
+                movies are returned in order of relevance.
+            PREFIX_SEARCH. Title, stars, and directors match the start of the
+                field ignoring the case of ASCII letters. A leading 'The', 'An',
+                or 'A' of a title is ignored so 'river' and 'the riv' will both
+                match 'The River'. Each search is a range scan of the title_key
+                or name_key index. Synopsis and notes use substring matches.
 
     Returns:
         The intersection of the records selected by each field's search criteria.
+        Repeated searches are served from the match cache until the next write.
+        If the catalog snapshot is enabled substring searches are filtered in
+        memory and only the matching movies are read from the database.
     """
+    global _match_cache_owner
+    owner = session_factory, write_generation
+    key = _match_cache_key(match, mode=mode)
+    with _match_cache_lock:
+        if owner != _match_cache_owner:
+            _match_cache.clear()
+            _match_cache_owner = owner
+        movie_bags = _match_cache.get(key)
+        if movie_bags is not None:
+            match_cache_stats.hits += 1
+            _match_cache.move_to_end(key)
+        else:
+            match_cache_stats.misses += 1
+
+    if movie_bags is None:
+        with session_factory() as session:
+            if _snapshot_enabled and mode == SUBSTRING_SEARCH:
+                with _snapshot_lock:
+                    ids = _get_snapshot(session).match_ids(match)
+                movies = _select_movies_by_id(session, ids=ids.tolist())
+            else:
+                movies = _match_movies(session, match=match, mode=mode)
+            movie_bags = [  # pragma no branch
+                _convert_to_movie_bag(movie) for movie in movies
+            ]
+        with _match_cache_lock:
+            # A write which committed during the read has changed the owner.
+            if owner == _match_cache_owner:
+                _match_cache[key] = movie_bags
+                if len(_match_cache) > MATCH_CACHE_SIZE:
+                    _match_cache.popitem(last=False)
+
+    return [_copy_movie_bag(movie_bag) for movie_bag in movie_bags]
+
+
+def iter_all_movies(*, batch_size: int = YIELD_PER_BATCH_SIZE) -> Iterator[MovieBag]:
+    """Yields all movies.
+
+    This is the streaming version of select_all_movies. Movies are read and
+    converted in batches of batch_size so memory does not grow with the size of
+    the catalog. The session remains open until the generator is exhausted or
+    closed.
+
+    Args:
+        batch_size: The number of rows fetched from the database at a time.
+    """
+    statement = select(schema.Movie).options(*MOVIE_BAG_LOADER_OPTIONS)
+    with session_factory() as session:
+        yield from _iter_movie_bags(session, statement=statement, batch_size=batch_size)
+
+
+def iter_match_movies(
+    match: MovieBag,
+    *,
+    mode: str = SUBSTRING_SEARCH,
+    batch_size: int = YIELD_PER_BATCH_SIZE,
+) -> Iterator[MovieBag]:
+    """Yields matching movies.
+
+    This is the streaming version of match_movies. Movies are read and
+    converted in batches of batch_size. The session remains open until the
+    generator is exhausted or closed.
+
+    Args:
+        match: See match_movies.
+        mode: See match_movies.
+        batch_size: The number of rows fetched from the database at a time.
+    """
+    match_statement = _match_movies_statement(match=match, mode=mode)
+    if match_statement is None:
+        return
+    statement, parameters = match_statement
+    with session_factory() as session:
+        yield from _iter_movie_bags(
+            session, statement=statement, batch_size=batch_size, parameters=parameters
+        )
+
+
+@instrumentation.instrumented
+def page_movies(
+    *,
+    match: MovieBag = None,
+    cursor: tuple[str, int] = None,
+    page_size: int = PAGE_SIZE,
+    mode: str = SUBSTRING_SEARCH,
+) -> tuple[list[MovieBag], tuple[str, int] | None]:
+    """Returns one page of movies in title and year order.
+
+    This uses keyset pagination. Each page starts after the title and year of
+    the cursor, so the cost of a page does not depend on how far into the
+    result set it lies, and rows added or deleted between calls do not cause
+    rows to be skipped or repeated.
+
+    Args:
+        match: See match_movies. Every movie is paged if this is empty.
+        cursor: The cursor returned with the previous page. None for the first
+            page.
+        page_size: The maximum number of movies in a page.
+        mode: See match_movies. Full text matches are returned in title and
+            year order, not in order of relevance.
+
+    Returns:
+        A list of movie bags.
+        The cursor for the next page or None if this is the last page.
+    """
+    page_statement = _page_movies_statement(
+        match=match, cursor=cursor, page_size=page_size, mode=mode
+    )
+    if page_statement is None:
+        return _page([], more=False)
+    statement, parameters = page_statement
     with session_factory() as session:
-        movies = _match_movies(session, match=match)
+        movies = session.scalars(statement, parameters).all()
         movie_bags = [  # pragma no branch
-            _convert_to_movie_bag(movie) for movie in movies
+            _convert_to_movie_bag(movie) for movie in movies[:page_size]
         ]
-    return movie_bags
+    return _page(movie_bags, more=len(movies) > page_size)
 
 
+@instrumentation.instrumented
 def add_movie(*, movie_bag: MovieBag):
     """Adds a movie.
 
@@ -182,31 +397,70 @@ def add_movie(*, movie_bag: MovieBag):
             INVALID_YEAR literal,
             movie year.
     """
-    try:
-        with session_factory() as session:
-            movie = _add_movie(movie_bag=movie_bag)
-            session.add(movie)
-            update_movie_relationships(movie, movie_bag, session)
-            session.commit()
+    with session_factory() as session:
+        _commit_add_movie(session, movie_bag=movie_bag)
 
-    except IntegrityError as exc:
-        if "UNIQUE constraint failed: movie.title, movie.year" in exc.args[0]:
-            logging.error(f"{MOVIE_EXISTS} {movie.title}, {movie.year}.")
-            exc.add_note(MOVIE_EXISTS)
-            exc.add_note(movie.title)
-            exc.add_note(str(int(movie.year)))
-            raise
 
-        elif "CHECK constraint failed: year" in exc.args[0]:
-            logging.error(f"{INVALID_YEAR}. {movie.year}.")
-            exc.add_note(INVALID_YEAR)
-            exc.add_note(str(int(movie.year)))
-            raise
+@instrumentation.instrumented
+def add_movies(
+    *,
+    movie_bags: Iterable[MovieBag],
+    chunk_size: int = ADD_MOVIES_CHUNK_SIZE,
+    checkpoint: str = None,
+    progress: Callable[[int], None] = None,
+) -> list[tuple[MovieBag, NoResultFound | IntegrityError]]:
+    """Adds many movies.
 
-        else:  # pragma nocover
-            raise
+    This is the bulk version of add_movie. The movie bags are processed in
+    chunks of chunk_size. Every person and tag of a chunk is resolved with a
+    few set based queries. The movies and their link rows are inserted with
+    executemany, and each chunk is committed in its own transaction.
+
+    A movie bag which would fail in add_movie is not added. The rest of its
+    chunk is unaffected.
+
+    If checkpoint is given the movie bags are those of an update from an old
+    database in the order of their old ids. The migration checkpoint of the
+    old version is advanced in each chunk's transaction. See
+    select_checkpoint.
+
+    Args:
+        movie_bags:
+            id: ignored unless checkpoint is given, when it is the old id.
+            created: ignored
+            updated: ignored
+            title: required
+            year: required
+            duration: optional
+            directors: optional
+            stars: optional
+            synopsis: optional
+            notes: optional
+            movie_tags: optional
+        chunk_size: The number of movie bags committed in one transaction.
+        checkpoint: The old version of a database update.
+        progress: Called after each commit with the number of movie bags in
+            the chunk, including any which were rejected.
+
+    Returns:
+        A list of the rejected movie bags each with the exception that add_movie
+        would have raised. The exceptions are logged and carry the same notes as
+        those of add_movie:
+            TAG_NOT_FOUND, MOVIE_EXISTS, or INVALID_YEAR literal,
+            followed by the tag text or the movie title and year.
+    """
+    rejects = []
+    for chunk in batched(movie_bags, chunk_size):
+        with session_factory() as session:
+            rejects.extend(
+                _commit_add_movies(session, movie_bags=chunk, checkpoint=checkpoint)
+            )
+        if progress:
+            progress(len(chunk))
+    return rejects
 
 
+@instrumentation.instrumented
 def edit_movie(*, old_movie_bag: MovieBag, replacement_fields: MovieBag):
     """Edits a movie. Most often.
 
@@ -261,43 +515,10 @@ def edit_movie(*, old_movie_bag: MovieBag, replacement_fields: MovieBag):
             INVALID_YEAR literal,
             movie year.
     """
-    title = replacement_fields.get("title")
-    year = replacement_fields.get("year")
-
-    try:
-        with session_factory() as session:
-            try:
-                movie = _select_movie(session, movie_bag=old_movie_bag)
-
-            except NoResultFound as exc:
-                logging.error(f"{MOVIE_NOT_FOUND} {title}, {year}.")
-                exc.add_note(MOVIE_NOT_FOUND)
-                exc.add_note(title)
-                exc.add_note(str(int(year)))
-                raise
-
-            candidate_orphans = movie.directors | movie.stars
-            _edit_movie(movie=movie, edit_fields=replacement_fields)
-            update_movie_relationships(movie, replacement_fields, session)
-            _delete_orphans(session, candidates=candidate_orphans)
-            session.commit()
-
-    except IntegrityError as exc:
-        if "UNIQUE constraint failed: movie.title, movie.year" in exc.args[0]:
-            logging.error(f"{MOVIE_EXISTS} {title}, {year}.")
-            exc.add_note(MOVIE_EXISTS)
-            exc.add_note(title)
-            exc.add_note(str(int(year)))
-            raise
-
-        elif "CHECK constraint failed: year" in exc.args[0]:
-            logging.error(f"{INVALID_YEAR} {year}.")
-            exc.add_note(INVALID_YEAR)
-            exc.add_note(str(int(year)))
-            raise
-
-        else:  # pragma nocover
-            raise
+    with session_factory() as session:
+        _commit_edit_movie(
+            session, old_movie_bag=old_movie_bag, replacement_fields=replacement_fields
+        )
 
 
 def update_movie_relationships(
@@ -337,6 +558,7 @@ def update_movie_relationships(
         movie.stars = _getadd_people(session, names=stars)
 
 
+@instrumentation.instrumented
 def delete_movie(*, movie_bag: MovieBag):
     """Deletes a movie.
 
@@ -365,22 +587,10 @@ def delete_movie(*, movie_bag: MovieBag):
 
     """
     with session_factory() as session:
-        try:
-            movie = _select_movie(session, movie_bag=movie_bag)
-        except NoResultFound:
-            # The movie has been deleted by another process, but we still
-            # need to remove the orphans.
-            directors = movie_bag.get("directors", set())
-            stars = movie_bag.get("stars", set())
-            candidate_orphans = set(_select_people(session, names=stars | directors))
-        else:
-            candidate_orphans = movie.directors | movie.stars
-            _delete_movie(session, movie=movie)
-
-        _delete_orphans(session, candidates=candidate_orphans)
-        session.commit()
+        _commit_delete_movie(session, movie_bag=movie_bag)
 
 
+@instrumentation.instrumented
 def delete_all_orphans():
     """Deletes all orphans.
 
@@ -390,23 +600,35 @@ def delete_all_orphans():
         created in ths manner.
     """
     with session_factory() as session:
-        all_people = _select_all_people(session)
-        count = _delete_orphans(session, candidates=all_people)
-        if count:  # pragma no branch
-            logging.info(
-                f"{count} Orphan(s) were removed. "
-                f"They should have been removed before now."
-            )
-        session.commit()
+        _commit_delete_all_orphans(session)
 
 
+@instrumentation.instrumented
 def select_all_tags() -> set[str]:
-    """Returns a list of all tag texts."""
-    with session_factory() as session:
-        tags = _select_all_tags(session)
-    return {tag.text for tag in tags}  # pragma no branch
-
+    """Returns a set of all tag texts.
 
+    The texts are read through the tag cache. Only the first call after a tag
+    write reads the database.
+    """
+    global _tag_cache
+    match _tag_cache:
+        case (factory, version, texts) if (
+            factory is session_factory and version == _tag_cache_version
+        ):
+            tag_cache_stats.hits += 1
+        case _:
+            tag_cache_stats.misses += 1
+            # The version is read before the tags. A write which commits
+            # during the read will bump the version and force another read.
+            version = _tag_cache_version
+            with session_factory() as session:
+                tags = _select_all_tags(session)
+            texts = frozenset(tag.text for tag in tags)  # pragma no branch
+            _tag_cache = session_factory, version, texts
+    return set(texts)
+
+
+@instrumentation.instrumented
 def match_tags(*, match: str) -> set[str]:
     """Returns tag texts which match the substring.
 
@@ -421,36 +643,29 @@ def match_tags(*, match: str) -> set[str]:
     return {tag.text for tag in tags}  # pragma no branch
 
 
+@instrumentation.instrumented
 def add_tag(*, tag_text: str):
     """Adds a tag.
 
     Args:
         tag_text:
     """
-    try:
-        with session_factory() as session:
-            _add_tag(session, text=tag_text)
-            session.commit()
-    except IntegrityError:
-        # Identical tags are silently suppressed.
-        pass
+    with session_factory() as session:
+        _commit_add_tag(session, text=tag_text)
 
 
+@instrumentation.instrumented
 def add_tags(*, tag_texts: set[str]):
     """Adds a list of tags.
 
     Args:
         tag_texts:
     """
-    try:
-        with session_factory() as session:
-            _add_tags(session, texts=tag_texts)
-            session.commit()
-    except IntegrityError:
-        # Identical tags are silently suppressed.
-        pass
+    with session_factory() as session:
+        _commit_add_tags(session, texts=tag_texts)
 
 
+@instrumentation.instrumented
 def edit_tag(*, old_tag_text: str, new_tag_text: str):
     """This function edits the text of an existing tag.
 
@@ -473,26 +688,11 @@ def edit_tag(*, old_tag_text: str, new_tag_text: str):
             TAG_EXISTS literal,
             new tag text.
     """
-    try:
-        with session_factory() as session:
-            try:
-                tag = _select_tag(session, text=old_tag_text)
-            except NoResultFound as exc:
-                logging.error(TAG_NOT_FOUND, old_tag_text)
-                exc.add_note(TAG_NOT_FOUND)
-                exc.add_note(old_tag_text)
-                raise
-            else:
-                _edit_tag(tag=tag, replacement_text=new_tag_text)
-            session.commit()
-
-    except IntegrityError as exc:
-        logging.error(TAG_EXISTS, new_tag_text)
-        exc.add_note(TAG_EXISTS)
-        exc.add_note(new_tag_text)
-        raise
+    with session_factory() as session:
+        _commit_edit_tag(session, old_tag_text=old_tag_text, new_tag_text=new_tag_text)
 
 
+@instrumentation.instrumented
 def delete_tag(*, tag_text: str):
     """Delete a tag.
 
@@ -502,14 +702,575 @@ def delete_tag(*, tag_text: str):
         tag_text:
     """
     with session_factory() as session:
+        _commit_delete_tag(session, tag_text=tag_text)
+
+
+@instrumentation.instrumented
+def select_checkpoint(*, old_version: str) -> tuple[int, int]:
+    """Returns the migration checkpoint of an update from an old database.
+
+    Args:
+        old_version: example 'DBv1'
+
+    Returns:
+        The largest old movie id which has been migrated.
+        The number of old movies which have been migrated.
+        Both are zero if there is no checkpoint.
+    """
+    with session_factory() as session:
+        checkpoint = session.get(schema.MigrationCheckpoint, old_version)
+        if checkpoint is None:
+            return 0, 0
+        return checkpoint.last_old_id, checkpoint.done
+
+
+@instrumentation.instrumented
+def delete_checkpoint(*, old_version: str):
+    """Deletes the migration checkpoint of a completed update.
+
+    Args:
+        old_version:
+    """
+    with session_factory() as session:
+        session.execute(
+            delete(schema.MigrationCheckpoint).where(
+                schema.MigrationCheckpoint.old_version == old_version
+            )
+        )
+        session.commit()
+
+
+def enable_snapshot() -> bool:
+    """Enables the in-memory catalog snapshot for substring searches.
+
+    The snapshot is built by the first substring search after this call. The
+    write functions of this module keep it up to date.
+
+    Returns:
+        False if the snapshot is not available because NumPy is not installed.
+    """
+    global _snapshot_enabled
+    if not snapshot.AVAILABLE:  # pragma nocover
+        logging.info(SNAPSHOT_UNAVAILABLE_MSG)
+        return False
+    _snapshot_enabled = True
+    return True
+
+
+def disable_snapshot():
+    """Disables the in-memory catalog snapshot and releases its memory."""
+    global _snapshot_enabled, _catalog_snapshot
+    _snapshot_enabled = False
+    with _snapshot_lock:
+        _catalog_snapshot = None
+
+
+def enable_stats():
+    """Enables the statement timing of this module's functions.
+
+    See stats. The overhead is negligible while the timing is disabled.
+    """
+    instrumentation.enable()
+
+
+def disable_stats():
+    """Disables the statement timing. The statistics are kept."""
+    instrumentation.disable()
+
+
+def stats() -> dict[str, dict]:
+    """Returns the statistics of this module.
+
+    The statement timing records the calls of the public functions while it is
+    enabled. The streaming functions iter_all_movies and iter_match_movies
+    are not recorded.
+
+    Returns:
+        calls: A summary of each function called. See
+            instrumentation.CallStats.summary. Its rows_changed count is of
+            the rows inserted, updated, or deleted as reported by the driver.
+            Selected rows are not counted.
+        tag_cache: The hits and misses of the tag cache.
+        match_cache: The hits and misses of the match cache.
+        statement_cache: The hits and misses of the match statement cache.
+    """
+    return dict(
+        calls=instrumentation.summary(),
+        tag_cache=asdict(tag_cache_stats),
+        match_cache=asdict(match_cache_stats),
+        statement_cache=asdict(statement_cache_stats),
+    )
+
+
+def log_stats():
+    """Logs the statistics of this module. See stats."""
+    statistics = stats()
+    for name, summary in sorted(statistics["calls"].items()):
+        logging.info(f"{STATS_MSG} {name}: {summary}")
+    logging.info(
+        f"{STATS_MSG} tag cache: {statistics['tag_cache']}, "
+        f"match cache: {statistics['match_cache']}, "
+        f"statement cache: {statistics['statement_cache']}"
+    )
+
+
+def _invalidate_caches(*, tags: bool = False):
+    """Invalidates the in-process caches after a committed write.
+
+    A write which changes movies must call _update_snapshot first. A search
+    which sees the new write generation then also sees the updated snapshot,
+    so it cannot cache stale rows under the new generation.
+
+    Args:
+        tags: True if the write changed the tag table. The catalog snapshot is
+            dropped and will be rebuilt by the next search.
+    """
+    global write_generation, _tag_cache_version, _catalog_snapshot
+    if tags:
+        with _snapshot_lock:
+            _catalog_snapshot = None
+        _tag_cache_version += 1
+    write_generation += 1
+
+
+def _get_snapshot(session: Session) -> "snapshot.CatalogSnapshot":
+    """Returns the catalog snapshot, building it if necessary.
+
+    The caller must hold _snapshot_lock while it uses the snapshot.
+
+    Args:
+        session:
+    """
+    global _catalog_snapshot
+    match _catalog_snapshot:
+        case (factory, catalog) if factory is session_factory:
+            return catalog
+    catalog = snapshot.CatalogSnapshot()
+    catalog.load(session)
+    _catalog_snapshot = session_factory, catalog
+    return catalog
+
+
+def _update_snapshot(
+    session: Session,
+    *,
+    added: bool = False,
+    edited: set[int] = frozenset(),
+    deleted: set[int] = frozenset(),
+):
+    """Brings a built catalog snapshot up to date after a committed write.
+
+    Args:
+        session:
+        added: True if movies were added.
+        edited: The ids of edited movies.
+        deleted: The ids of deleted movies.
+    """
+    with _snapshot_lock:
+        match _catalog_snapshot:
+            case (factory, catalog) if factory is session_factory:
+                if deleted:
+                    catalog.discard(deleted)
+                if edited:
+                    catalog.refresh(session, movie_ids=edited)
+                if added:
+                    catalog.load_new(session)
+
+
+def _select_movies_by_id(session: Session, *, ids: list[int]) -> list[schema.Movie]:
+    """Selects and returns ORM movies by id.
+
+    Args:
+        session:
+        ids:
+
+    Returns:
+        The movies with eager loading of their relationships.
+    """
+    movies = []
+    for chunk in batched(ids, SELECT_BY_ID_BATCH_SIZE):
+        statement = (
+            select(schema.Movie)
+            .where(schema.Movie.id.in_(chunk))
+            .options(*MOVIE_BAG_LOADER_OPTIONS)
+        )
+        movies.extend(session.scalars(statement).all())
+    return movies
+
+
+def _match_cache_key(match: MovieBag, *, mode: str) -> tuple:
+    """Returns a canonical and hashable form of the match criteria.
+
+    Equivalent criteria have the same key. The string fields are used as
+    they are, the set fields are frozen, and a MovieInteger is reduced to its
+    ranges, so MovieInteger('1950-1955') and MovieInteger('1950-1952,
+    1953-1955') are the same.
+
+    Args:
+        match: See match_movies.
+        mode: See match_movies.
+    """
+    criteria = []
+    for column, value in sorted(match.items()):
+        if isinstance(value, MovieInteger):
+            value = tuple(value.ranges)
+        elif isinstance(value, Iterable) and not isinstance(value, str):
+            value = frozenset(value)
+        criteria.append((column, value))
+    return mode, tuple(criteria)
+
+
+def _copy_movie_bag(movie_bag: MovieBag) -> MovieBag:
+    """Returns a copy of a cached movie bag which the caller can change.
+
+    The sets are copied. Strings, datetimes, and MovieIntegers are shared as
+    they are not changed in place.
+
+    Args:
+        movie_bag:
+    """
+    return MovieBag(
+        **{
+            key: value.copy() if key in ("directors", "stars", "movie_tags") else value
+            for key, value in movie_bag.items()
+        }
+    )
+
+
+def _commit_add_movie(session: Session, *, movie_bag: MovieBag):
+    """Adds a movie and commits the session.
+
+    Args:
+        session:
+        movie_bag: See add_movie.
+
+    Raises and logs:
+        See add_movie.
+    """
+    movie = _add_movie(movie_bag=movie_bag)
+    try:
+        session.add(movie)
+        update_movie_relationships(movie, movie_bag, session)
+        session.commit()
+
+    except IntegrityError as exc:
+        if "UNIQUE constraint failed: movie.title, movie.year" in exc.args[0]:
+            logging.error(f"{MOVIE_EXISTS} {movie.title}, {movie.year}.")
+            exc.add_note(MOVIE_EXISTS)
+            exc.add_note(movie.title)
+            exc.add_note(str(int(movie.year)))
+            raise
+
+        elif "CHECK constraint failed: year" in exc.args[0]:
+            logging.error(f"{INVALID_YEAR}. {movie.year}.")
+            exc.add_note(INVALID_YEAR)
+            exc.add_note(str(int(movie.year)))
+            raise
+
+        else:  # pragma nocover
+            raise
+
+    _update_snapshot(session, added=True)
+    _invalidate_caches()
+
+
+def _commit_add_movies(
+    session: Session, *, movie_bags: Sequence[MovieBag], checkpoint: str = None
+) -> list[tuple[MovieBag, NoResultFound | IntegrityError]]:
+    """Adds one chunk of movies and commits the session.
+
+    Args:
+        session:
+        movie_bags: See add_movies.
+        checkpoint: See add_movies.
+
+    Returns:
+        The rejected movie bags. See add_movies.
+    """
+    rejects = _add_movies(session, movie_bags=movie_bags)
+    if checkpoint:
+        _advance_checkpoint(session, old_version=checkpoint, movie_bags=movie_bags)
+    session.commit()
+    _update_snapshot(session, added=True)
+    _invalidate_caches()
+    return rejects
+
+
+def _advance_checkpoint(
+    session: Session, *, old_version: str, movie_bags: Sequence[MovieBag]
+):
+    """Records a chunk of migrated movies in the migration checkpoint.
+
+    Args:
+        session:
+        old_version:
+        movie_bags: Movie bags whose ids are their old ids.
+    """
+    checkpoint = session.get(schema.MigrationCheckpoint, old_version)
+    if checkpoint is None:
+        checkpoint = schema.MigrationCheckpoint(
+            old_version=old_version, last_old_id=0, done=0
+        )
+        session.add(checkpoint)
+    checkpoint.last_old_id = max(
+        checkpoint.last_old_id, *(movie_bag["id"] for movie_bag in movie_bags)
+    )
+    checkpoint.done += len(movie_bags)
+
+
+def _commit_edit_movie(
+    session: Session, *, old_movie_bag: MovieBag, replacement_fields: MovieBag
+):
+    """Edits a movie and commits the session.
+
+    Args:
+        session:
+        old_movie_bag: See edit_movie.
+        replacement_fields: See edit_movie.
+
+    Raises and logs:
+        See edit_movie.
+    """
+    title = replacement_fields.get("title")
+    year = replacement_fields.get("year")
+
+    try:
+        try:
+            movie = _select_movie(session, movie_bag=old_movie_bag)
+
+        except NoResultFound as exc:
+            _note_movie_not_found(exc, title=title, year=year)
+            raise
+
+        movie_id = movie.id
+        candidate_ids = {person.id for person in movie.directors | movie.stars}
+        _edit_movie(movie=movie, edit_fields=replacement_fields)
+        update_movie_relationships(movie, replacement_fields, session)
+        _delete_orphans(session, candidate_ids=candidate_ids)
+        session.commit()
+
+    except IntegrityError as exc:
+        if "UNIQUE constraint failed: movie.title, movie.year" in exc.args[0]:
+            logging.error(f"{MOVIE_EXISTS} {title}, {year}.")
+            exc.add_note(MOVIE_EXISTS)
+            exc.add_note(title)
+            exc.add_note(str(int(year)))
+            raise
+
+        elif "CHECK constraint failed: year" in exc.args[0]:
+            logging.error(f"{INVALID_YEAR} {year}.")
+            exc.add_note(INVALID_YEAR)
+            exc.add_note(str(int(year)))
+            raise
+
+        else:  # pragma nocover
+            raise
+
+    _update_snapshot(session, edited={movie_id})
+    _invalidate_caches()
+
+
+def _commit_delete_movie(session: Session, *, movie_bag: MovieBag):
+    """Deletes a movie and its orphans and commits the session.
+
+    Args:
+        session:
+        movie_bag: See delete_movie.
+    """
+    try:
+        movie = _select_movie(session, movie_bag=movie_bag)
+    except NoResultFound:
+        # The movie has been deleted by another process, but we still
+        # need to remove the orphans.
+        directors = movie_bag.get("directors", set())
+        stars = movie_bag.get("stars", set())
+        candidate_ids = select(schema.Person.id).where(
+            schema.Person.name.in_(stars | directors)
+        )
+        deleted_ids = set()
+    else:
+        candidate_ids = {person.id for person in movie.directors | movie.stars}
+        deleted_ids = {movie.id}
+        _delete_movie(session, movie=movie)
+
+    _delete_orphans(session, candidate_ids=candidate_ids)
+    session.commit()
+    _update_snapshot(session, deleted=deleted_ids)
+    _invalidate_caches()
+
+
+def _commit_delete_all_orphans(session: Session):
+    """Deletes all orphans and commits the session.
+
+    Args:
+        session:
+    """
+    count = _delete_orphans(session)
+    if count:  # pragma no branch
+        logging.info(
+            f"{count} Orphan(s) were removed. "
+            f"They should have been removed before now."
+        )
+    session.commit()
+    _invalidate_caches()
+
+
+def _commit_add_tag(session: Session, *, text: str):
+    """Adds a tag and commits the session.
+
+    Args:
+        session:
+        text:
+    """
+    try:
+        _add_tag(session, text=text)
+        session.commit()
+    except IntegrityError:
+        # Identical tags are silently suppressed.
+        return
+    _invalidate_caches(tags=True)
+
+
+def _commit_add_tags(session: Session, *, texts: set[str]):
+    """Adds tags and commits the session.
+
+    Args:
+        session:
+        texts:
+    """
+    try:
+        _add_tags(session, texts=texts)
+        session.commit()
+    except IntegrityError:
+        # Identical tags are silently suppressed.
+        return
+    _invalidate_caches(tags=True)
+
+
+def _commit_edit_tag(session: Session, *, old_tag_text: str, new_tag_text: str):
+    """Edits the text of a tag and commits the session.
+
+    Args:
+        session:
+        old_tag_text:
+        new_tag_text:
+
+    Raises and logs:
+        See edit_tag.
+    """
+    try:
         try:
-            tag = _select_tag(session, text=tag_text)
-        except NoResultFound:
-            pass
+            tag = _select_tag(session, text=old_tag_text)
+        except NoResultFound as exc:
+            logging.error(TAG_NOT_FOUND, old_tag_text)
+            exc.add_note(TAG_NOT_FOUND)
+            exc.add_note(old_tag_text)
+            raise
         else:
-            _delete_tag(session, tag=tag)
+            _edit_tag(tag=tag, replacement_text=new_tag_text)
         session.commit()
 
+    except IntegrityError as exc:
+        logging.error(TAG_EXISTS, new_tag_text)
+        exc.add_note(TAG_EXISTS)
+        exc.add_note(new_tag_text)
+        raise
+
+    _invalidate_caches(tags=True)
+
+
+def _commit_delete_tag(session: Session, *, tag_text: str):
+    """Deletes a tag if it is present and commits the session.
+
+    Args:
+        session:
+        tag_text:
+    """
+    try:
+        tag = _select_tag(session, text=tag_text)
+    except NoResultFound:
+        pass
+    else:
+        _delete_tag(session, tag=tag)
+    session.commit()
+    _invalidate_caches(tags=True)
+
+
+def _note_movie_not_found(exc: NoResultFound, *, title: str, year: MovieInteger):
+    """Logs a missing movie and adds the notes to the exception.
+
+    The added note list will contain:
+        MOVIE_NOT_FOUND literal,
+        movie title,
+        movie year.
+
+    Args:
+        exc:
+        title:
+        year:
+    """
+    logging.error(f"{MOVIE_NOT_FOUND} {title}, {year}.")
+    exc.add_note(MOVIE_NOT_FOUND)
+    exc.add_note(title)
+    exc.add_note(str(int(year)))
+
+
+def _page_movies_statement(
+    *,
+    match: MovieBag | None,
+    cursor: tuple[str, int] | None,
+    page_size: int,
+    mode: str,
+) -> tuple[Select, dict[str, str | int]] | None:
+    """Returns a statement which selects one page of movies.
+
+    One more movie than the page size is selected so the caller can tell if
+    there is a next page.
+
+    Args:
+        match: See page_movies.
+        cursor: See page_movies.
+        page_size: See page_movies.
+        mode: See page_movies.
+
+    Returns:
+        The statement and the values of its bound parameters, or None if match
+        is not empty but has no criteria.
+    """
+    parameters = {}
+    if match:
+        match_statement = _match_movies_statement(match=match, mode=mode)
+        if match_statement is None:
+            return None
+        statement, parameters = match_statement
+    else:
+        statement = select(schema.Movie).options(*MOVIE_BAG_LOADER_OPTIONS)
+    statement = (
+        statement.order_by(None)
+        .order_by(schema.Movie.title, schema.Movie.year)
+        .limit(page_size + 1)
+    )
+    if cursor:
+        statement = statement.where(
+            tuple_(schema.Movie.title, schema.Movie.year) > tuple_(*cursor)
+        )
+    return statement, parameters
+
+
+def _page(
+    movie_bags: list[MovieBag], *, more: bool
+) -> tuple[list[MovieBag], tuple[str, int] | None]:
+    """Returns a page of movie bags with the cursor of the next page.
+
+    Args:
+        movie_bags: The movies of the page.
+        more: True if there are movies after this page.
+    """
+    next_cursor = None
+    if more:
+        next_cursor = movie_bags[-1]["title"], int(movie_bags[-1]["year"])
+    return movie_bags, next_cursor
+
 
 def _select_movie(session: Session, *, movie_bag: MovieBag) -> schema.Movie:
     """Selects and returns a single ORM movie.
@@ -546,14 +1307,18 @@ def _select_movie(session: Session, *, movie_bag: MovieBag) -> schema.Movie:
 def _select_all_movies(session: Session) -> set[schema.Movie]:
     """Selects and returns all ORM movies.
 
+    The stars, directors, and tags relationships are eagerly loaded.
+
     Args:
         session:
     """
-    statement = select(schema.Movie)
+    statement = select(schema.Movie).options(*MOVIE_BAG_LOADER_OPTIONS)
     return set(session.scalars(statement).all())
 
 
-def _match_movies(session: Session, *, match: MovieBag) -> set[schema.Movie] | None:
+def _match_movies(
+    session: Session, *, match: MovieBag, mode: str = SUBSTRING_SEARCH
+) -> list[schema.Movie]:
     """Selects and returns matching ORM movies.
 
     Args:
@@ -583,75 +1348,279 @@ def _match_movies(session: Session, *, match: MovieBag) -> set[schema.Movie] | N
                     {'ethel', 'worth'} will match
                     {'ethel', 'bogart'} will not match.
             Contains match. A movie.year of `1955 in MovieInteger('1950-1960')` is a match.
+        mode: SUBSTRING_SEARCH, FULL_TEXT_SEARCH, or PREFIX_SEARCH. See
+            match_movies.
 
     Returns:
         The intersection of the ORM movies selected by each field's search criteria.
+        The stars, directors, and tags relationships are eagerly loaded. Full text
+        searches are ordered by relevance. The list is empty if there are no
+        criteria.
+    """
+    match_statement = _match_movies_statement(match=match, mode=mode)
+    if match_statement is None:
+        return []
+    statement, parameters = match_statement
+    return list(session.scalars(statement, parameters).all())
+
+
+def _match_movies_statement(
+    *, match: MovieBag, mode: str = SUBSTRING_SEARCH
+) -> tuple[Select, dict[str, str | int]] | None:
+    """Returns a statement which selects matching ORM movies.
+
+    Args:
+        match: See _match_movies.
+        mode: SUBSTRING_SEARCH, FULL_TEXT_SEARCH, or PREFIX_SEARCH. See
+            match_movies.
+
+    The criteria are compiled into a single WHERE conjunction so SQLite never
+    materializes one result set per criterion. The stars, directors, and tags
+    criteria are semi-joins against their link tables. See _linked_to.
+
+    The criteria values are bound parameters. The statement of each shape of
+    criteria is built once and kept in the statement cache.
+
+    Returns:
+        A statement with eager loading of the movie's relationships and the
+        values of its bound parameters, or None if there are no criteria.
+        Full text searches are ordered by relevance.
     """
-    statements = []
+    shape, parameters = _match_shape(match, mode=mode)
+    if not shape:
+        return None
+
+    with _statement_cache_lock:
+        statement = _statement_cache.get(shape)
+        if statement is not None:
+            statement_cache_stats.hits += 1
+            _statement_cache.move_to_end(shape)
+            return statement, parameters
+        statement_cache_stats.misses += 1
+
+    statement = _build_match_statement(shape)
+    with _statement_cache_lock:
+        _statement_cache[shape] = statement
+        if len(_statement_cache) > STATEMENT_CACHE_SIZE:
+            _statement_cache.popitem(last=False)
+    return statement, parameters
+
+
+def _match_shape(
+    match: MovieBag, *, mode: str
+) -> tuple[tuple[tuple, ...], dict[str, str | int]]:
+    """Returns the shape of the match criteria and the values of its parameters.
+
+    Two searches have the same shape if they search the same fields with the
+    same number of names or tags and the same kinds of year and duration
+    ranges. The values of the parameters are named after their field.
+
+    Args:
+        match: See _match_movies.
+        mode: SUBSTRING_SEARCH, FULL_TEXT_SEARCH, or PREFIX_SEARCH. See
+            match_movies.
+
+    Returns:
+        The shape which is empty if there are no criteria.
+        The parameter values.
+    """
+    shape = []
+    parameters = {}
+    full_text_criteria = {}
     for column, criteria in match.items():
         match column:
-            case "notes":
-                statements.append(
-                    select(schema.Movie).where(schema.Movie.notes.like(f"%{criteria}%"))
-                )
-            case "title":
-                statements.append(
-                    select(schema.Movie).where(schema.Movie.title.like(f"%{criteria}%"))
-                )
-            case "year":
-                statements.append(
-                    select(schema.Movie).where(schema.Movie.year.in_(list(criteria)))
-                )
-            case "duration":
-                statements.append(
-                    select(schema.Movie).where(
-                        schema.Movie.duration.in_(list(criteria))
-                    )
-                )
-            case "synopsis":
-                statements.append(
-                    select(schema.Movie).where(
-                        schema.Movie.synopsis.like(f"%{criteria}%")
-                    )
+            case "notes" | "title" | "synopsis" if mode == FULL_TEXT_SEARCH:
+                full_text_criteria[column] = criteria
+            case "title" if mode == PREFIX_SEARCH:
+                shape.append((column, PREFIX_SEARCH))
+                low, high = _prefix_range(schema.title_key(criteria))
+                parameters[column] = low
+                parameters[f"{column}_high"] = high
+            case "notes" | "title" | "synopsis":
+                shape.append((column,))
+                parameters[column] = f"%{criteria}%"
+            case "year" | "duration":
+                singles = []
+                for ix, (low, high) in enumerate(criteria.ranges):
+                    singles.append(low == high)
+                    parameters[f"{column}_{ix}_low"] = low
+                    if low != high:
+                        parameters[f"{column}_{ix}_high"] = high
+                shape.append((column, tuple(singles)))
+            case "stars" | "directors" if criteria and mode == PREFIX_SEARCH:
+                for ix, item in enumerate(sorted(criteria)):
+                    low, high = _prefix_range(schema.name_key(item))
+                    parameters[f"{column}_{ix}"] = low
+                    parameters[f"{column}_{ix}_high"] = high
+                shape.append((column, len(criteria), PREFIX_SEARCH))
+            case "stars" | "directors" | "movie_tags" if criteria:
+                for ix, item in enumerate(sorted(criteria)):
+                    parameters[f"{column}_{ix}"] = f"%{item}%"
+                shape.append((column, len(criteria)))
+
+    if full_text_query := _full_text_query(full_text_criteria):
+        shape.append((schema.movie_fts.name,))
+        parameters["query"] = full_text_query
+    return tuple(sorted(shape)), parameters
+
+
+def _prefix_range(key: str) -> tuple[str, str]:
+    """Returns the bounds of the keys which start with the key.
+
+    The keys from low up to but not including high start with the key. High is
+    the key followed by the largest code point.
+
+    Args:
+        key: A title key or a name key.
+    """
+    return key, key + "\U0010ffff"
+
+
+def _build_match_statement(shape: tuple[tuple, ...]) -> Select:
+    """Returns a statement which selects the ORM movies matching a shape.
+
+    Args:
+        shape: See _match_shape.
+    """
+    links = dict(
+        stars=(schema.movie_star_table.c.person_id, _match_person_ids),
+        directors=(schema.movie_director_table.c.person_id, _match_person_ids),
+        movie_tags=(schema.movie_tag_table.c.tag_id, _match_tag_ids),
+    )
+    conditions = []
+    full_text = False
+    for column, *details in shape:
+        match column:
+            case "title" if details:
+                conditions.append(_has_prefix(schema.Movie.title_key, name=column))
+            case "notes" | "title" | "synopsis":
+                condition = getattr(schema.Movie, column).like(bindparam(column))
+                conditions.append(condition)
+            case "year" | "duration":
+                conditions.append(
+                    _in_ranges(getattr(schema.Movie, column), singles=details[0])
                 )
-            case "stars":
-                for star in criteria:
-                    statements.append(
-                        (
-                            select(schema.Movie)
-                            .select_from(schema.Movie)
-                            .join(schema.Movie.stars)
-                            .where(schema.Person.name.like(f"%{star}%"))
-                        )
-                    )
-            case "directors":
-                for director in criteria:
-                    statements.append(
-                        (
-                            select(schema.Movie)
-                            .select_from(schema.Movie)
-                            .join(schema.Movie.directors)
-                            .where(schema.Person.name.like(f"%{director}%"))
-                        )
-                    )
-            case "movie_tags":
-                for movie_tag in criteria:
-                    statements.append(
-                        (
-                            select(schema.Movie)
-                            .select_from(schema.Movie)
-                            .join(schema.Movie.tags)
-                            .where(schema.Tag.text.like(f"%{movie_tag}%"))
+            case "stars" | "directors" | "movie_tags":
+                link_column, match_ids = links[column]
+                for ix in range(details[0]):
+                    if details[1:]:
+                        ids = select(schema.Person.id).where(
+                            _has_prefix(schema.Person.name_key, name=f"{column}_{ix}")
                         )
-                    )
+                    else:
+                        ids = match_ids(bindparam(f"{column}_{ix}"))
+                    conditions.append(_linked_to(link_column.table, link_column, ids))
+            case _:
+                full_text = True
+
+    statement = select(schema.Movie).where(*conditions)
+    if full_text:
+        ranked = (
+            select(schema.movie_fts.c.rowid, schema.movie_fts.c.rank)
+            .where(text("movie_fts MATCH :query"))
+            .subquery()
+        )
+        statement = statement.join(ranked, ranked.c.rowid == schema.Movie.id).order_by(
+            ranked.c.rank
+        )
+    return statement.options(*MOVIE_BAG_LOADER_OPTIONS)
+
+
+def _in_ranges(
+    column: InstrumentedAttribute, *, singles: tuple[bool, ...]
+) -> ColumnElement:
+    """Returns a condition which is true if the column is in any of the ranges.
+
+    Each range is compiled to a BETWEEN so the size of the statement does not
+    depend on the width of the ranges. The bounds of each range are bound
+    parameters named after the column. See _match_shape.
 
-    if statements:
-        # https://docs.sqlalchemy.org/en/20/orm/queryguide
-        # /select.html#selecting-entities-from-subqueries
-        intersection = intersect(*statements)
-        statement = select(schema.Movie).from_statement(intersection)
-        matches = session.scalars(statement).all()
-        return set(matches)
+    Args:
+        column: An integer column of the movie table.
+        singles: True for each range which is a single value.
+    """
+    conditions = []
+    for ix, single in enumerate(singles):
+        low = bindparam(f"{column.key}_{ix}_low")
+        if single:
+            conditions.append(column == low)
+        else:
+            conditions.append(column.between(low, bindparam(f"{column.key}_{ix}_high")))
+    return or_(*conditions)
+
+
+def _has_prefix(column: InstrumentedAttribute, *, name: str) -> ColumnElement:
+    """Returns a condition which is true if the key column starts with a prefix.
+
+    The condition is a range of the column so SQLite can search the column's
+    index. A LIKE 'x%' cannot use the index because LIKE ignores case. The
+    bounds are bound parameters named name and name_high. See _prefix_range.
+
+    Args:
+        column: The title_key or name_key column.
+        name: The name of the parameter of the low bound.
+    """
+    return and_(column >= bindparam(name), column < bindparam(f"{name}_high"))
+
+
+def _linked_to(link_table: Table, link_column: Column, ids: Select) -> ColumnElement:
+    """Returns a condition which is true if the movie is linked to any of the ids.
+
+    This is an uncorrelated semi-join, `movie.id IN (SELECT movie_id …)`. SQLite
+    evaluates it once per statement. A correlated EXISTS would re-evaluate the
+    nested id list for every movie, which is ruinous for the trigram subqueries
+    of short name fragments.
+
+    Args:
+        link_table: One of the movie link tables.
+        link_column: The link table's person_id or tag_id column.
+        ids: A statement which selects the person or tag ids.
+    """
+    return schema.Movie.id.in_(
+        select(link_table.c.movie_id).where(link_column.in_(ids))
+    )
+
+
+def _iter_movie_bags(
+    session: Session,
+    *,
+    statement: Select,
+    batch_size: int,
+    parameters: dict[str, str | int] = None,
+) -> Iterator[MovieBag]:
+    """Yields movie bags converted from a statement's ORM movies.
+
+    Args:
+        session:
+        statement: A select of ORM movies.
+        batch_size: The number of rows fetched from the database at a time.
+        parameters: The values of the statement's bound parameters.
+    """
+    movies = session.scalars(
+        statement.execution_options(yield_per=batch_size), parameters
+    )
+    for movie in movies:
+        yield _convert_to_movie_bag(movie)
+
+
+def _full_text_query(criteria: dict[str, str]) -> str:
+    """Returns an FTS5 query for the movie_fts table.
+
+    Every word becomes a quoted prefix token restricted to its column. All the
+    tokens must match.
+
+    Args:
+        criteria: Search text indexed by column name.
+
+    Returns:
+        The FTS5 query which will be empty if there are no words to match.
+    """
+    phrases = []
+    for column, criterion in criteria.items():
+        if words := str(criterion).split():
+            tokens = " ".join('"' + word.replace('"', '""') + '"*' for word in words)
+            phrases.append(f"{column} : ({tokens})")
+    return " AND ".join(phrases)
 
 
 def _add_movie(*, movie_bag: MovieBag) -> schema.Movie:
@@ -690,6 +1659,135 @@ def _add_movie(*, movie_bag: MovieBag) -> schema.Movie:
     return movie
 
 
+def _add_movies(
+    session: Session, *, movie_bags: Sequence[MovieBag]
+) -> list[tuple[MovieBag, NoResultFound | IntegrityError]]:
+    """Adds movies and their relationships with bulk inserts.
+
+    Args:
+        session:
+        movie_bags: See add_movies.
+
+    Returns:
+        A list of the rejected movie bags each with its exception.
+    """
+    tag_texts = set().union(*(bag.get("movie_tags", set()) for bag in movie_bags))
+    statement = select(schema.Tag.text, schema.Tag.id).where(
+        schema.Tag.text.in_(tag_texts)
+    )
+    tag_ids = dict(session.execute(statement).all())
+
+    keys = {(bag["title"], int(bag["year"])) for bag in movie_bags}
+    statement = select(schema.Movie.title, schema.Movie.year).where(
+        tuple_(schema.Movie.title, schema.Movie.year).in_(keys)
+    )
+    existing_keys = {(title, year) for title, year in session.execute(statement)}
+
+    rejects = []
+    accepted = []
+    for movie_bag in movie_bags:
+        if exc := _reject_movie_bag(movie_bag, tag_ids, existing_keys):
+            rejects.append((movie_bag, exc))
+        else:
+            existing_keys.add((movie_bag["title"], int(movie_bag["year"])))
+            accepted.append(movie_bag)
+    if not accepted:
+        return rejects
+
+    names = set().union(
+        *(bag.get("directors", set()) | bag.get("stars", set()) for bag in accepted)
+    )
+    person_ids = _getadd_person_ids(session, names=names)
+
+    rows = [
+        dict(
+            title=movie_bag["title"],
+            year=int(movie_bag["year"]),
+            duration=int(duration) if (duration := movie_bag.get("duration")) else None,
+            synopsis=movie_bag.get("synopsis") or None,
+            notes=movie_bag.get("notes") or None,
+        )
+        for movie_bag in accepted
+    ]
+    statement = insert(schema.Movie).returning(
+        schema.Movie.id, sort_by_parameter_order=True
+    )
+    movie_ids = session.scalars(statement, rows).all()
+
+    tag_links, star_links, director_links = [], [], []
+    for movie_id, movie_bag in zip(movie_ids, accepted):
+        tag_links.extend(
+            dict(movie_id=movie_id, tag_id=tag_ids[text])
+            for text in movie_bag.get("movie_tags", set())
+        )
+        star_links.extend(
+            dict(movie_id=movie_id, person_id=person_ids[name])
+            for name in movie_bag.get("stars", set())
+        )
+        director_links.extend(
+            dict(movie_id=movie_id, person_id=person_ids[name])
+            for name in movie_bag.get("directors", set())
+        )
+    for table, links in (
+        (schema.movie_tag_table, tag_links),
+        (schema.movie_star_table, star_links),
+        (schema.movie_director_table, director_links),
+    ):
+        if links:
+            session.execute(insert(table), links)
+
+    return rejects
+
+
+def _reject_movie_bag(
+    movie_bag: MovieBag, tag_ids: dict[str, int], existing_keys: set[tuple[str, int]]
+) -> NoResultFound | IntegrityError | None:
+    """Returns the exception add_movie would raise for this movie bag.
+
+    Args:
+        movie_bag:
+        tag_ids: The ids of every known tag indexed by tag text.
+        existing_keys: The title and year of every movie already present.
+
+    Returns:
+        A logged exception with the same notes as add_movie or None if the movie
+        bag is valid.
+    """
+    title = movie_bag["title"]
+    year = int(movie_bag["year"])
+
+    if not schema.MUYBRIDGE < year <= schema.MAX_YEAR:
+        logging.error(f"{INVALID_YEAR}. {year}.")
+        exc = IntegrityError(
+            "INSERT INTO movie",
+            dict(title=title, year=year),
+            Exception("CHECK constraint failed: year"),
+        )
+        exc.add_note(INVALID_YEAR)
+        exc.add_note(str(year))
+        return exc
+
+    if (title, year) in existing_keys:
+        logging.error(f"{MOVIE_EXISTS} {title}, {year}.")
+        exc = IntegrityError(
+            "INSERT INTO movie",
+            dict(title=title, year=year),
+            Exception("UNIQUE constraint failed: movie.title, movie.year"),
+        )
+        exc.add_note(MOVIE_EXISTS)
+        exc.add_note(title)
+        exc.add_note(str(year))
+        return exc
+
+    for tag_text in movie_bag.get("movie_tags", set()):
+        if tag_text not in tag_ids:
+            logging.error(TAG_NOT_FOUND, tag_text)
+            exc = NoResultFound(TAG_NOT_FOUND)
+            exc.add_note(TAG_NOT_FOUND)
+            exc.add_note(tag_text)
+            return exc
+
+
 def _edit_movie(*, movie: schema.Movie, edit_fields: MovieBag):
     """Edits a movie.
 
@@ -822,10 +1920,28 @@ def _match_people(session: Session, *, match: str) -> set[schema.Person]:
     Returns:
         A set of ORM persons which may be empty.
     """
-    statement = select(schema.Person).where(schema.Person.name.like(f"%{match}%"))
+    statement = select(schema.Person).where(
+        schema.Person.id.in_(_match_person_ids(match))
+    )
     return set(session.scalars(statement).all())
 
 
+def _match_person_ids(match: str | BindParameter) -> Select:
+    """Returns a statement which selects the ids of people with names that contain
+    the substring.
+
+    The statement uses the person name trigram index.
+
+    Args:
+        match: Substring or a bound parameter of a LIKE pattern.
+    """
+    if isinstance(match, str):
+        match = f"%{match}%"
+    return select(schema.person_trigram.c.rowid).where(
+        schema.person_trigram.c.name.like(match)
+    )
+
+
 def _add_person(session: Session, *, name: str) -> schema.Person:
     """Adds a person to the ORM Person table.
 
@@ -848,17 +1964,44 @@ def _getadd_people(session: Session, *, names: set[str]) -> set[schema.Person]:
         session:
         names:
 
+    Existing people are found with one IN query and the missing people are
+    flushed together. Every resolved person is kept in a name to Person map in
+    the session's info dictionary so repeated names in the same session do not
+    query the database again.
+
     Returns:
         A set of ORM Persons
     """
-    people = set()
-    for name in names:
-        try:
-            person = _select_person(session, name=name)
-        except NoResultFound:
-            person = _add_person(session, name=name)
-        people.add(person)
-    return people
+    people = session.info.setdefault(PEOPLE_BY_NAME, {})
+    if missing := set(names) - people.keys():
+        statement = select(schema.Person).where(schema.Person.name.in_(missing))
+        people |= {person.name: person for person in session.scalars(statement)}
+        for name in missing - people.keys():
+            people[name] = _add_person(session, name=name)
+    return {people[name] for name in names}
+
+
+def _getadd_person_ids(session: Session, *, names: set[str]) -> dict[str, int]:
+    """Returns Person ids adding missing people to the table with one bulk insert.
+
+    Args:
+        session:
+        names:
+
+    Returns:
+        Person ids indexed by name.
+    """
+    statement = select(schema.Person.name, schema.Person.id).where(
+        schema.Person.name.in_(names)
+    )
+    person_ids = dict(session.execute(statement).all())
+    if missing := names - person_ids.keys():
+        statement = insert(schema.Person).returning(
+            schema.Person.name, schema.Person.id
+        )
+        rows = [dict(name=name) for name in missing]
+        person_ids |= dict(session.execute(statement, rows).all())
+    return person_ids
 
 
 def _delete_person(session: Session, *, person: schema.Person):
@@ -868,31 +2011,47 @@ def _delete_person(session: Session, *, person: schema.Person):
         session:
         person:
     """
+    session.info.get(PEOPLE_BY_NAME, {}).pop(person.name, None)
     session.delete(person)
 
 
-def _delete_orphans(session: Session, candidates: set[schema.Person]) -> int:
-    """Deletes ORM Persons with no relationship to any ORM Movie.
+def _delete_orphans(
+    session: Session, *, candidate_ids: Iterable[int] | Select | None = None
+) -> int:
+    """Deletes people who are neither a star nor a director of any movie.
+
+    This is a single DELETE … WHERE NOT EXISTS … AND NOT EXISTS … statement.
+    The reverse indexes of the link tables make each NOT EXISTS an index
+    probe, so no ORM Person or relationship is loaded.
 
     Args:
         session:
-        candidates:
+        candidate_ids: The ids of people who may have been orphaned, or a
+            statement which selects them. Every person is a candidate if this
+            is None.
 
     Returns:
         A count of orphans deleted.
     """
-    count = 0
-    for person in candidates:
-        if person.star_of_movies != set():
-            # The person is a star of one or more movies.
-            continue
-        if person.director_of_movies != set():
-            # The person is a director of one or more movies.
-            continue
-        # The person is not a star or a director of any movie.
-        count = +1
-        session.delete(person)
-    return count
+    statement = (
+        delete(schema.Person)
+        .where(
+            ~exists().where(schema.movie_star_table.c.person_id == schema.Person.id),
+            ~exists().where(
+                schema.movie_director_table.c.person_id == schema.Person.id
+            ),
+        )
+        .returning(schema.Person.name)
+        .execution_options(synchronize_session="fetch")
+    )
+    if candidate_ids is not None:
+        statement = statement.where(schema.Person.id.in_(candidate_ids))
+
+    names = session.scalars(statement).all()
+    people_by_name = session.info.get(PEOPLE_BY_NAME, {})
+    for name in names:
+        people_by_name.pop(name, None)
+    return len(names)
 
 
 def _select_tag(session: Session, *, text: str) -> schema.Tag:
@@ -922,6 +2081,18 @@ def _match_tags(session: Session, *, match: str) -> set[schema.Tag]:
     return set(session.scalars(statement).all())
 
 
+def _match_tag_ids(match: str | BindParameter) -> Select:
+    """Returns a statement which selects the ids of tags with texts that contain
+    the substring.
+
+    Args:
+        match: Substring or a bound parameter of a LIKE pattern.
+    """
+    if isinstance(match, str):
+        match = f"%{match}%"
+    return select(schema.Tag.id).where(schema.Tag.text.like(match))
+
+
 def _select_all_tags(session: Session) -> set[schema.Tag]:
     """Returns a set of all ORM Tags.
 
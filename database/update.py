@@ -14,48 +14,150 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import logging
+import sqlite3
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
 from pathlib import Path
 
-from sqlalchemy import MetaData, Engine, Table, select, create_engine
+from sqlalchemy import (
+    MetaData,
+    Engine,
+    Table,
+    Row,
+    Select,
+    select,
+    create_engine,
+    func,
+    distinct,
+)
 from sqlalchemy.orm import Session
 
 from globalconstants import *
 
 DIALECT = "sqlite+pysqlite:///"
 INFO_UPDATE_V0_STARTING = "The update from the v0 database is starting."
+INFO_UPDATE_V1_STARTING = "The update from the v1 database is starting."
 CHECK_ZERO_TAGS = "Record count mismatch on tags table."
 CHECK_ZERO_MOVIE_TAG_LINKS = "Record count mismatch on movie tag links table."
 CHECK_ZERO_MOVIES = "Record count mismatch on movie table."
+CHECK_ZERO_MIGRATED_MOVIES = (
+    "Record count mismatch between the old and the updated movie tables."
+)
+# The number of old movies read and converted at a time.
+UPDATE_CHUNK_SIZE = 1000
+# The movie table of each old version which is updated by copying its movies.
+OLD_MOVIE_TABLES = {"DBv0": "movies"}
+# The old versions whose tables are the same as the current tables. They only
+# lack indexes, generated key columns, and tables which create_all and the
+# schema's after_create listeners add to an existing database. Such a database
+# is copied whole and upgraded in place. See copy_old_database.
+IN_PLACE_VERSIONS = {"DBv1"}
 
 engine: Engine | None = None
 
 
+@dataclass
+class MigrationProgress:
+    """The progress of an update of an old database."""
+
+    # The old movies migrated including those of interrupted earlier runs.
+    done: int
+    total: int
+    # The old movies migrated and the elapsed time of this run.
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        """Returns the throughput of this run."""
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def eta_seconds(self) -> float | None:
+        """Returns the estimated time to completion or None if it is not
+        known."""
+        if not self.rows_per_second:
+            return None
+        return (self.total - self.done) / self.rows_per_second
+
+
 def update_old_database(
-    old_version: str, old_version_fn: Path
-) -> tuple[list[MovieBag], set[str]]:
+    old_version: str, old_version_fn: Path, *, after_id: int = 0
+) -> tuple[Iterator[MovieBag], set[str]]:
     """
     Calls update code dependent on the old_version.
 
+    The movie bags are streamed from the old database in the order of their
+    old ids. Each movie bag's id is its old id. The checks of the movie
+    records are made after the last movie bag has been yielded.
+
     Args:
         old_version:
         old_version_fn:
+        after_id: Only old movies with a greater id are returned. This
+            resumes an interrupted update.
 
     Raises:
         UnrecognizedOldVersion
 
     Returns:
         A tuple of:
-            A list of MovieBags
+            An iterator of MovieBags
             A set of tag texts.
     """
     match old_version:
         case "DBv0":
-            return _reflect_database_v0(old_version_fn)
+            return _reflect_database_v0(old_version_fn, after_id=after_id)
         case _:
             logging.error(UnrecognizedOldVersion)
             raise UnrecognizedOldVersion
 
 
+def count_old_movies(old_version: str) -> int:
+    """Returns the number of movies in the old database.
+
+    The old database is the one opened by the last call of
+    update_old_database.
+
+    Args:
+        old_version:
+
+    Raises:
+        UnrecognizedOldVersion
+    """
+    try:
+        table_name = OLD_MOVIE_TABLES[old_version]
+    except KeyError:
+        logging.error(UnrecognizedOldVersion)
+        raise UnrecognizedOldVersion from None
+    old_movies_table = Table(table_name, MetaData(), autoload_with=engine)
+    with Session(engine) as session:
+        return session.scalar(select(func.count()).select_from(old_movies_table))
+
+
+def copy_old_database(old_version_fn: Path, new_version_fn: Path):
+    """Copies an old database of an IN_PLACE_VERSIONS version.
+
+    The copy is made with the SQLite online backup API, so every row, with its
+    created and updated timestamps and notes, is kept. The copy replaces any
+    new database left by an interrupted update. The old database is not
+    changed. The copy is upgraded in place when the tables are created. See
+    schema.create_missing_indexes.
+
+    Args:
+        old_version_fn:
+        new_version_fn:
+    """
+    logging.info(INFO_UPDATE_V1_STARTING)
+    source = sqlite3.connect(old_version_fn)
+    target = sqlite3.connect(new_version_fn)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
 class UnrecognizedOldVersion(Exception):
     """The old version number was not recognized."""
 
@@ -66,8 +168,8 @@ class DatabaseUpdateCheckZeroError(Exception):
 
 
 def _reflect_database_v0(
-    old_database_fn: Path,
-) -> tuple[list[MovieBag], set[str]]:
+    old_database_fn: Path, *, after_id: int = 0
+) -> tuple[Iterator[MovieBag], set[str]]:
     """Updates v0 database to v1.
 
     Version v0 is not automatically recognizable. This update will not be
@@ -76,12 +178,12 @@ def _reflect_database_v0(
     information.
 
     Returns:
-        A list of movie bags
+        An iterator of movie bags
         A list of tag texts.
     """
     logging.info(INFO_UPDATE_V0_STARTING)
     _register_engine(old_database_fn)
-    return _reflect_data()
+    return _reflect_data(after_id=after_id)
 
 
 def _register_engine(old_database_fn: Path):
@@ -94,22 +196,24 @@ def _register_engine(old_database_fn: Path):
     engine = create_engine(f"{DIALECT}{old_database_fn}", echo=False)
 
 
-def _reflect_data() -> tuple[list[MovieBag], set[str]]:
+def _reflect_data(*, after_id: int = 0) -> tuple[Iterator[MovieBag], set[str]]:
     """
-    Collect data from the old database and return a list of movie bags.
+    Collect data from the old database and return an iterator of movie bags.
 
-    A list of tag texts is returned. The same texts are included in the movie
+    A set of tag texts is returned. The same texts are included in the movie
     bags. Both are in the format expected by the functions of the
     database.tables module.
 
+    Args:
+        after_id: See update_old_database.
+
     Raises:
-        DatabaseUpdateCheckZeroError if any of the following checks fail:
-            Tag list length not equal to the number of old tag records.
-            Movie tag links not equal to number of old movie_tag records.
-            Movie bag list length not equal to number of old movie records.
+        DatabaseUpdateCheckZeroError if the tag count is not equal to the
+        number of old tag records. See _iter_old_movies for the checks of
+        the movies.
 
     Returns:
-        A list of movie bags.
+        An iterator of movie bags.
         A set of tag texts.
     """
     metadata_obj = MetaData()
@@ -118,33 +222,78 @@ def _reflect_data() -> tuple[list[MovieBag], set[str]]:
             session,
             metadata_obj,
         )
-        movie_tags_sets, movie_id_keys_count = _reflect_old_movie_tag_links(
-            tags,
-            session,
-            metadata_obj,
-        )
-        movie_bags, movie_bags_count = _reflect_old_movie(
-            movie_tags_sets,
-            session,
-            metadata_obj,
-        )
 
-        # Check zero for tags
-        if old_tags_check_count != len(tags):
-            logging.error(DatabaseUpdateCheckZeroError, CHECK_ZERO_TAGS)
-            raise DatabaseUpdateCheckZeroError(CHECK_ZERO_TAGS)
+    # Check zero for tags
+    if old_tags_check_count != len(tags):
+        logging.error(DatabaseUpdateCheckZeroError, CHECK_ZERO_TAGS)
+        raise DatabaseUpdateCheckZeroError(CHECK_ZERO_TAGS)
+
+    return _iter_old_movies(tags, metadata_obj, after_id=after_id), set(tags.values())
+
+
+def _iter_old_movies(
+    tags: dict[int, str], metadata_obj: MetaData, *, after_id: int = 0
+) -> Iterator[MovieBag]:
+    """Yields the movie bags of the old database.
+
+    The old movies are streamed in id order in chunks of UPDATE_CHUNK_SIZE.
+    The tag links of each chunk are selected with one query.
+
+    Args:
+        tags: Tag texts indexed by tag object id.
+        metadata_obj:
+        after_id: See update_old_database. The checks only count the old
+            movies with a greater id.
 
-        # Check zero for movie tag links
-        if len(movie_tags_sets) != movie_id_keys_count:
-            logging.error(DatabaseUpdateCheckZeroError, CHECK_ZERO_MOVIE_TAG_LINKS)
-            raise DatabaseUpdateCheckZeroError(CHECK_ZERO_MOVIE_TAG_LINKS)
+    Raises:
+        DatabaseUpdateCheckZeroError after the last movie bag if either of the
+        following checks fail:
+            Movies with tags not equal to the number of old movies with
+            movie_tag records.
+            Movie bags not equal to the number of old movie records.
+    """
+    old_movies_table = Table("movies", metadata_obj, autoload_with=engine)
+    movie_tags_table = Table("movie_tag", metadata_obj, autoload_with=engine)
+    old_id_column = old_movies_table.c[0]
+    statement = (
+        select(old_movies_table).where(old_id_column > after_id).order_by(old_id_column)
+    )
+    movie_id_keys_count = 0
+    movie_bags_count = 0
+    with Session(engine) as session:
+        for old_movies in _partitions(session, statement):
+            movie_tags_sets = _reflect_old_movie_tag_links(
+                tags,
+                session,
+                movie_tags_table,
+                movie_ids=[movie[0] for movie in old_movies],
+            )
+            movie_bags = _reflect_old_movie(movie_tags_sets, old_movies)
+            movie_id_keys_count += len(movie_tags_sets)
+            movie_bags_count += len(movie_bags)
+            yield from movie_bags
+
+        movie_id_column = movie_tags_table.c[0]
+        old_movie_tags_check_count = session.scalar(
+            select(func.count(distinct(movie_id_column))).where(
+                movie_id_column.in_(
+                    select(old_id_column).where(old_id_column > after_id)
+                )
+            )
+        )
+        old_movies_check_count = session.scalar(
+            select(func.count()).where(old_id_column > after_id)
+        )
 
-        # Check zero for movies
-        if movie_bags_count != len(movie_bags):
-            logging.error(DatabaseUpdateCheckZeroError, CHECK_ZERO_MOVIES)
-            raise DatabaseUpdateCheckZeroError(CHECK_ZERO_MOVIES)
+    # Check zero for movie tag links
+    if movie_id_keys_count != old_movie_tags_check_count:
+        logging.error(DatabaseUpdateCheckZeroError, CHECK_ZERO_MOVIE_TAG_LINKS)
+        raise DatabaseUpdateCheckZeroError(CHECK_ZERO_MOVIE_TAG_LINKS)
 
-    return movie_bags, set(tags.values())
+    # Check zero for movies
+    if movie_bags_count != old_movies_check_count:
+        logging.error(DatabaseUpdateCheckZeroError, CHECK_ZERO_MOVIES)
+        raise DatabaseUpdateCheckZeroError(CHECK_ZERO_MOVIES)
 
 
 def _reflect_old_tags(
@@ -159,64 +308,64 @@ def _reflect_old_tags(
 
     Returns
         Tag texts indexed by tag object id.
-        A check count of tag objects.
+        A check count of tag records.
     """
     old_tags_table = Table("tags", metadata_obj, autoload_with=engine)
-    old_tags = session.execute(select(old_tags_table)).all()
+    old_tags = session.execute(select(old_tags_table))
     tags = {tag_id: tag_tag for tag_id, tag_tag in old_tags}  # pragma: no branch
-    return tags, len(old_tags)
+    check_count = session.scalar(select(func.count()).select_from(old_tags_table))
+    return tags, check_count
 
 
 def _reflect_old_movie_tag_links(
     tags: dict[int, str],
     session: Session,
-    metadata_obj: MetaData,
-) -> tuple[dict[int, set[str]], int]:
+    movie_tags_table: Table,
+    *,
+    movie_ids: list[int],
+) -> dict[int, set[str]]:
     """Returns sets of tag texts indexed by Movie object id.
 
     Args:
         tags:
         session:
-        metadata_obj:
+        movie_tags_table:
+        movie_ids: The old movies whose links are selected.
 
     Returns:
-        Sets of tag texts indexed by Movie object id.
-        A check count of movie objects.
+        Sets of tag texts indexed by Movie object id. A movie without links
+        is not included.
     """
-    movie_tags_table = Table("movie_tag", metadata_obj, autoload_with=engine)
-    old_movie_tags = session.execute(select(movie_tags_table)).all()
-    movie_id_keys = {movie_tag[0] for movie_tag in old_movie_tags}  # pragma no branch
-    movie_tags_sets = {movie_id: set() for movie_id in movie_id_keys}  # pragma nocover
+    movie_id_column = movie_tags_table.c[0]
+    old_movie_tags = session.execute(
+        select(movie_tags_table).where(movie_id_column.in_(movie_ids))
+    )
+    movie_tags_sets = {}
     for movie_id, tag_id in old_movie_tags:
+        movie_tags = movie_tags_sets.setdefault(movie_id, set())
         try:
             tag = tags[tag_id]
         except KeyError:  # pragma nocover
             # The tag_id points to a nonexistent tag.
             pass
         else:
-            movie_tags_sets[movie_id].add(tag)
-    return movie_tags_sets, len(movie_id_keys)
+            movie_tags.add(tag)
+    return movie_tags_sets
 
 
 def _reflect_old_movie(
     movie_tags: dict[int, set[str]],
-    session: Session,
-    metadata_obj: MetaData,
-) -> tuple[list[MovieBag], int]:
+    old_movies: Sequence[Row],
+) -> list[MovieBag]:
     """Returns a list of movie_bags.
 
     Args:
         movie_tags: Lists of tag texts indexed by Movie object id.
-        session:
-        metadata_obj:
+        old_movies: Records of the old movies table.
 
     Returns:
         A list of movie bags.
-        A check count of movie records.
     """
-    old_movies_table = Table("movies", metadata_obj, autoload_with=engine)
-    old_movies = session.execute(select(old_movies_table)).all()
-
     movie_bags = []
     for movie in old_movies:
 
@@ -239,4 +388,17 @@ def _reflect_old_movie(
             pass
 
         movie_bags.append(new_movie)
-    return movie_bags, len(old_movies)
+    return movie_bags
+
+
+def _partitions(session: Session, statement: Select) -> Iterator[Sequence[Row]]:
+    """Yields the rows of a statement in chunks of UPDATE_CHUNK_SIZE.
+
+    The rows are fetched from the database one chunk at a time.
+
+    Args:
+        session:
+        statement:
+    """
+    result = session.execute(statement.execution_options(yield_per=UPDATE_CHUNK_SIZE))
+    yield from result.partitions()
@@ -12,9 +12,11 @@
 #  GNU General Public License for more details.
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from bisect import bisect_right
 from collections.abc import Sequence, Iterator
 from dataclasses import dataclass, field
 from datetime import datetime
+from itertools import chain
 from typing import TypedDict, NotRequired
 
 
@@ -94,6 +96,8 @@ class MovieInteger(set):
         [2020, 2021, 2022, 2025, 2026, 2027, 2029]
         >> 2021 in mint
         True
+        >> mint.ranges
+        [(2020, 2022), (2025, 2027), (2029, 2029)]
 
     Raises:
         >> mint = MovieInteger('abc')
@@ -101,7 +105,7 @@ class MovieInteger(set):
 
         >> mint = MovieInteger("2042-2044")
         >> int(mint)
-        TypeError: Not a single integer value: {2042, 2043, 2044}
+        TypeError: This object cannot provide an integer value: 2042-2044
 
         >> mint = MovieInteger("2042-wxyz")
         ValueError: invalid literal for int() with base 10: 'wxyz'
@@ -109,17 +113,32 @@ class MovieInteger(set):
     Use case:
         This simplifies the layout of the GUI, otherwise movie search and movie display movies
         require separate layouts and support code.
+
+    Implementation:
+        The values are held as a sorted list of disjoint (low, high) intervals so
+        memory does not depend on the width of a range. Membership is a binary
+        search of the intervals and iteration is lazy.
     """
 
     _value: str | int
-    _values: set = field(default_factory=set, init=False)
+    _ranges: list[tuple[int, int]] = field(default_factory=list, init=False)
+    _lows: list[int] = field(
+        default_factory=list, init=False, repr=False, compare=False
+    )
 
     element_delimiter = ","
     max_min_delimiter = "-"
 
     def __post_init__(self):
+        if isinstance(self._value, int):
+            # Fast path for values read from the database.
+            self._ranges = [(self._value, self._value)]
+            self._lows = [self._value]
+            return
+
         elements = str(self._value).split(self.element_delimiter)
 
+        intervals = []
         for element in elements:
             element = element.strip(" ")
 
@@ -130,27 +149,43 @@ class MovieInteger(set):
                         f"Expected a range in the format '<low int>-<high int>'. Got:"
                         f" {element}"
                     )
-                self._values |= set(
-                    i for i in range(int(min(min_max)), int(max(min_max)) + 1)
-                )
+                low, high = sorted(int(limit) for limit in min_max)
+                intervals.append((low, high))
 
             else:
-                self._values.add(int(element))
+                intervals.append((int(element), int(element)))
+
+        for low, high in sorted(intervals):
+            if self._ranges and low <= self._ranges[-1][1] + 1:
+                self._ranges[-1] = (
+                    self._ranges[-1][0],
+                    max(high, self._ranges[-1][1]),
+                )
+            else:
+                self._ranges.append((low, high))
+        self._lows = [low for low, _ in self._ranges]
 
     def __str__(self):
         return str(self._value)
 
     def __len__(self) -> int:
-        return len(self._values)
+        return sum(high - low + 1 for low, high in self._ranges)
 
     def __iter__(self) -> Iterator:
-        return iter(self._values)
+        return chain.from_iterable(range(low, high + 1) for low, high in self._ranges)
 
     def __contains__(self, item: int) -> bool:
-        return item in self._values
+        ix = bisect_right(self._lows, item) - 1
+        return ix >= 0 and item <= self._ranges[ix][1]
+
+    @property
+    def ranges(self) -> list[tuple[int, int]]:
+        """Returns the values as sorted, disjoint, and inclusive (low, high) ranges."""
+        return list(self._ranges)
 
     def __int__(self) -> int:
-        if len(self._values) == 1:
-            return list(self._values)[0]
-        else:
-            raise TypeError(f"{NO_INTEGER_VALUE}: {self._values}")
+        match self._ranges:
+            case [(low, high)] if low == high:
+                return low
+            case _:
+                raise TypeError(f"{NO_INTEGER_VALUE}: {self._value}")
@@ -1054,6 +1054,17 @@ def gui_askopenfilename(
     return filedialog.askopenfilename(parent=parent, filetypes=filetypes)
 
 
+def gui_asksaveasfilename(
+    parent: TkParentType,
+    filetypes: Iterable[tuple[str, str | list[str] | tuple[str, ...]]] | None,
+    defaultextension: str = "",
+):
+    """Present a Tk asksaveasfilename."""
+    return filedialog.asksaveasfilename(
+        parent=parent, filetypes=filetypes, defaultextension=defaultextension
+    )
+
+
 @dataclass
 class InputZone:
     """Configure the parent frame with two columns to contain labels and widgets for
@@ -1,4 +1,9 @@
-"""Menu handlers for the database."""
+"""Menu handlers for the database.
+
+The database work of the db_ handlers runs on the threadpool so a slow query
+does not freeze the window. Each result is handled on the Tk thread by the
+handler's _done function. See _submit_db_work.
+"""
 
 #  Copyright© 2025. Stephen Rigden.
 #  Last modified 1/17/25, 11:34 AM by stephen.
@@ -13,8 +18,13 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from collections.abc import Sequence
+import queue
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import partial
+from pathlib import Path
+from tkinter import TclError
+from typing import Any
 
 import config
 import logging
@@ -22,12 +32,11 @@ import logging
 import guiwidgets
 import guiwidgets_2
 from config import MovieKeyTypedDict
-from database import tables
+from database import export, tables
 from globalconstants import MovieTD, MovieBag, MovieInteger
 from handlers import moviebagfacade
 from handlers.sundries import _tmdb_io_handler
 
-
 TITLE_AND_YEAR_EXISTS_MSG = (
     "The title and release date clash with a movie already in the database"
 )
@@ -36,6 +45,22 @@ MOVIE_NO_LONGER_PRESENT = "The original movie is no longer present in the databa
 MISSING_EXPLANATORY_NOTES = (
     "Exception raised without explanatory notes needed for user alert."
 )
+DB_WORK_POLL = 40
+BUSY_CURSOR = "watch"
+MATCH_MOVIES_WORK = "match movies"
+MATCH_TAGS_WORK = "match tags"
+EXPORT_FILETYPES = (("JSON Lines", ".jsonl"), ("CSV", ".csv"))
+EXPORT_DONE_MSG = "The movies have been exported."
+
+# Database work runs on the threadpool. Completions are queued by the pool's
+# threads and delivered on the Tk thread by _db_consumer. Writes run one at a
+# time in the order they were submitted on their own single thread.
+_db_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db write")
+_db_completions: queue.Queue = queue.Queue()
+_db_work_pending = 0
+_db_consumer_id: str | None = None
+# The latest submission for each supersede key. See _submit_db_work.
+_db_latest_work: dict[str, Future] = {}
 
 
 def gui_add_movie(*, prepopulate: MovieBag = None):
@@ -120,8 +145,22 @@ def db_add_movie(gui_movie: MovieTD):
         gui_movie:
     """
     movie_bag = moviebagfacade.convert_from_movie_td(gui_movie)
+    _submit_db_work(
+        partial(tables.add_movie, movie_bag=movie_bag),
+        partial(_add_movie_done, movie_bag),
+        write=True,
+    )
+
+
+def _add_movie_done(movie_bag: MovieBag, fut: Future):
+    """Completes db_add_movie on the Tk thread.
+
+    Args:
+        movie_bag: The movie which was added.
+        fut: The completed database work.
+    """
     try:
-        tables.add_movie(movie_bag=movie_bag)
+        fut.result()
 
     except (tables.IntegrityError, tables.NoResultFound) as exc:
         if exc.__notes__[0] in (
@@ -164,7 +203,20 @@ def db_match_movies(criteria: config.FindMovieTypedDict, tags: Sequence[str]):
     # Converts old style arguments to new movie_bag argument
     movie_bag = moviebagfacade.convert_from_find_movie_typed_dict(criteria)
 
-    movies_found = tables.match_movies(match=movie_bag)
+    _submit_db_work(
+        partial(tables.match_movies, match=movie_bag),
+        _match_movies_done,
+        supersede=MATCH_MOVIES_WORK,
+    )
+
+
+def _match_movies_done(fut: Future):
+    """Completes db_match_movies on the Tk thread.
+
+    Args:
+        fut: The completed database work which returns the movies found.
+    """
+    movies_found = fut.result()
     match len(movies_found):
         case 0:
             # Informs user and represent the search window.
@@ -199,8 +251,19 @@ def db_select_movies(movie: MovieKeyTypedDict):
         movie: The movie title and year are used to select a movie.
     """
     movie_key = MovieBag(title=movie["title"], year=MovieInteger(movie["year"]))
+    _submit_db_work(
+        partial(tables.select_movie, movie_bag=movie_key), _select_movies_done
+    )
+
+
+def _select_movies_done(fut: Future):
+    """Completes db_select_movies on the Tk thread.
+
+    Args:
+        fut: The completed database work which returns the selected movie.
+    """
     try:
-        movie_bag = tables.select_movie(movie_bag=movie_key)
+        movie_bag = fut.result()
 
     except tables.NoResultFound as exc:
         if exc.__notes__[0] == tables.MOVIE_NOT_FOUND:
@@ -226,9 +289,29 @@ def db_edit_movie(old_movie: config.MovieKeyTypedDict, new_movie: MovieTD):
     """
     old_movie_bag = moviebagfacade.convert_from_movie_key_typed_dict(old_movie)
     new_movie_bag = moviebagfacade.convert_from_movie_td(new_movie)
+    _submit_db_work(
+        partial(
+            tables.edit_movie,
+            old_movie_bag=old_movie_bag,
+            replacement_fields=new_movie_bag,
+        ),
+        partial(_edit_movie_done, old_movie, new_movie_bag),
+        write=True,
+    )
+
 
+def _edit_movie_done(
+    old_movie: config.MovieKeyTypedDict, new_movie_bag: MovieBag, fut: Future
+):
+    """Completes db_edit_movie on the Tk thread.
+
+    Args:
+        old_movie: The old movie key.
+        new_movie_bag: The replacement fields.
+        fut: The completed database work.
+    """
     try:
-        tables.edit_movie(old_movie_bag=old_movie_bag, replacement_fields=new_movie_bag)
+        fut.result()
 
     except (tables.NoResultFound, tables.IntegrityError) as exc:
         if exc.__notes__[0] in (
@@ -255,7 +338,9 @@ def db_delete_movie(movie: config.FindMovieTypedDict):
         title=movie["title"],
         year=MovieInteger(int(movie["year"][0])),
     )
-    tables.delete_movie(movie_bag=movie_bag)
+    _submit_db_work(
+        partial(tables.delete_movie, movie_bag=movie_bag), _db_work_done, write=True
+    )
 
 
 def gui_add_tag():
@@ -322,7 +407,9 @@ def db_add_tag(tag_text: str):
     Args:
         tag_text:
     """
-    tables.add_tag(tag_text=tag_text)
+    _submit_db_work(
+        partial(tables.add_tag, tag_text=tag_text), _db_work_done, write=True
+    )
 
 
 def db_match_tags(match: str):
@@ -337,7 +424,21 @@ def db_match_tags(match: str):
     Args:
         match: match pattern
     """
-    tags = tables.match_tags(match=match)
+    _submit_db_work(
+        partial(tables.match_tags, match=match),
+        partial(_match_tags_done, match),
+        supersede=MATCH_TAGS_WORK,
+    )
+
+
+def _match_tags_done(match: str, fut: Future):
+    """Completes db_match_tags on the Tk thread.
+
+    Args:
+        match: match pattern
+        fut: The completed database work which returns the matching tags.
+    """
+    tags = fut.result()
 
     if len(tags) == 0:
         guiwidgets_2.gui_messagebox(
@@ -359,7 +460,9 @@ def db_delete_tag(tag_text: str):
     Args:
         tag_text:
     """
-    tables.delete_tag(tag_text=tag_text)
+    _submit_db_work(
+        partial(tables.delete_tag, tag_text=tag_text), _db_work_done, write=True
+    )
 
 
 def db_edit_tag(old_tag_text: str, new_tag_text: str):
@@ -374,8 +477,22 @@ def db_edit_tag(old_tag_text: str, new_tag_text: str):
         old_tag_text:
         new_tag_text:
     """
+    _submit_db_work(
+        partial(tables.edit_tag, old_tag_text=old_tag_text, new_tag_text=new_tag_text),
+        partial(_edit_tag_done, old_tag_text),
+        write=True,
+    )
+
+
+def _edit_tag_done(old_tag_text: str, fut: Future):
+    """Completes db_edit_tag on the Tk thread.
+
+    Args:
+        old_tag_text:
+        fut: The completed database work.
+    """
     try:
-        tables.edit_tag(old_tag_text=old_tag_text, new_tag_text=new_tag_text)
+        fut.result()
 
     except tables.NoResultFound as exc:
         _exc_messagebox(exc)
@@ -385,6 +502,45 @@ def db_edit_tag(old_tag_text: str, new_tag_text: str):
         _exc_messagebox(exc)
 
 
+def gui_export_movies():
+    """Asks the user for an export file and exports every movie to it.
+
+    The format is chosen by the file's suffix. See export.FORMATS.
+    """
+    filename = guiwidgets_2.gui_asksaveasfilename(
+        config.current.tk_root,
+        EXPORT_FILETYPES,
+        defaultextension=EXPORT_FILETYPES[0][1],
+    )
+    if filename:
+        _submit_db_work(
+            partial(export.export_movies, Path(filename)), _export_movies_done
+        )
+
+
+def _export_movies_done(fut: Future):
+    """Completes gui_export_movies on the Tk thread.
+
+    Args:
+        fut: The completed database work which returns the export's stats.
+    """
+    try:
+        export_stats = fut.result()
+
+    except ValueError as exc:
+        _exc_messagebox(exc)
+
+    else:
+        guiwidgets_2.gui_messagebox(
+            config.current.tk_root,
+            message=EXPORT_DONE_MSG,
+            detail=(
+                f"{export_stats.rows} movies at "
+                f"{export_stats.rows_per_second:.0f} movies per second."
+            ),
+        )
+
+
 def _exc_messagebox(exc):
     """This helper presents a GUI user alert with exception information.
 
@@ -416,3 +572,124 @@ def _exc_messagebox(exc):
         logging.error(MISSING_EXPLANATORY_NOTES)
         exc.add_note(MISSING_EXPLANATORY_NOTES)
         raise
+
+
+def shutdown_db_writes():
+    """Waits for the submitted database writes and shuts down their thread.
+
+    This is called at close down before the database is changed on the main
+    thread.
+    """
+    _db_write_executor.shutdown(wait=True)
+
+
+def _submit_db_work(
+    work: Callable[[], Any],
+    on_done: Callable[[Future], None],
+    *,
+    supersede: str = None,
+    write: bool = False,
+):
+    """Runs database work on the threadpool so the Tk thread is not blocked.
+
+    The Tk root shows a busy cursor until all submitted work has completed.
+    The completed future is passed to on_done on the Tk thread by
+    _db_consumer. A completion is dropped if the Tk root has been destroyed,
+    or if it was superseded by later work with the same supersede key.
+
+    Args:
+        work: A call of the tables module.
+        on_done: Receives the completed future on the Tk thread.
+        supersede: Work with this key supersedes earlier work with the same
+            key. For example, only the latest search is presented to the user.
+        write: True if the work changes the database. Writes are run one at a
+            time in the order of submission so two edits commit in the order
+            the user made them.
+    """
+    global _db_work_pending
+    tk_root = config.current.tk_root
+    executor = _db_write_executor if write else config.current.threadpool_executor
+    fut = executor.submit(work)
+    if supersede:
+        _db_latest_work[supersede] = fut
+    fut.add_done_callback(
+        lambda done: _db_completions.put((tk_root, on_done, supersede, done))
+    )
+    if not _db_work_pending:
+        tk_root.config(cursor=BUSY_CURSOR)
+    _db_work_pending += 1
+    _schedule_db_consumer(tk_root)
+
+
+def _schedule_db_consumer(tk_root):
+    """Schedules a call of _db_consumer unless one is already scheduled.
+
+    Args:
+        tk_root:
+    """
+    global _db_consumer_id
+    if _db_consumer_id is None:
+        _db_consumer_id = tk_root.after(DB_WORK_POLL, _db_consumer, tk_root)
+
+
+def _db_consumer(tk_root):
+    """Consumer of completed database work.
+
+    This runs on the Tk thread. Every queued completion is delivered to its
+    on_done callback or dropped if it is stale. The consumer polls until no
+    work is pending and then restores the normal cursor.
+
+    An exception raised by an on_done callback is reraised to Tk after the
+    consumer has been rescheduled, so the remaining completions are delivered
+    by the next poll.
+
+    Args:
+        tk_root:
+    """
+    global _db_work_pending, _db_consumer_id
+    _db_consumer_id = None
+    try:
+        while True:
+            try:
+                # Tkinter can't wait for the thread blocking `get` method…
+                owner, on_done, supersede, fut = _db_completions.get_nowait()
+            except queue.Empty:
+                # …so an empty queue is not exceptional.
+                break
+
+            _db_work_pending -= 1
+            if supersede:
+                if _db_latest_work.get(supersede) is not fut:
+                    continue
+                del _db_latest_work[supersede]
+            if _tk_exists(owner):
+                on_done(fut)
+    finally:
+        if _tk_exists(tk_root):
+            if _db_work_pending:
+                _schedule_db_consumer(tk_root)
+            else:
+                tk_root.config(cursor="")
+
+
+def _db_work_done(fut: Future):
+    """Completes database work which has no result for the user.
+
+    An unexpected exception is reraised on the Tk thread.
+
+    Args:
+        fut: The completed database work.
+    """
+    fut.result()
+
+
+def _tk_exists(widget) -> bool:
+    """Returns True if the Tk widget has not been destroyed.
+
+    Args:
+        widget:
+    """
+    try:
+        return bool(widget.winfo_exists())
+    except TclError:
+        return False
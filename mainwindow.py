@@ -225,6 +225,11 @@ class MainWindow:
             label="Delete Tag…",
             command=handlers.database.gui_search_tag,
         )
+        self.movie_menu.add_separator()
+        self.movie_menu.add_command(
+            label="Export Movies…",
+            command=handlers.database.gui_export_movies,
+        )
 
         self.window_menu = tk.Menu(self.menubar, name="window")
         self.menubar.add_cascade(menu=self.window_menu, label="Window")
@@ -24,6 +24,7 @@ from typing import Any
 
 import config
 import database
+import handlers
 import mainwindow
 from threadsafe_printer import SafePrinter
 
@@ -54,8 +55,13 @@ def start_up():
 
 def close_down():
     """Execute close down activities."""
-    # Check the database for orphans.
-    database.tables.delete_all_orphans()
+    # Wait for the user's last writes before the database is changed here.
+    handlers.database.shutdown_db_writes()
+
+    # Check the database for orphans. A readonly database cannot be changed.
+    if not database.environment.is_readonly():
+        database.tables.delete_all_orphans()
+    database.tables.log_stats()
 
     # Save the config.Config pickle file
     save_config_file()
@@ -0,0 +1,202 @@
+"""Test module."""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+
+import pytest
+from pytest_check import check
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+
+from sqlalchemy.exc import NoResultFound, IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from benchmark import synthetic
+from database import atables, tables
+from globalconstants import MovieBag, MovieInteger
+
+CATALOG_SIZE = 60
+CRITERIA = [
+    MovieBag(title="river"),
+    MovieBag(year=MovieInteger("1930-1960"), movie_tags={"drama"}),
+    MovieBag(stars={"an"}, directors={"a"}),
+]
+NEW_MOVIE = MovieBag(
+    title="Async Arrival",
+    year=MovieInteger(2042),
+    stars={"Zelda Newcomer"},
+    movie_tags={"film-noir"},
+)
+
+
+@pytest.mark.parametrize("match", CRITERIA)
+def test_match_movies_agrees_with_tables(match, catalog):
+    movie_bags = asyncio.run(atables.match_movies(match))
+
+    check.equal(movie_bags, tables.match_movies(match))
+
+
+def test_match_movies_without_criteria(catalog):
+    check.equal(asyncio.run(atables.match_movies(MovieBag())), [])
+
+
+def test_concurrent_searches(catalog):
+    async def search():
+        return await asyncio.gather(
+            *(atables.match_movies(match) for match in CRITERIA)
+        )
+
+    results = asyncio.run(search())
+
+    check.equal(results, [tables.match_movies(match) for match in CRITERIA])
+
+
+def test_select_all_and_iter_all_movies(catalog):
+    async def read():
+        return (
+            await atables.select_all_movies(),
+            [movie_bag async for movie_bag in atables.iter_all_movies(batch_size=7)],
+        )
+
+    movie_bags, streamed = asyncio.run(read())
+
+    check.equal(len(movie_bags), CATALOG_SIZE)
+    check.equal(
+        sorted(movie_bag["id"] for movie_bag in streamed),
+        sorted(movie_bag["id"] for movie_bag in movie_bags),
+    )
+
+
+def test_iter_match_movies(catalog):
+    async def read():
+        return [movie_bag async for movie_bag in atables.iter_match_movies(CRITERIA[1])]
+
+    check.equal(asyncio.run(read()), tables.match_movies(CRITERIA[1]))
+
+
+def test_page_movies(catalog):
+    async def read():
+        pages = []
+        cursor = None
+        while True:
+            page, cursor = await atables.page_movies(cursor=cursor, page_size=25)
+            pages.append(page)
+            if cursor is None:
+                return pages
+
+    pages = asyncio.run(read())
+
+    check.equal([len(page) for page in pages], [25, 25, 10])
+
+
+def test_page_movies_with_match_without_criteria(catalog):
+    page, cursor = asyncio.run(atables.page_movies(match=MovieBag(stars=set())))
+
+    check.equal(page, [])
+    check.is_none(cursor)
+
+
+def test_select_movie(catalog):
+    movie_bag = tables.select_all_movies()[0]
+
+    check.equal(asyncio.run(atables.select_movie(movie_bag=movie_bag)), movie_bag)
+
+
+def test_select_movie_not_found(catalog):
+    with pytest.raises(NoResultFound) as exc_info:
+        asyncio.run(atables.select_movie(movie_bag=NEW_MOVIE))
+
+    check.equal(
+        exc_info.value.__notes__,
+        [tables.MOVIE_NOT_FOUND, NEW_MOVIE["title"], str(NEW_MOVIE["year"])],
+    )
+
+
+def test_add_movie_invalidates_tables_cache(catalog):
+    match = MovieBag(stars={"zelda"})
+    check.equal(tables.match_movies(match), [])
+
+    asyncio.run(atables.add_movie(movie_bag=NEW_MOVIE))
+
+    movie_bags = tables.match_movies(match)
+    check.equal([movie_bag["title"] for movie_bag in movie_bags], [NEW_MOVIE["title"]])
+
+
+def test_add_movie_duplicate(catalog):
+    asyncio.run(atables.add_movie(movie_bag=NEW_MOVIE))
+
+    with pytest.raises(IntegrityError) as exc_info:
+        asyncio.run(atables.add_movie(movie_bag=NEW_MOVIE))
+
+    check.equal(
+        exc_info.value.__notes__,
+        [tables.MOVIE_EXISTS, NEW_MOVIE["title"], str(NEW_MOVIE["year"])],
+    )
+
+
+def test_add_movies(catalog):
+    movie_bags = list(synthetic.movie_bags(5, seed=99))
+    duplicate = tables.select_all_movies()[0]
+
+    rejects = asyncio.run(
+        atables.add_movies(movie_bags=movie_bags + [duplicate], chunk_size=2)
+    )
+
+    check.equal([movie_bag for movie_bag, _ in rejects], [duplicate])
+    check.equal(len(tables.select_all_movies()), CATALOG_SIZE + 5)
+
+
+def test_edit_and_delete_movie(catalog):
+    asyncio.run(atables.add_movie(movie_bag=NEW_MOVIE))
+    replacement = MovieBag(title=NEW_MOVIE["title"], year=MovieInteger(2043))
+
+    asyncio.run(
+        atables.edit_movie(old_movie_bag=NEW_MOVIE, replacement_fields=replacement)
+    )
+    edited = tables.select_movie(movie_bag=replacement)
+    asyncio.run(atables.delete_movie(movie_bag=edited))
+
+    check.equal(tables.match_movies(MovieBag(title=NEW_MOVIE["title"])), [])
+    check.equal(tables.match_movies(MovieBag(stars={"zelda"})), [])
+
+
+def test_tags(catalog):
+    async def write():
+        await atables.add_tag(tag_text="async one")
+        await atables.add_tags(tag_texts={"async two", "async three"})
+        await atables.edit_tag(old_tag_text="async one", new_tag_text="async four")
+        await atables.delete_tag(tag_text="async two")
+        return await atables.match_tags(match="async"), await atables.select_all_tags()
+
+    matched, tag_texts = asyncio.run(write())
+
+    check.equal(matched, {"async three", "async four"})
+    check.equal(tag_texts, tables.select_all_tags())
+
+
+@pytest.fixture(scope="function")
+def catalog(tmp_path):
+    """Binds tables and atables to the same synthetic catalog."""
+    hold_session_factory = tables.session_factory
+    hold_async_session_factory = atables.session_factory
+    url = f"sqlite+pysqlite:///{tmp_path / 'catalog.sqlite3'}"
+    engine = synthetic.create_catalog(CATALOG_SIZE, url=url)
+    async_engine = create_async_engine(url.replace("pysqlite", "aiosqlite"))
+    atables.session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    yield
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+    atables.session_factory = hold_async_session_factory
+    tables.session_factory = hold_session_factory
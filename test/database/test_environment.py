@@ -13,9 +13,15 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import asyncio
+import sqlite3
+from functools import partial
+from unittest.mock import MagicMock
+
 import pytest
 from pytest_check import check
 from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
 
 from database import update, environment
 
@@ -66,6 +72,7 @@ def test_start_engine(monkeypatch, tmp_path, log_info):
         mock_getcreate_metadata(get_create_metadata_calls, saved_version),
     )
 
+    monkeypatch.setattr(environment.config, "persistent", None)
     register_session_factory_calls = []
     monkeypatch.setattr(
         environment,
@@ -130,6 +137,7 @@ def test_start_engine_with_update(monkeypatch, tmp_path):
     monkeypatch.setattr(
         environment, "_register_session_factory", lambda *args, **kwargs: None
     )
+    monkeypatch.setattr(environment.config, "persistent", None)
 
     update_database_calls = []
     monkeypatch.setattr(
@@ -142,7 +150,9 @@ def test_start_engine_with_update(monkeypatch, tmp_path):
     environment.start_engine()
 
     # Assert
-    assert update_database_calls == [((saved_version, data_dir_path), {})]
+    assert update_database_calls == [
+        ((saved_version, data_dir_path), {"progress": None})
+    ]
 
 
 def test__get_create_directories(monkeypatch):
@@ -237,9 +247,10 @@ def test__register_session_factory(tmp_path, monkeypatch):
         return func
 
     hold_session_factory = environment.tables.session_factory
+    hold_async_session_factory = environment.atables.session_factory
     database_name = environment.DATABASE_STEM + environment.schema.VERSION + ".sqlite3"
     database_fn = tmp_path / database_name
-    expected_engine = "expected_engine"
+    expected_engine = create_engine("sqlite+pysqlite:///:memory:")
     create_engine_calls = []
     monkeypatch.setattr(
         environment,
@@ -269,6 +280,86 @@ def test__register_session_factory(tmp_path, monkeypatch):
     check.equal(create_all_calls, [((expected_engine,), {})])
 
     environment.tables.session_factory = hold_session_factory
+    environment.atables.session_factory = hold_async_session_factory
+
+
+@pytest.mark.parametrize(
+    "profile, expected",
+    [
+        ("safe", dict(journal_mode="wal", synchronous=2, query_only=0)),
+        ("fast", dict(journal_mode="wal", synchronous=1, query_only=0)),
+        ("readonly", dict(journal_mode="wal", synchronous=1, query_only=1)),
+    ],
+)
+def test__register_session_factory_applies_sqlite_profile(
+    profile, expected, tmp_path, monkeypatch, log_info
+):
+    hold_session_factory = environment.tables.session_factory
+    hold_async_session_factory = environment.atables.session_factory
+    persistent = environment.config.PersistentConfig("Test", "Test.0.dev")
+    persistent.sqlite_profile = profile
+    monkeypatch.setattr(environment.config, "persistent", persistent)
+    # A readonly profile needs an existing database.
+    engine = create_engine(
+        f"sqlite+pysqlite:///{tmp_path / environment.DATABASE_STEM}"
+        f"{environment.schema.VERSION}.sqlite3"
+    )
+    environment.schema.Base.metadata.create_all(engine)
+    engine.dispose()
+
+    environment._register_session_factory(tmp_path)
+
+    with environment.tables.session_factory() as session:
+        for name, value in expected.items():
+            check.equal(
+                session.connection().exec_driver_sql(f"PRAGMA {name}").scalar(),
+                value,
+                name,
+            )
+    check.equal(len(log_info), 1)
+    check.is_in(f"{environment.SQLITE_PROFILE_MSG} {profile!r}: ", log_info[0][0][0])
+    if environment.atables.AVAILABLE:  # pragma no branch
+
+        async def async_pragmas():
+            async with environment.atables.session_factory() as async_session:
+                connection = await async_session.connection()
+                values = {
+                    name: (await connection.exec_driver_sql(f"PRAGMA {name}")).scalar()
+                    for name in expected
+                }
+            await environment.atables.session_factory.kw["bind"].dispose()
+            return values
+
+        check.equal(asyncio.run(async_pragmas()), expected)
+    environment.tables.session_factory.kw["bind"].dispose()
+    environment.tables.session_factory = hold_session_factory
+    environment.atables.session_factory = hold_async_session_factory
+
+
+def test__sqlite_profile_without_persistent_config(monkeypatch):
+    monkeypatch.setattr(environment.config, "persistent", None)
+
+    check.equal(environment._sqlite_profile(), environment.DEFAULT_SQLITE_PROFILE)
+
+
+def test__sqlite_profile_with_unknown_profile(monkeypatch, log_error):
+    persistent = environment.config.PersistentConfig("Test", "Test.0.dev")
+    persistent.sqlite_profile = "garbage"
+    monkeypatch.setattr(environment.config, "persistent", persistent)
+
+    check.equal(environment._sqlite_profile(), environment.DEFAULT_SQLITE_PROFILE)
+    check.equal(
+        log_error,
+        [
+            (
+                (
+                    f"{environment.UNKNOWN_SQLITE_PROFILE_MSG}: 'garbage'. "
+                    f"Using {environment.DEFAULT_SQLITE_PROFILE!r}.",
+                ),
+                {},
+            )
+        ],
+    )
 
 
 def test__update_database(monkeypatch, tmp_path, log_info):
@@ -295,6 +386,17 @@ def test__update_database(monkeypatch, tmp_path, log_info):
         "update_old_database",
         mock_update_old_database(update_old_database_calls, movies, tags),
     )
+    monkeypatch.setattr(environment.update, "count_old_movies", lambda *args: 3)
+    monkeypatch.setattr(environment.tables, "count_movies", lambda: 3)
+    monkeypatch.setattr(
+        environment.tables, "select_checkpoint", lambda **kwargs: (0, 0)
+    )
+    delete_checkpoint_calls = []
+    monkeypatch.setattr(
+        environment.tables,
+        "delete_checkpoint",
+        lambda *args, **kwargs: delete_checkpoint_calls.append((args, kwargs)),
+    )
     add_tags_calls = []
     monkeypatch.setattr(
         environment.tables,
@@ -304,7 +406,7 @@ def test__update_database(monkeypatch, tmp_path, log_info):
     add_movies_calls = []
     monkeypatch.setattr(
         environment.tables,
-        "add_movie",
+        "add_movies",
         lambda *args, **kwargs: add_movies_calls.append((args, kwargs)),
     )
 
@@ -318,18 +420,18 @@ def test__update_database(monkeypatch, tmp_path, log_info):
     environment._update_database(old_version, tmp_path)
 
     # Assert update_old_database
-    check.equal(update_old_database_calls, [((old_version, old_version_fn), {})])
-
-    # Assert movies added
     check.equal(
-        add_movies_calls,
-        [
-            ((), {"movie_bag": "movie 1"}),
-            ((), {"movie_bag": "movie 2"}),
-            ((), {"movie_bag": "movie 3"}),
-        ],
+        update_old_database_calls, [((old_version, old_version_fn), {"after_id": 0})]
     )
 
+    # Assert movies added
+    check.equal(len(add_movies_calls), 1)
+    check.equal(add_movies_calls[0][1]["movie_bags"], movies)
+    check.equal(add_movies_calls[0][1]["checkpoint"], old_version)
+
+    # Assert checkpoint deleted
+    check.equal(delete_checkpoint_calls, [((), {"old_version": old_version})])
+
     # Assert tags added
     check.equal(add_tags_calls, [((), {"tag_texts": tags})])
 
@@ -346,6 +448,443 @@ def test__update_database(monkeypatch, tmp_path, log_info):
     ]
 
 
+def test__update_database_resumes_after_interruption(monkeypatch, tmp_path, log_info):
+    # Arrange an old database
+    old_version = "DBv0"
+    old_version_fn = environment._old_database_fn(old_version, tmp_path)
+    old_version_fn.parent.mkdir()
+    connection = sqlite3.connect(old_version_fn)
+    for statement in V0_DDL:
+        connection.execute(statement)
+    connection.executemany(
+        "INSERT INTO movies VALUES (?, ?, 'Dan Director', 90, ?, 'Notes')",
+        ((ix + 1, f"Movie {ix}", 4240 + ix) for ix in range(5)),
+    )
+    connection.commit()
+    connection.close()
+
+    # Arrange a new database
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'new.sqlite3'}")
+    environment.schema.Base.metadata.create_all(engine)
+    monkeypatch.setattr(environment.tables, "session_factory", sessionmaker(engine))
+    monkeypatch.setattr(
+        environment.tables,
+        "add_movies",
+        partial(environment.tables.add_movies, chunk_size=2),
+    )
+    saved_version_fn = tmp_path / (environment.SAVED_VERSION + ".json")
+    saved_version_fn.write_text(
+        environment.json.dumps({environment.SAVED_VERSION: old_version})
+    )
+
+    def interrupt(migration_progress):
+        """Interrupts the update after the first chunk."""
+        raise KeyboardInterrupt
+
+    # Act: interrupted
+    with pytest.raises(KeyboardInterrupt):
+        environment._update_database(old_version, tmp_path, progress=interrupt)
+
+    check.equal(environment.tables.select_checkpoint(old_version=old_version), (2, 2))
+    check.equal(
+        environment.json.loads(saved_version_fn.read_text()),
+        {environment.SAVED_VERSION: old_version},
+    )
+
+    # Act: resumed
+    reports = []
+    environment._update_database(
+        old_version,
+        tmp_path,
+        progress=lambda progress: reports.append((progress.done, progress.total)),
+    )
+
+    # Assert
+    check.equal(reports, [(4, 5), (5, 5)])
+    check.equal(
+        sorted(
+            movie_bag["title"] for movie_bag in environment.tables.select_all_movies()
+        ),
+        [f"Movie {ix}" for ix in range(5)],
+    )
+    check.equal(environment.tables.select_checkpoint(old_version=old_version), (0, 0))
+    check.equal(
+        environment.json.loads(saved_version_fn.read_text()),
+        {environment.SAVED_VERSION: environment.schema.VERSION},
+    )
+    check.is_in(((f"{environment.UPDATE_RESUMED_MSG} 2.",), {}), log_info)
+    engine.dispose()
+
+
+def test__update_database_with_rejected_movies(monkeypatch, tmp_path, log_error):
+    # Arrange an old database with a duplicate movie and an invalid year
+    old_version = "DBv0"
+    old_version_fn = environment._old_database_fn(old_version, tmp_path)
+    old_version_fn.parent.mkdir()
+    connection = sqlite3.connect(old_version_fn)
+    for statement in V0_DDL:
+        connection.execute(statement)
+    connection.executemany(
+        "INSERT INTO movies VALUES (?, ?, 'Dan Director', 90, ?, 'Notes')",
+        ((1, "Movie", 4242), (2, "Movie", 4242), (3, "Old Movie", 1800)),
+    )
+    connection.commit()
+    connection.close()
+
+    # Arrange a new database
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'new.sqlite3'}")
+    environment.schema.Base.metadata.create_all(engine)
+    monkeypatch.setattr(environment.tables, "session_factory", sessionmaker(engine))
+    saved_version_fn = tmp_path / (environment.SAVED_VERSION + ".json")
+    saved_version_fn.write_text(
+        environment.json.dumps({environment.SAVED_VERSION: old_version})
+    )
+
+    # Act and Assert: both the update and the resumed update fail
+    for _ in range(2):
+        with check, pytest.raises(environment.update.DatabaseUpdateCheckZeroError):
+            environment._update_database(
+                old_version, tmp_path, progress=lambda progress: None
+            )
+
+    check.equal(
+        environment.json.loads(saved_version_fn.read_text()),
+        {environment.SAVED_VERSION: old_version},
+    )
+    check.equal(environment.tables.select_checkpoint(old_version=old_version), (3, 3))
+    check.equal(
+        log_error[-1],
+        (
+            (
+                environment.update.DatabaseUpdateCheckZeroError,
+                environment.update.CHECK_ZERO_MIGRATED_MOVIES,
+            ),
+            {},
+        ),
+    )
+    engine.dispose()
+
+
+def test_start_engine_upgrades_v1_database_in_place(monkeypatch, tmp_path, log_info):
+    # Arrange a v1 database
+    old_version_fn = environment._old_database_fn("DBv1", tmp_path)
+    old_version_fn.parent.mkdir()
+    connection = sqlite3.connect(old_version_fn)
+    for statement in V1_DDL:
+        connection.execute(statement)
+    connection.executescript(
+        "INSERT INTO movie VALUES "
+        "(1, '2001-02-03 04:05:06', '2002-03-04 05:06:07', 'Movie notes', "
+        "'The River', 1951, 99, 'Synopsis');"
+        "INSERT INTO person VALUES "
+        "(1, '2003-01-01 00:00:00', '2004-01-01 00:00:00', 'Person notes', "
+        "'Sam Star');"
+        "INSERT INTO tag VALUES "
+        "(1, '2005-01-01 00:00:00', '2006-01-01 00:00:00', 'Tag notes', 'Tag 1');"
+        "INSERT INTO movie_star_table VALUES (1, 1);"
+        "INSERT INTO movie_tag_table VALUES (1, 1);"
+    )
+    connection.commit()
+    connection.close()
+    saved_version_fn = tmp_path / (environment.SAVED_VERSION + ".json")
+    saved_version_fn.write_text(
+        environment.json.dumps({environment.SAVED_VERSION: "DBv1"})
+    )
+    database_dir = tmp_path / (environment.DATABASE_STEM + environment.schema.VERSION)
+    database_dir.mkdir()
+    monkeypatch.setattr(
+        environment, "_getcreate_directories", lambda *args: (tmp_path, database_dir)
+    )
+    monkeypatch.setattr(environment.config, "persistent", None)
+    hold_session_factory = environment.tables.session_factory
+    hold_async_session_factory = environment.atables.session_factory
+
+    # Act
+    try:
+        environment.start_engine()
+        movie_bags = environment.tables.match_movies(
+            environment.tables.MovieBag(title="riv"),
+            mode=environment.tables.PREFIX_SEARCH,
+        )
+        with environment.tables.session_factory() as session:
+            rows = {
+                name: session.connection()
+                .exec_driver_sql(f"SELECT created, updated, notes FROM {name}")
+                .one()
+                for name in ("movie", "person", "tag")
+            }
+            indexes = set(
+                session.connection()
+                .exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")
+                .scalars()
+            )
+    finally:
+        environment.tables.session_factory.kw["bind"].dispose()
+        environment.tables.session_factory = hold_session_factory
+        environment.atables.session_factory = hold_async_session_factory
+
+    # Assert
+    check.equal([movie_bag["stars"] for movie_bag in movie_bags], [{"Sam Star"}])
+    check.equal(
+        rows,
+        dict(
+            movie=("2001-02-03 04:05:06", "2002-03-04 05:06:07", "Movie notes"),
+            person=("2003-01-01 00:00:00", "2004-01-01 00:00:00", "Person notes"),
+            tag=("2005-01-01 00:00:00", "2006-01-01 00:00:00", "Tag notes"),
+        ),
+    )
+    expected_indexes = {
+        index.name
+        for table in environment.schema.Base.metadata.tables.values()
+        for index in table.indexes
+    }
+    check.is_true(expected_indexes <= indexes, expected_indexes - indexes)
+    check.equal(
+        environment.json.loads(saved_version_fn.read_text()),
+        {environment.SAVED_VERSION: environment.schema.VERSION},
+    )
+    check.is_in(((update.INFO_UPDATE_V1_STARTING,), {}), log_info)
+
+
+def test__progress_logger(log_info):
+    logger = environment._progress_logger()
+
+    logger(update.MigrationProgress(done=1, total=4, rows=1, seconds=1.0))
+    logger(update.MigrationProgress(done=4, total=4, rows=4, seconds=2.0))
+
+    check.equal(
+        log_info,
+        [
+            (
+                (
+                    f"{environment.UPDATE_PROGRESS_MSG}: 4 of 4 movies, "
+                    f"2 movies/s, ETA 0s.",
+                ),
+                {},
+            )
+        ],
+    )
+
+
+def test_start_engine_starts_backup(monkeypatch, tmp_path):
+    data_dir_path = tmp_path
+    database_dir_path = tmp_path / (
+        environment.DATABASE_STEM + environment.schema.VERSION
+    )
+    monkeypatch.setattr(
+        environment,
+        "_getcreate_directories",
+        lambda *args: (data_dir_path, database_dir_path),
+    )
+    monkeypatch.setattr(
+        environment, "_getcreate_metadata", lambda *args: environment.schema.VERSION
+    )
+    monkeypatch.setattr(environment, "_register_session_factory", lambda *args: None)
+    persistent = environment.config.PersistentConfig("Test", "Test.0.dev")
+    monkeypatch.setattr(environment.config, "persistent", persistent)
+    start_backup_calls = []
+    monkeypatch.setattr(
+        environment,
+        "start_backup",
+        lambda *args, **kwargs: start_backup_calls.append((args, kwargs)),
+    )
+
+    # The backup is opt-in.
+    environment.start_engine()
+    check.equal(start_backup_calls, [])
+
+    persistent.backup_on_start = True
+    environment.start_engine()
+    check.equal(start_backup_calls, [((data_dir_path, database_dir_path), {})])
+
+
+def test_start_backup(tmp_path, log_info):
+    database_dir = tmp_path / (environment.DATABASE_STEM + environment.schema.VERSION)
+    database_dir.mkdir()
+    database_fn = database_dir / (
+        environment.DATABASE_STEM + environment.schema.VERSION + ".sqlite3"
+    )
+    _create_database(database_fn, rows=3)
+
+    thread = environment.start_backup(tmp_path, database_dir)
+    thread.join()
+
+    backups = list((tmp_path / environment.BACKUP_DIR_NAME).iterdir())
+    check.equal(len(backups), 1)
+    check.equal(_count_rows(backups[0]), 3)
+
+
+def test_backup_database(tmp_path, log_info):
+    database_fn = tmp_path / "movies.sqlite3"
+    _create_database(database_fn, rows=42)
+    backup_dir = tmp_path / environment.BACKUP_DIR_NAME
+
+    backup_fn = environment.backup_database(database_fn, backup_dir=backup_dir, pages=1)
+
+    check.equal(backup_fn.parent, backup_dir)
+    check.is_true(backup_fn.name.startswith("movies_"))
+    check.equal(backup_fn.suffix, ".sqlite3")
+    check.equal(_count_rows(backup_fn), 42)
+    check.equal(list(backup_dir.iterdir()), [backup_fn])
+    check.is_true(log_info[0][0][0].startswith(environment.BACKUP_COMPLETE_MSG))
+
+
+def test_backup_database_while_another_connection_writes(tmp_path, log_info):
+    database_fn = tmp_path / "movies.sqlite3"
+    _create_database(database_fn, rows=200)
+    writer = sqlite3.connect(database_fn, isolation_level=None)
+    remaining = []
+
+    def write_between_steps(*_):
+        remaining.append(None)
+        if len(remaining) > 100:
+            raise RuntimeError("The backup is restarting.")
+        writer.execute("INSERT INTO item (text) VALUES ('late')")
+
+    hold_sleep = environment.time.sleep
+    environment.time.sleep = write_between_steps
+    try:
+        backup_fn = environment.backup_database(
+            database_fn, backup_dir=tmp_path / environment.BACKUP_DIR_NAME, pages=1
+        )
+    finally:
+        environment.time.sleep = hold_sleep
+        writer.close()
+
+    # A restarted backup would copy the database's pages more than once.
+    check.equal(len(remaining), backup_fn.stat().st_size // 4096)
+    check.equal(_count_rows(backup_fn), 200)
+
+
+def test_backup_database_keeps_newest_backups(tmp_path, log_info):
+    database_fn = tmp_path / "movies.sqlite3"
+    _create_database(database_fn, rows=1)
+    backup_dir = tmp_path / environment.BACKUP_DIR_NAME
+    backup_dir.mkdir()
+    old_backups = [
+        backup_dir / f"movies_2024010{day}T000000.sqlite3" for day in range(1, 5)
+    ]
+    for old_backup_fn in old_backups:
+        old_backup_fn.touch()
+    stale_partial_fn = backup_dir / (
+        "movies_20240105T000000.sqlite3" + environment.PARTIAL_BACKUP_SUFFIX
+    )
+    stale_partial_fn.touch()
+
+    backup_fn = environment.backup_database(database_fn, backup_dir=backup_dir, keep=3)
+
+    check.equal(sorted(backup_dir.iterdir()), old_backups[2:] + [backup_fn])
+
+
+def test_backup_database_twice_in_one_second(tmp_path, monkeypatch, log_info):
+    database_fn = tmp_path / "movies.sqlite3"
+    _create_database(database_fn, rows=1)
+    backup_dir = tmp_path / environment.BACKUP_DIR_NAME
+    now = environment.datetime(2024, 1, 1)
+    monkeypatch.setattr(
+        environment, "datetime", MagicMock(name="datetime", now=lambda: now)
+    )
+
+    backups = [
+        environment.backup_database(database_fn, backup_dir=backup_dir, keep=2)
+        for _ in range(3)
+    ]
+
+    check.equal(
+        [backup_fn.name for backup_fn in backups],
+        [
+            "movies_20240101T000000.sqlite3",
+            "movies_20240101T000000_1.sqlite3",
+            "movies_20240101T000000_2.sqlite3",
+        ],
+    )
+    check.equal(sorted(backup_dir.iterdir()), backups[1:])
+
+
+def test_backup_database_deletes_sidecars_of_old_backups(tmp_path, log_info):
+    database_fn = tmp_path / "movies.sqlite3"
+    _create_database(database_fn, rows=1)
+    backup_dir = tmp_path / environment.BACKUP_DIR_NAME
+    backup_dir.mkdir()
+    old_backup_fn = backup_dir / "movies_20240101T000000.sqlite3"
+    old_backup_fn.touch()
+    for sidecar in ("-wal", "-shm"):
+        (backup_dir / (old_backup_fn.name + sidecar)).touch()
+
+    backup_fn = environment.backup_database(database_fn, backup_dir=backup_dir, keep=1)
+
+    check.equal(list(backup_dir.iterdir()), [backup_fn])
+
+
+def test_backup_database_failure(tmp_path, log_error):
+    database_fn = tmp_path / "movies.sqlite3"
+    database_fn.write_text("This is not a database.")
+
+    with pytest.raises(sqlite3.DatabaseError) as exc_info:
+        environment.backup_database(
+            database_fn, backup_dir=tmp_path / environment.BACKUP_DIR_NAME
+        )
+
+    check.equal(
+        exc_info.value.__notes__, [environment.BACKUP_FAILED_MSG, str(database_fn)]
+    )
+    check.equal(
+        log_error,
+        [((f"{environment.BACKUP_FAILED_MSG} {exc_info.value.args[0]}",), {})],
+    )
+
+
+V0_DDL = (
+    "CREATE TABLE tags (id INTEGER PRIMARY KEY, tag VARCHAR)",
+    "CREATE TABLE movies (id INTEGER PRIMARY KEY, title VARCHAR, director VARCHAR, "
+    "minutes INTEGER, year INTEGER, notes VARCHAR)",
+    "CREATE TABLE movie_tag (movies_id INTEGER, tag_id INTEGER)",
+)
+V1_DDL = (
+    "CREATE TABLE movie (id INTEGER NOT NULL, created DATETIME NOT NULL, "
+    "updated DATETIME NOT NULL, notes VARCHAR, title VARCHAR NOT NULL, "
+    "year INTEGER NOT NULL, duration INTEGER, synopsis VARCHAR, PRIMARY KEY (id), "
+    "UNIQUE (title, year), CHECK (year>1878), CHECK (year<=10000))",
+    "CREATE TABLE person (id INTEGER NOT NULL, created DATETIME NOT NULL, "
+    "updated DATETIME NOT NULL, notes VARCHAR, name VARCHAR NOT NULL, "
+    "PRIMARY KEY (id), UNIQUE (name))",
+    "CREATE TABLE tag (id INTEGER NOT NULL, created DATETIME NOT NULL, "
+    "updated DATETIME NOT NULL, notes VARCHAR, text VARCHAR NOT NULL, "
+    "PRIMARY KEY (id), UNIQUE (text))",
+    "CREATE TABLE movie_tag_table (movie_id INTEGER NOT NULL, "
+    "tag_id INTEGER NOT NULL, PRIMARY KEY (movie_id, tag_id), "
+    "FOREIGN KEY(movie_id) REFERENCES movie (id), "
+    "FOREIGN KEY(tag_id) REFERENCES tag (id))",
+    "CREATE TABLE movie_star_table (movie_id INTEGER NOT NULL, "
+    "person_id INTEGER NOT NULL, PRIMARY KEY (movie_id, person_id), "
+    "FOREIGN KEY(movie_id) REFERENCES movie (id), "
+    "FOREIGN KEY(person_id) REFERENCES person (id))",
+    "CREATE TABLE movie_director_table (movie_id INTEGER NOT NULL, "
+    "person_id INTEGER NOT NULL, PRIMARY KEY (movie_id, person_id), "
+    "FOREIGN KEY(movie_id) REFERENCES movie (id), "
+    "FOREIGN KEY(person_id) REFERENCES person (id))",
+)
+
+
+def _create_database(database_fn, *, rows: int):
+    """Creates a write-ahead logging database with an item table."""
+    connection = sqlite3.connect(database_fn, isolation_level=None)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, text TEXT)")
+    connection.executemany(
+        "INSERT INTO item (text) VALUES (?)", ((f"item {ix}",) for ix in range(rows))
+    )
+    connection.close()
+
+
+def _count_rows(database_fn) -> int:
+    """Returns the number of rows in the item table."""
+    connection = sqlite3.connect(database_fn)
+    count = connection.execute("SELECT COUNT(*) FROM item").fetchone()[0]
+    connection.close()
+    return count
+
+
 @pytest.fixture(scope="function")
 def session_engine():
     """Yields an engine."""
@@ -361,3 +900,15 @@ def log_info(monkeypatch):
         update.logging, "info", lambda *args, **kwargs: calls.append((args, kwargs))
     )
     return calls
+
+
+@pytest.fixture(scope="function")
+def log_error(monkeypatch):
+    """Logs arguments of calls to logging.error."""
+    calls = []
+    monkeypatch.setattr(
+        environment.logging,
+        "error",
+        lambda *args, **kwargs: calls.append((args, kwargs)),
+    )
+    return calls
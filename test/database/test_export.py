@@ -0,0 +1,95 @@
+"""Test module."""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import csv
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_check import check
+
+from benchmark import synthetic
+from database import export, tables
+
+CATALOG_SIZE = 30
+
+
+@pytest.mark.parametrize("batch_size", [7, export.YIELD_PER_BATCH_SIZE])
+def test_export_movies_to_jsonl(batch_size, catalog, tmp_path):
+    path = tmp_path / "movies.jsonl"
+
+    export_stats = export.export_movies(path, batch_size=batch_size)
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    expected = [
+        export._jsonl_record(movie_bag)
+        for movie_bag in sorted(tables.select_all_movies(), key=lambda bag: bag["id"])
+    ]
+    check.equal(records, expected)
+    check.equal(export_stats.rows, CATALOG_SIZE)
+    check.greater(export_stats.rows_per_second, 0)
+
+
+def test_export_movies_to_csv(catalog, tmp_path):
+    path = tmp_path / "movies.csv"
+    movie_bag = min(tables.select_all_movies(), key=lambda bag: bag["id"])
+
+    export.export_movies(path)
+
+    with path.open(newline="") as file:
+        rows = list(csv.DictReader(file))
+    check.equal(len(rows), CATALOG_SIZE)
+    check.equal(rows[0]["title"], movie_bag["title"])
+    check.equal(rows[0]["year"], str(movie_bag["year"]))
+    check.equal(
+        set(rows[0]["stars"].split(export.CSV_SEPARATOR)), movie_bag.get("stars", {""})
+    )
+    check.equal(
+        set(rows[0]["movie_tags"].split(export.CSV_SEPARATOR)),
+        movie_bag.get("movie_tags", {""}),
+    )
+
+
+def test_export_movies_with_format_argument(catalog, tmp_path):
+    path = tmp_path / "movies.txt"
+
+    export.export_movies(path, export_format=export.JSONL)
+
+    check.equal(len(path.read_text().splitlines()), CATALOG_SIZE)
+
+
+def test_export_movies_with_unknown_format(monkeypatch, tmp_path):
+    path = tmp_path / "movies.xml"
+    logging_error = MagicMock(name="logging_error")
+    monkeypatch.setattr(export.logging, "error", logging_error)
+
+    with pytest.raises(ValueError) as exc_info:
+        export.export_movies(path)
+
+    check.equal(exc_info.value.__notes__, [export.UNKNOWN_FORMAT, str(path)])
+    check.is_false(path.exists())
+    with check:
+        logging_error.assert_called_once_with(f"{export.UNKNOWN_FORMAT} {path}.")
+
+
+@pytest.fixture(scope="function")
+def catalog(tmp_path):
+    """Binds tables to a synthetic catalog."""
+    hold_session_factory = tables.session_factory
+    engine = synthetic.create_catalog(
+        CATALOG_SIZE, url=f"sqlite+pysqlite:///{tmp_path / 'catalog.sqlite3'}"
+    )
+    yield
+    engine.dispose()
+    tables.session_factory = hold_session_factory
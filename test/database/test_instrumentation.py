@@ -0,0 +1,86 @@
+"""Test module."""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+from pytest_check import check
+from sqlalchemy import create_engine, text
+
+from database import instrumentation
+
+
+@instrumentation.instrumented
+def outer(engine):
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    inner(engine)
+
+
+@instrumentation.instrumented
+def inner(engine):
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 2"))
+
+
+def test_nested_calls_are_recorded_once(enabled):
+    engine = create_engine("sqlite+pysqlite:///:memory:")
+
+    outer(engine)
+    inner(engine)
+
+    summary = instrumentation.summary()
+    check.equal(summary["outer"]["calls"], 1)
+    check.equal(summary["outer"]["statements"], 2)
+    check.equal(summary["inner"]["calls"], 1)
+    check.equal(summary["inner"]["statements"], 1)
+
+
+def test_compiles_are_counted_on_cache_misses(enabled):
+    engine = create_engine("sqlite+pysqlite:///:memory:")
+
+    inner(engine)
+    inner(engine)
+
+    summary = instrumentation.summary()
+    check.equal(summary["inner"]["statements"], 2)
+    check.equal(summary["inner"]["compiles"], 1)
+
+
+def test_disable_removes_listeners(enabled):
+    instrumentation.disable()
+
+    check.is_false(
+        instrumentation.event.contains(
+            instrumentation.Engine,
+            "before_cursor_execute",
+            instrumentation._before_cursor_execute,
+        )
+    )
+
+
+@pytest.mark.parametrize(
+    "samples, percentile, expected",
+    [([7.0], 99, 7.0), ([1.0, 2.0, 3.0], 50, 2.0), ([0.0, 10.0], 95, 9.5)],
+)
+def test__percentile(samples, percentile, expected):
+    check.almost_equal(instrumentation._percentile(samples, percentile), expected)
+
+
+@pytest.fixture(scope="function")
+def enabled():
+    """Enables instrumentation with empty statistics."""
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
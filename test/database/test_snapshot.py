@@ -0,0 +1,192 @@
+"""Test module."""
+
+#  Copyright© 2025. Stephen Rigden.
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+
+import pytest
+from pytest_check import check
+
+pytest.importorskip("numpy")
+
+from benchmark import synthetic
+from database import snapshot, tables
+from globalconstants import MovieBag, MovieInteger
+
+CATALOG_SIZE = 300
+CRITERIA = [
+    MovieBag(title="river"),
+    MovieBag(title="RIVER", year=MovieInteger("1950-1990")),
+    MovieBag(year=MovieInteger("1930-1940, 2000-2010"), duration=MovieInteger("90")),
+    MovieBag(synopsis="night", notes="r"),
+    MovieBag(stars={"an"}, directors={"a"}),
+    MovieBag(stars={"walsh", "sato"}),
+    MovieBag(movie_tags={"noir"}),
+    MovieBag(movie_tags={"r", "drama"}, title="e"),
+]
+
+
+@pytest.mark.parametrize("match", CRITERIA)
+def test_match_ids_agrees_with_sql(match, catalog):
+    with tables.session_factory() as session:
+        expected = {movie.id for movie in tables._match_movies(session, match=match)}
+        catalog.load(session)
+
+    check.equal(set(catalog.match_ids(match).tolist()), expected)
+
+
+def test_load_new(catalog):
+    with tables.session_factory() as session:
+        catalog.load(session)
+    tables.add_movie(
+        movie_bag=MovieBag(
+            title="Late Arrival",
+            year=MovieInteger(2042),
+            stars={"Zelda Newcomer"},
+            movie_tags={"film-noir"},
+        )
+    )
+
+    with tables.session_factory() as session:
+        catalog.load_new(session)
+
+    check.equal(len(catalog), CATALOG_SIZE + 1)
+    ids = catalog.match_ids(MovieBag(stars={"zelda"}, movie_tags={"noir"}))
+    check.equal(len(ids), 1)
+
+
+def test_discard_and_refresh(catalog):
+    with tables.session_factory() as session:
+        catalog.load(session)
+    first, second = catalog.ids[:2].tolist()
+
+    catalog.discard({first})
+    with tables.session_factory() as session:
+        catalog.refresh(session, movie_ids={second})
+
+    check.equal(len(catalog), CATALOG_SIZE - 1)
+    check.equal(len(catalog.ids), CATALOG_SIZE + 1)
+    check.is_not_in(first, catalog.match_ids(MovieBag(title="")))
+    check.is_in(second, catalog.match_ids(MovieBag(title="")))
+
+
+def test_match_movies_uses_snapshot(catalog):
+    match = MovieBag(year=MovieInteger("1950-1990"), movie_tags={"drama"})
+    expected = tables.match_movies(match)
+    tables.enable_snapshot()
+
+    movie_bags = tables.match_movies(match)
+
+    check.equal(
+        {movie_bag["id"] for movie_bag in movie_bags},
+        {movie_bag["id"] for movie_bag in expected},
+    )
+    check.is_instance(tables._catalog_snapshot[1], snapshot.CatalogSnapshot)
+
+
+@pytest.mark.parametrize(
+    "write",
+    [
+        lambda: tables.add_movie(
+            movie_bag=MovieBag(
+                title="Snapshot Arrival", year=MovieInteger(1960), movie_tags={"drama"}
+            )
+        ),
+        lambda: tables.edit_movie(
+            old_movie_bag=tables.match_movies(MovieBag(movie_tags={"drama"}))[0],
+            replacement_fields=MovieBag(movie_tags={"comedy"}),
+        ),
+        lambda: tables.delete_movie(
+            movie_bag=tables.match_movies(MovieBag(movie_tags={"drama"}))[0]
+        ),
+        lambda: tables.edit_tag(old_tag_text="drama", new_tag_text="melodrama"),
+    ],
+)
+def test_writes_update_snapshot(write, catalog):
+    match = MovieBag(movie_tags={"drama"})
+    tables.enable_snapshot()
+    tables.match_movies(match)
+
+    write()
+    movie_bags = tables.match_movies(match)
+
+    tables.disable_snapshot()
+    expected = tables.match_movies(match)
+    check.equal(
+        {movie_bag["id"] for movie_bag in movie_bags},
+        {movie_bag["id"] for movie_bag in expected},
+    )
+
+
+def test_search_before_snapshot_update_is_not_cached(catalog, monkeypatch):
+    monkeypatch.setattr(tables, "MATCH_CACHE_SIZE", 16)
+    match = MovieBag(title="Snapshot Arrival")
+    update_snapshot = tables._update_snapshot
+
+    def search_then_update_snapshot(*args, **kwargs):
+        """Searches after the commit but before the snapshot is updated."""
+        tables.match_movies(match)
+        update_snapshot(*args, **kwargs)
+
+    monkeypatch.setattr(tables, "_update_snapshot", search_then_update_snapshot)
+    tables.enable_snapshot()
+    tables.match_movies(match)
+
+    tables.add_movie(movie_bag=MovieBag(title=match["title"], year=MovieInteger(1960)))
+    movie_bags = tables.match_movies(match)
+
+    check.equal([movie_bag["title"] for movie_bag in movie_bags], [match["title"]])
+
+
+def test_writes_wait_for_searches_of_the_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(tables, "MATCH_CACHE_SIZE", 0)
+    hold_session_factory = tables.session_factory
+    # The writer thread needs its own connection to the same database.
+    engine = synthetic.create_catalog(
+        CATALOG_SIZE, url=f"sqlite+pysqlite:///{tmp_path / 'catalog.sqlite3'}"
+    )
+    match = MovieBag(title="Snapshot Arrival")
+    writer = threading.Thread(
+        target=tables.add_movie,
+        kwargs=dict(movie_bag=MovieBag(title=match["title"], year=MovieInteger(1960))),
+    )
+    tables.enable_snapshot()
+    try:
+        tables.match_movies(match)
+        with tables._snapshot_lock:
+            writer.start()
+            writer.join(0.2)
+            check.is_true(writer.is_alive())
+        writer.join()
+        movie_bags = tables.match_movies(match)
+    finally:
+        tables.disable_snapshot()
+        engine.dispose()
+        tables.session_factory = hold_session_factory
+
+    check.equal([movie_bag["title"] for movie_bag in movie_bags], [match["title"]])
+
+
+@pytest.fixture(scope="function")
+def catalog(monkeypatch):
+    """Yields an empty snapshot and binds tables to a synthetic catalog.
+
+    The match cache is disabled so every match_movies call is a search.
+    """
+    monkeypatch.setattr(tables, "MATCH_CACHE_SIZE", 0)
+    hold_session_factory = tables.session_factory
+    engine = synthetic.create_catalog(CATALOG_SIZE)
+    yield snapshot.CatalogSnapshot()
+    tables.disable_snapshot()
+    engine.dispose()
+    tables.session_factory = hold_session_factory
@@ -16,7 +16,7 @@
 import pytest
 from pytest_check import check
 
-from sqlalchemy import create_engine, Engine
+from sqlalchemy import create_engine, Engine, event
 from sqlalchemy.exc import NoResultFound
 
 from database import schema, tables
@@ -123,6 +123,10 @@ def test_select_all_movies(test_database):
         check.equal(movie["id"], int(movie["notes"][-1:]))
 
 
+def test_count_movies(test_database):
+    check.equal(tables.count_movies(), 4)
+
+
 def test_match_movies(test_database):
     star_substring = "full"
     year_pattern = MovieInteger("4242-4244")
@@ -142,6 +146,250 @@ def test_match_movies(test_database):
         )
 
 
+def test_match_movies_repeat_is_served_from_cache(test_database, statement_count):
+    hits = tables.match_cache_stats.hits
+    first = tables.match_movies(
+        MovieBag(stars={"full"}, year=MovieInteger("4242-4244"))
+    )
+    statement_count.clear()
+
+    first[0]["stars"].add("Caller's Own Star")
+    repeat = tables.match_movies(
+        MovieBag(stars={"full"}, year=MovieInteger("4242-4243, 4244"))
+    )
+
+    check.equal(statement_count, [])
+    check.equal(tables.match_cache_stats.hits, hits + 1)
+    check.equal(len(repeat), 2)
+    check.is_not_in("Caller's Own Star", repeat[0]["stars"])
+
+
+def test_match_movies_cache_is_invalidated_by_writes(test_database):
+    match = MovieBag(stars={"full"})
+    tables.match_movies(match)
+    misses = tables.match_cache_stats.misses
+
+    tables.add_movie(
+        movie_bag=MovieBag(
+            title="Cache Buster", year=MovieInteger(4250), stars={"Fanny Fullworthy"}
+        )
+    )
+    movie_bags = tables.match_movies(match)
+
+    check.equal(tables.match_cache_stats.misses, misses + 1)
+    check.is_in("Cache Buster", {movie_bag["title"] for movie_bag in movie_bags})
+
+
+def test_match_movies_cache_evicts_least_recently_used(test_database, monkeypatch):
+    monkeypatch.setattr(tables, "MATCH_CACHE_SIZE", 2)
+    for title in ("one", "two", "one", "three"):
+        tables.match_movies(MovieBag(title=title))
+    misses = tables.match_cache_stats.misses
+
+    tables.match_movies(MovieBag(title="one"))
+    tables.match_movies(MovieBag(title="two"))
+
+    check.equal(tables.match_cache_stats.misses, misses + 1)
+
+
+def test_match_movies_full_text(test_database):
+    movie_bags = tables.match_movies(
+        MovieBag(synopsis="SYNOP", title="transf", year=MovieInteger("4242-4244")),
+        mode=tables.FULL_TEXT_SEARCH,
+    )
+
+    check.equal([movie["title"] for movie in movie_bags], [MOVIEBAG_2["title"]])
+    check.equal(movie_bags[0]["stars"], MOVIEBAG_2["stars"])
+
+
+def test_match_movies_full_text_matches_word_prefixes_only(test_database):
+    movie_bags = tables.match_movies(
+        MovieBag(title="ransformer"), mode=tables.FULL_TEXT_SEARCH
+    )
+
+    check.equal(movie_bags, [])
+
+
+def test_match_movies_full_text_without_words(test_database):
+    movie_bags = tables.match_movies(MovieBag(title="  "), mode=tables.FULL_TEXT_SEARCH)
+
+    check.equal(movie_bags, [])
+
+
+def test_match_movies_prefix(test_database):
+    tables.add_movie(
+        movie_bag=MovieBag(
+            title="The River", year=MovieInteger(5310), stars={"Edgar Ethelred"}
+        )
+    )
+    tables.add_movie(movie_bag=MovieBag(title="Rivers", year=MovieInteger(5311)))
+    tables.add_movie(movie_bag=MovieBag(title="Up the River", year=MovieInteger(5312)))
+
+    movie_bags = tables.match_movies(
+        MovieBag(title="the RIV"), mode=tables.PREFIX_SEARCH
+    )
+    starred = tables.match_movies(
+        MovieBag(title="river", stars={"EDGAR"}), mode=tables.PREFIX_SEARCH
+    )
+
+    check.equal({movie["title"] for movie in movie_bags}, {"The River", "Rivers"})
+    check.equal([movie["title"] for movie in starred], ["The River"])
+
+
+def test_match_movies_prefix_matches_name_prefixes_only(test_database):
+    movie_bags = tables.match_movies(
+        MovieBag(directors={"Director"}), mode=tables.PREFIX_SEARCH
+    )
+
+    check.equal(movie_bags, [])
+
+
+def test_match_movies_full_text_is_ranked(test_database):
+    tables.add_movie(
+        movie_bag=MovieBag(
+            title="Ranked Best", year=MovieInteger(5300), notes="river river river"
+        )
+    )
+    tables.add_movie(
+        movie_bag=MovieBag(
+            title="Ranked Worst",
+            year=MovieInteger(5301),
+            notes="A long note which mentions the river only once in many words.",
+        )
+    )
+
+    movie_bags = tables.match_movies(
+        MovieBag(notes="river"), mode=tables.FULL_TEXT_SEARCH
+    )
+
+    check.equal(
+        [movie["title"] for movie in movie_bags], ["Ranked Best", "Ranked Worst"]
+    )
+
+
+def test_full_text_index_follows_edits_and_deletes(test_database):
+    tables.edit_movie(
+        old_movie_bag=MOVIEBAG_1,
+        replacement_fields=MovieBag(title="Edited Zebra", year=MOVIEBAG_1["year"]),
+    )
+    found_new = tables.match_movies(
+        MovieBag(title="zebra"), mode=tables.FULL_TEXT_SEARCH
+    )
+    found_old = tables.match_movies(
+        MovieBag(title="first"), mode=tables.FULL_TEXT_SEARCH
+    )
+    tables.delete_movie(
+        movie_bag=MovieBag(title="Edited Zebra", year=MOVIEBAG_1["year"])
+    )
+    found_deleted = tables.match_movies(
+        MovieBag(title="zebra"), mode=tables.FULL_TEXT_SEARCH
+    )
+
+    check.equal([movie["title"] for movie in found_new], ["Edited Zebra"])
+    check.equal(found_old, [])
+    check.equal(found_deleted, [])
+
+
+def test_movie_bag_conversion_query_count_is_flat(test_database, statement_count):
+    match = MovieBag(year=MovieInteger("4000-6000"))
+    tables.select_all_movies()
+    tables.match_movies(match)
+    baseline = list(statement_count)
+    statement_count.clear()
+    for ix in range(20):
+        tables.add_movie(
+            movie_bag=MovieBag(
+                title=f"Query Count {ix}",
+                year=MovieInteger(5000 + ix),
+                directors={f"Director {ix}"},
+                stars={f"Star {ix}", f"Costar {ix}"},
+                movie_tags={SOUGHT_TAG},
+            )
+        )
+    statement_count.clear()
+
+    tables.select_all_movies()
+    tables.match_movies(match)
+
+    check.equal(
+        len(statement_count),
+        len(baseline),
+        msg="Relationship loading must not issue extra statements per movie.",
+    )
+
+
+def test_iter_all_movies(test_database):
+    movie_bags = tables.iter_all_movies(batch_size=2)
+
+    check.is_instance(movie_bags, tables.Iterator)
+    check.equal(
+        {movie["notes"] for movie in movie_bags},
+        {movie["notes"] for movie in tables.select_all_movies()},
+    )
+
+
+def test_iter_match_movies(test_database):
+    match = MovieBag(stars={"full"}, year=MovieInteger("4242-4244"))
+
+    movie_bags = list(tables.iter_match_movies(match, batch_size=1))
+
+    check.equal(
+        {movie["title"] for movie in movie_bags},
+        {movie["title"] for movie in tables.match_movies(match)},
+    )
+    check.equal(len(movie_bags), 2)
+
+
+def test_iter_match_movies_without_criteria(test_database):
+    assert list(tables.iter_match_movies(MovieBag())) == []
+
+
+def test_page_movies(test_database):
+    expected = sorted(
+        (movie_bag["title"], int(movie_bag["year"]))
+        for movie_bag in [MOVIEBAG_1, MOVIEBAG_2, MOVIEBAG_3, MOVIEBAG_4]
+    )
+
+    pages = []
+    page, cursor = tables.page_movies(page_size=3)
+    pages.append(page)
+    while cursor:
+        page, cursor = tables.page_movies(cursor=cursor, page_size=3)
+        pages.append(page)
+
+    check.equal([len(page) for page in pages], [3, 1])
+    keys = [(movie["title"], int(movie["year"])) for page in pages for movie in page]
+    check.equal(keys, expected)
+
+
+def test_page_movies_with_match(test_database):
+    match = MovieBag(title="movie")
+
+    first_page, cursor = tables.page_movies(match=match, page_size=2)
+    last_page, last_cursor = tables.page_movies(match=match, cursor=cursor, page_size=2)
+
+    check.equal(
+        [movie["title"] for movie in first_page + last_page],
+        ["First Movie", "Fourth Movie", "Third Movie"],
+    )
+    check.equal(cursor, ("Fourth Movie", 4244))
+    check.is_none(last_cursor)
+
+
+@pytest.mark.parametrize(
+    "match, mode",
+    [
+        (MovieBag(stars=set()), tables.SUBSTRING_SEARCH),
+        (MovieBag(title="  "), tables.FULL_TEXT_SEARCH),
+    ],
+)
+def test_page_movies_with_match_without_criteria(test_database, match, mode):
+    page, cursor = tables.page_movies(match=match, mode=mode)
+
+    check.equal(page, [])
+    check.is_none(cursor)
+
+
 def test_add_movie(test_database):
     # Arrange
     extra_star = "Gerald Golightly"
@@ -268,6 +516,104 @@ def test_add_movie_with_too_late_year(test_database, log_error):
     )
 
 
+def test_add_movies(test_database):
+    movie_bags = [
+        MovieBag(
+            title=f"Bulk Movie {ix}",
+            year=MovieInteger(5100 + ix),
+            duration=MovieInteger(90 + ix),
+            synopsis=f"Bulk synopsis {ix}",
+            notes=f"Bulk notes {ix}",
+            movie_tags=TAG_TEXTS,
+            directors=TEST_DIRECTORS | {f"Bulk Director {ix}"},
+            stars=TEST_STARS | {"Bulk Star", f"Bulk Star {ix}"},
+        )
+        for ix in range(5)
+    ]
+
+    rejects = tables.add_movies(movie_bags=movie_bags, chunk_size=2)
+
+    check.equal(rejects, [])
+    with tables.session_factory() as session:
+        for movie_bag in movie_bags:
+            check_movie_assignments(session, movie_bag)
+        check.equal(
+            len(tables._select_people(session, names={"Bulk Star"})),
+            1,
+            msg="A person shared by several movies must only be added once.",
+        )
+
+
+def test_add_movies_reports_rejects(test_database, log_error):
+    tag_text = "add_movies_with_invalid_tag"
+    good = MovieBag(title="Good Bulk Movie", year=MovieInteger(5200))
+    bad_tag = MovieBag(title="Bad Tag", year=MovieInteger(5201), movie_tags={tag_text})
+    duplicate = MovieBag(title=MOVIEBAG_1["title"], year=MOVIEBAG_1["year"])
+    bad_year = MovieBag(title="Bad Year", year=MovieInteger(schema.MUYBRIDGE))
+    batch_duplicate = MovieBag(title="Good Bulk Movie", year=MovieInteger(5200))
+
+    rejects = tables.add_movies(
+        movie_bags=[good, bad_tag, duplicate, bad_year, batch_duplicate]
+    )
+
+    check.equal(
+        [movie_bag for movie_bag, _ in rejects],
+        [bad_tag, duplicate, bad_year, batch_duplicate],
+    )
+    notes = [exc.__notes__ for _, exc in rejects]
+    check.equal(
+        notes,
+        [
+            [tables.TAG_NOT_FOUND, tag_text],
+            [tables.MOVIE_EXISTS, MOVIEBAG_1["title"], str(MOVIEBAG_1["year"])],
+            [tables.INVALID_YEAR, str(schema.MUYBRIDGE)],
+            [tables.MOVIE_EXISTS, good["title"], str(good["year"])],
+        ],
+    )
+    check.is_instance(rejects[0][1], tables.NoResultFound)
+    check.is_instance(rejects[1][1], tables.IntegrityError)
+    check.equal(len(log_error), 4)
+    check.equal(tables.select_movie(movie_bag=good)["title"], good["title"])
+
+
+def test_add_movies_advances_checkpoint(test_database, log_error):
+    movie_bags = [
+        MovieBag(id=old_id, title=f"Migrated Movie {old_id}", year=MovieInteger(5300))
+        for old_id in (3, 7, 8)
+    ]
+    # A rejected movie is still counted as migrated.
+    movie_bags.append(
+        MovieBag(id=12, title=MOVIEBAG_1["title"], year=MOVIEBAG_1["year"])
+    )
+    progress_calls = []
+
+    tables.add_movies(
+        movie_bags=movie_bags,
+        chunk_size=3,
+        checkpoint="DBv42",
+        progress=progress_calls.append,
+    )
+
+    check.equal(tables.select_checkpoint(old_version="DBv42"), (12, 4))
+    check.equal(progress_calls, [3, 1])
+    check.equal(len(log_error), 1)
+
+
+def test_select_checkpoint_without_checkpoint(test_database):
+    check.equal(tables.select_checkpoint(old_version="DBv42"), (0, 0))
+
+
+def test_delete_checkpoint(test_database):
+    tables.add_movies(
+        movie_bags=[MovieBag(id=1, title="Migrated Movie", year=MovieInteger(5300))],
+        checkpoint="DBv42",
+    )
+
+    tables.delete_checkpoint(old_version="DBv42")
+
+    check.equal(tables.select_checkpoint(old_version="DBv42"), (0, 0))
+
+
 def test_edit_movie(test_database):
     old_movie_bag = MovieBag(
         title="Test Edit Movie",
@@ -501,6 +847,43 @@ def test_select_all_tags(test_database):
     assert tag_texts == TAG_TEXTS
 
 
+def test_select_all_tags_reads_through_cache(test_database, statement_count):
+    hits = tables.tag_cache_stats.hits
+    misses = tables.tag_cache_stats.misses
+    tables.select_all_tags()
+    statement_count.clear()
+
+    tag_texts = tables.select_all_tags()
+    tag_texts.add("caller's own tag")
+
+    check.equal(tables.select_all_tags(), TAG_TEXTS)
+    check.equal(statement_count, [])
+    check.equal(tables.tag_cache_stats.hits, hits + 2)
+    check.equal(tables.tag_cache_stats.misses, misses + 1)
+
+
+@pytest.mark.parametrize(
+    "write, expected",
+    [
+        (lambda: tables.add_tag(tag_text="cached"), TAG_TEXTS | {"cached"}),
+        (lambda: tables.add_tags(tag_texts={"cached"}), TAG_TEXTS | {"cached"}),
+        (
+            lambda: tables.edit_tag(old_tag_text=SOUGHT_TAG, new_tag_text="cached"),
+            TAG_TEXTS - {SOUGHT_TAG} | {"cached"},
+        ),
+        (lambda: tables.delete_tag(tag_text=SOUGHT_TAG), TAG_TEXTS - {SOUGHT_TAG}),
+    ],
+)
+def test_tag_writes_invalidate_tag_cache(write, expected, test_database):
+    tables.select_all_tags()
+    misses = tables.tag_cache_stats.misses
+
+    write()
+
+    check.equal(tables.select_all_tags(), expected)
+    check.equal(tables.tag_cache_stats.misses, misses + 1)
+
+
 def test_match_tags(test_database):
     tags = tables.match_tags(match=SOUGHT_TAG)
 
@@ -593,7 +976,7 @@ def test_delete_all_orphans(test_database, log_info):
             [
                 (
                     (
-                        "1 Orphan(s) were removed. They should have been removed before now.",
+                        "2 Orphan(s) were removed. They should have been removed before now.",
                     ),
                     {},
                 )
@@ -601,6 +984,80 @@ def test_delete_all_orphans(test_database, log_info):
         )
 
 
+def test_delete_all_orphans_is_one_statement(test_database, statement_count):
+    with tables.session_factory() as session:
+        for ix in range(50):
+            tables._add_person(session, name=f"Orphan {ix}")
+        session.commit()
+    statement_count.clear()
+
+    tables.delete_all_orphans()
+
+    deletes = [sql for sql in statement_count if sql.startswith("DELETE")]
+    check.equal(len(deletes), 1)
+    check.equal(len(statement_count), 1)
+
+
+def test_stats_records_outermost_calls(test_database, stats_enabled, statement_count):
+    statement_count.clear()
+    tables.add_movie(
+        movie_bag=MovieBag(title="Stats", year=MovieInteger(1999), stars={"Star"})
+    )
+    add_movie_statements = len(statement_count)
+    tables.match_movies(MovieBag(title="Stats"))
+    tables.match_movies(MovieBag(title="Stats"))
+
+    calls = tables.stats()["calls"]
+
+    check.equal(set(calls), {"add_movie", "match_movies"})
+    check.equal(calls["add_movie"]["calls"], 1)
+    check.equal(calls["add_movie"]["statements"], add_movie_statements)
+    check.greater(calls["add_movie"]["rows_changed"], 0)
+    check.equal(calls["match_movies"]["rows_changed"], 0)
+    check.equal(calls["match_movies"]["calls"], 2)
+    check.less_equal(calls["match_movies"]["p50_ms"], calls["match_movies"]["p99_ms"])
+    check.equal(tables.stats()["match_cache"], dict(hits=1, misses=1))
+
+
+def test_match_movies_of_the_same_shape_are_compiled_once(
+    test_database, stats_enabled, monkeypatch
+):
+    monkeypatch.setattr(tables, "MATCH_CACHE_SIZE", 0)
+    tables.match_movies(
+        MovieBag(title=MOVIEBAG_2["title"], stars={"full"}, year=MOVIEBAG_2["year"])
+    )
+    first = tables.stats()["calls"]["match_movies"]
+
+    tables.match_movies(
+        MovieBag(title=MOVIEBAG_4["title"], stars={"ethel"}, year=MOVIEBAG_4["year"])
+    )
+
+    calls = tables.stats()["calls"]["match_movies"]
+    check.greater(first["compiles"], 0)
+    check.equal(calls["calls"], 2)
+    check.equal(calls["compiles"], first["compiles"])
+    check.greater(tables.stats()["statement_cache"]["hits"], 0)
+
+
+def test_stats_when_disabled(test_database, stats_enabled):
+    tables.disable_stats()
+
+    tables.select_all_movies()
+
+    check.equal(tables.stats()["calls"], {})
+
+
+def test_log_stats(test_database, stats_enabled, log_info):
+    tables.select_all_movies()
+
+    tables.log_stats()
+
+    check.equal(len(log_info), 2)
+    check.is_true(
+        log_info[0][0][0].startswith(f"{tables.STATS_MSG} select_all_movies: ")
+    )
+
+
 def test_invalid_movie_regression(test_database):
     """Regression test.
 
@@ -652,6 +1109,7 @@ def session_engine():
     engine: Engine = create_engine("sqlite+pysqlite:///:memory:")
     schema.Base.metadata.create_all(engine)
     tables.session_factory = sessionmaker(engine)
+    return engine
 
 
 @pytest.fixture(scope="function")
@@ -710,6 +1168,31 @@ def test_database(session_engine):
         session.commit()
 
 
+@pytest.fixture(scope="function")
+def statement_count(session_engine):
+    """Records every SQL statement executed by the engine."""
+    statements = []
+
+    # noinspection PyUnusedLocal
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(session_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(session_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture(scope="function")
+def stats_enabled(monkeypatch):
+    """Enables the statement timing with empty statistics."""
+    monkeypatch.setattr(tables, "match_cache_stats", tables.CacheStats())
+    tables.instrumentation.reset()
+    tables.enable_stats()
+    yield
+    tables.disable_stats()
+    tables.instrumentation.reset()
+
+
 @pytest.fixture(scope="function")
 def log_error(monkeypatch):
     """Logs arguments of calls to logging.error."""
@@ -15,7 +15,7 @@
 
 import pytest
 from pytest_check import check
-from sqlalchemy import create_engine, Engine
+from sqlalchemy import create_engine, Engine, event
 
 from database import schema, tables
 from database.tables import (
@@ -186,6 +186,227 @@ def test__match_2_movie(load_movies, db_session: Session):
     assert {movie.notes for movie in movies} == {MOVIEBAG_2["notes"]}
 
 
+def test__match_movies_statement_is_a_single_query():
+    movie_bag = MovieBag(
+        title="Movie",
+        stars={"ethel", "worth"},
+        directors={"donald"},
+        movie_tags={"tag"},
+    )
+
+    statement, parameters = tables._match_movies_statement(match=movie_bag)
+    sql = str(statement)
+
+    check.is_not_in("INTERSECT", sql)
+    check.equal(sql.count("movie.id IN (SELECT"), 4)
+    check.equal(
+        parameters,
+        dict(
+            title="%Movie%",
+            stars_0="%ethel%",
+            stars_1="%worth%",
+            directors_0="%donald%",
+            movie_tags_0="%tag%",
+        ),
+    )
+
+
+def test__match_movies_statement_is_cached_by_shape(monkeypatch):
+    monkeypatch.setattr(tables, "_statement_cache", tables.OrderedDict())
+    monkeypatch.setattr(tables, "statement_cache_stats", tables.CacheStats())
+
+    first, first_parameters = tables._match_movies_statement(
+        match=MovieBag(title="Movie", year=MovieInteger("1950-1960"), stars={"ethel"})
+    )
+    second, second_parameters = tables._match_movies_statement(
+        match=MovieBag(title="Film", year=MovieInteger("1970-1980"), stars={"worth"})
+    )
+    other_shape, _ = tables._match_movies_statement(
+        match=MovieBag(title="Film", year=MovieInteger("1970"), stars={"worth"})
+    )
+
+    check.is_(first, second)
+    check.is_not(first, other_shape)
+    check.equal(second_parameters["title"], "%Film%")
+    check.equal(second_parameters["year_0_high"], 1980)
+    check.equal(tables.statement_cache_stats, tables.CacheStats(hits=1, misses=2))
+
+
+def test__in_ranges():
+    criteria = MovieInteger("1900-2024, 2030, 2040-2041")
+
+    shape, parameters = tables._match_shape(
+        MovieBag(year=criteria), mode=tables.SUBSTRING_SEARCH
+    )
+
+    condition = tables._in_ranges(schema.Movie.year, singles=shape[0][1])
+
+    statement = tables.select(schema.Movie.id).where(condition).params(parameters)
+    sql = str(statement.compile(compile_kwargs={"literal_binds": True}))
+    sql = sql.split("WHERE ")[1]
+    assert sql == (
+        "movie.year BETWEEN 1900 AND 2024 OR movie.year = 2030 "
+        "OR movie.year BETWEEN 2040 AND 2041"
+    )
+
+
+@pytest.mark.parametrize(
+    "link_table, link_column, ids, index",
+    [
+        (
+            schema.movie_tag_table,
+            schema.movie_tag_table.c.tag_id,
+            tables._match_tag_ids("tag"),
+            "ix_movie_tag_table_tag_id_movie_id",
+        ),
+        (
+            schema.movie_star_table,
+            schema.movie_star_table.c.person_id,
+            tables._match_person_ids("Star"),
+            "ix_movie_star_table_person_id_movie_id",
+        ),
+        (
+            schema.movie_director_table,
+            schema.movie_director_table.c.person_id,
+            tables._match_person_ids("Director"),
+            "ix_movie_director_table_person_id_movie_id",
+        ),
+    ],
+)
+def test__linked_to_uses_reverse_index(
+    link_table, link_column, ids, index, load_movies, db_session: Session
+):
+    condition = tables._linked_to(link_table, link_column, ids)
+    statement = tables.select(schema.Movie.id).where(condition)
+    compiled = statement.compile(compile_kwargs={"literal_binds": True})
+
+    plan = db_session.execute(tables.text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+
+    assert index in " ".join(row[-1] for row in plan)
+
+
+@pytest.mark.parametrize("column", [schema.Movie.year, schema.Movie.duration])
+def test__in_ranges_uses_index(column, load_movies, db_session: Session):
+    condition = tables._in_ranges(column, singles=(False,))
+    statement = (
+        tables.select(schema.Movie.id)
+        .where(condition)
+        .params({f"{column.key}_0_low": 100, f"{column.key}_0_high": 200})
+    )
+    compiled = statement.compile(compile_kwargs={"literal_binds": True})
+
+    plan = db_session.execute(tables.text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+
+    assert f"ix_movie_{column.key}" in " ".join(row[-1] for row in plan)
+
+
+@pytest.mark.parametrize(
+    "column, index",
+    [
+        (schema.Movie.title_key, "ix_movie_title_key"),
+        (schema.Person.name_key, "ix_person_name_key"),
+    ],
+)
+def test__has_prefix_uses_index(column, index, load_movies, db_session: Session):
+    low, high = tables._prefix_range("riv")
+    condition = tables._has_prefix(column, name="prefix")
+    statement = (
+        tables.select(column.class_.id)
+        .where(condition)
+        .params(prefix=low, prefix_high=high)
+    )
+    compiled = statement.compile(compile_kwargs={"literal_binds": True})
+
+    plan = db_session.execute(tables.text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+
+    assert index in " ".join(row[-1] for row in plan)
+
+
+def test__match_shape_of_prefix_search():
+    shape, parameters = tables._match_shape(
+        MovieBag(title="The Riv", stars={"Edgar"}, notes="note"),
+        mode=tables.PREFIX_SEARCH,
+    )
+
+    check.equal(
+        shape,
+        (
+            ("notes",),
+            ("stars", 1, tables.PREFIX_SEARCH),
+            ("title", tables.PREFIX_SEARCH),
+        ),
+    )
+    check.equal(parameters["title"], "riv")
+    check.equal(parameters["title_high"], "riv\U0010ffff")
+    check.equal(parameters["stars_0"], "edgar")
+    check.equal(parameters["notes"], "%note%")
+
+
+@pytest.mark.parametrize(
+    "title",
+    ["The River", "the  river", "A Bridge", "An Affair", "Another", "ÉCOLE", "The"],
+)
+def test_title_key_matches_generated_column(title, db_session: Session):
+    db_session.add(schema.Movie(title=title, year=1960))
+    db_session.flush()
+
+    statement = tables.select(schema.Movie.title_key).where(schema.Movie.title == title)
+    check.equal(db_session.scalars(statement).one(), schema.title_key(title))
+
+
+def test_key_columns_are_added_to_an_existing_database():
+    engine = create_engine("sqlite+pysqlite:///:memory:")
+    schema.Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for index in ("ix_movie_title_key", "ix_person_name_key"):
+            connection.exec_driver_sql(f"DROP INDEX {index}")
+        connection.exec_driver_sql("ALTER TABLE movie DROP COLUMN title_key")
+        connection.exec_driver_sql("ALTER TABLE person DROP COLUMN name_key")
+        connection.exec_driver_sql(
+            "INSERT INTO movie (title, year, created, updated) "
+            "VALUES ('The River', 1960, 0, 0)"
+        )
+
+    schema.Base.metadata.create_all(engine)
+
+    with engine.connect() as connection:
+        check.equal(
+            connection.exec_driver_sql("SELECT title_key FROM movie").scalar(), "river"
+        )
+        indexes = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        ).scalars()
+        check.is_true({"ix_movie_title_key", "ix_person_name_key"} <= set(indexes))
+
+
+def test__match_cache_key():
+    key = tables._match_cache_key(
+        MovieBag(
+            year=MovieInteger("1950-1952, 1953-1955"),
+            title="kwai",
+            stars=["Edgar Ethelred", "Fanny Fullworthy"],
+        ),
+        mode=tables.SUBSTRING_SEARCH,
+    )
+
+    assert key == (
+        tables.SUBSTRING_SEARCH,
+        (
+            ("stars", frozenset({"Edgar Ethelred", "Fanny Fullworthy"})),
+            ("title", "kwai"),
+            ("year", ((1950, 1955),)),
+        ),
+    )
+
+
+def test__full_text_query():
+    criteria = dict(title='kwai "bridge', synopsis="  ", notes="river")
+
+    query = tables._full_text_query(criteria)
+
+    assert query == 'title : ("kwai"* """bridge"*) AND notes : ("river"*)'
+
+
 def test__select_all_movies(load_movies, db_session: Session):
     movies = tables._select_all_movies(db_session)
 
@@ -222,6 +443,28 @@ def test__match_people(load_people, db_session: Session):
     assert names == PEOPLE_NAMES
 
 
+def test__match_people_follows_inserts_and_deletes(load_people, db_session: Session):
+    tables._add_person(db_session, name="Test D Dougal")
+    person = tables._select_person(db_session, name=PERSON_SOUGHT)
+    tables._delete_person(db_session, person=person)
+    db_session.flush()
+
+    people = tables._match_people(db_session, match="st d doug")
+    deleted = tables._match_people(db_session, match=PERSON_MATCH)
+
+    check.equal({person.name for person in people}, {"Test D Dougal"})
+    check.equal(deleted, set())
+
+
+def test__match_person_ids_uses_trigram_index(load_people, db_session: Session):
+    statement = tables._match_person_ids(PERSON_MATCH)
+    compiled = statement.compile(compile_kwargs={"literal_binds": True})
+
+    plan = db_session.execute(tables.text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+
+    assert "VIRTUAL TABLE INDEX" in plan[0][-1]
+
+
 def test__add_person(load_people, db_session: Session):
     new_person_name = "Test D Dougal"
     tables._add_person(db_session, name=new_person_name)
@@ -230,6 +473,45 @@ def test__add_person(load_people, db_session: Session):
     assert person.name == new_person_name
 
 
+def test__getadd_people(load_people, session_engine, db_session: Session):
+    new_person_name = "Test D Dougal"
+    names = {PERSON_SOUGHT, new_person_name}
+    statements = []
+
+    # noinspection PyUnusedLocal
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(session_engine, "before_cursor_execute", listener)
+
+    people = tables._getadd_people(db_session, names=names)
+    select_count = sum(statement.startswith("SELECT") for statement in statements)
+    statements.clear()
+    people_again = tables._getadd_people(db_session, names={new_person_name})
+    event.remove(session_engine, "before_cursor_execute", listener)
+
+    check.equal({person.name for person in people}, names)
+    check.equal(select_count, 1, msg="Existing people must be found by one query.")
+    check.equal(statements, [], msg="Known names must not query the database.")
+    check.equal(people_again, {db_session.info[tables.PEOPLE_BY_NAME][new_person_name]})
+    person = tables._select_person(db_session, name=new_person_name)
+    check.is_in(person, people)
+
+
+def test__getadd_person_ids(load_people, db_session: Session):
+    new_person_name = "Test D Dougal"
+    existing = tables._select_person(db_session, name=PERSON_SOUGHT)
+
+    person_ids = tables._getadd_person_ids(
+        db_session, names={PERSON_SOUGHT, new_person_name}
+    )
+
+    check.equal(person_ids.keys(), {PERSON_SOUGHT, new_person_name})
+    check.equal(person_ids[PERSON_SOUGHT], existing.id)
+    person = tables._select_person(db_session, name=new_person_name)
+    check.equal(person_ids[new_person_name], person.id)
+
+
 def test__delete_person(load_people, db_session: Session):
     person = tables._select_person(db_session, name=PERSON_SOUGHT)
 
@@ -240,24 +522,37 @@ def test__delete_person(load_people, db_session: Session):
 
 
 def test__delete_orphans(load_movies, session_engine, db_session: Session):
-    orphan = schema.Person(name="Nigel Nobody")
-    db_session.add(orphan)
-    all_people = tables._select_all_people(db_session)
-
-    orphans = set()
-    non_orphans = set()
-    for person in all_people:
-        if len(person.star_of_movies) + len(person.director_of_movies) == 0:
-            orphans.add(person)
-        else:
-            non_orphans.add(person)
-
-    count = tables._delete_orphans(db_session, candidates=orphans | non_orphans)
-
-    statement = tables.select(schema.Person)
-    all_people = db_session.scalars(statement).all()
-    check.equal(set(all_people), non_orphans)
+    orphans = {"Nigel Nobody", "Olive Other"}
+    for name in orphans:
+        db_session.add(schema.Person(name=name))
+    db_session.flush()
+    expected = set(db_session.scalars(tables.select(schema.Person.name)).all())
+    expected -= orphans
+
+    count = tables._delete_orphans(db_session)
+
+    statement = tables.select(schema.Person.name)
+    check.equal(set(db_session.scalars(statement).all()), expected)
+    check.equal(count, 2)
+
+
+def test__delete_orphans_with_candidate_ids(load_movies, db_session: Session):
+    candidate = schema.Person(name="Nigel Nobody")
+    bystander = schema.Person(name="Olive Other")
+    db_session.add_all([candidate, bystander])
+    db_session.flush()
+    star = db_session.scalars(
+        tables.select(schema.Person).where(schema.Person.star_of_movies.any())
+    ).first()
+
+    count = tables._delete_orphans(db_session, candidate_ids={candidate.id, star.id})
+
+    statement = tables.select(schema.Person.name)
+    names = set(db_session.scalars(statement).all())
     check.equal(count, 1)
+    check.is_not_in(candidate.name, names)
+    check.is_in(bystander.name, names)
+    check.is_in(star.name, names)
 
 
 def test__select_tag(load_tags, db_session: Session):
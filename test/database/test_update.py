@@ -56,6 +56,14 @@ def test_update_old_database_matching_v0(monkeypatch):
     check.equal(tag_texts, expected_tag_texts)
 
 
+def test_count_old_movies_with_match_fail(log_error):
+    with check:
+        with pytest.raises(update.UnrecognizedOldVersion):
+            update.count_old_movies("garbage")
+
+    check.equal(log_error, [((update.UnrecognizedOldVersion,), {})])
+
+
 def test_update_old_database_with_match_fail(log_error):
     old_version = "garbage"
     old_version_fn = update.Path()
@@ -111,19 +119,33 @@ def test__register_engine(tmp_path):
     assert f"{update.engine.url}" == f"{update.DIALECT}{tmp_path}"
 
 
-def test__reflect_data(create_test_database, db_session):
+@pytest.mark.parametrize("chunk_size", [2, update.UPDATE_CHUNK_SIZE])
+def test__reflect_data(chunk_size, create_test_database, db_session, monkeypatch):
     _, tag_table, movie_tag_table, movies_table = create_test_database
     old_tags = _get_old_tags(tag_table, db_session)
     tag_links, _ = _get_old_movie_tag_links(old_tags, movie_tag_table, db_session)
     expected_bags, _ = _get_old_movies(movies_table, tag_links, db_session)
     expected_tags = set(old_tags.values())
+    monkeypatch.setattr(update, "UPDATE_CHUNK_SIZE", chunk_size)
 
     movie_bags, tags = update._reflect_data()
 
-    check.equal(movie_bags, expected_bags)
+    check.equal(list(movie_bags), expected_bags)
     check.equal(tags, expected_tags)
 
 
+def test__reflect_data_after_id(create_test_database, db_session):
+    _, tag_table, movie_tag_table, movies_table = create_test_database
+    old_tags = _get_old_tags(tag_table, db_session)
+    tag_links, _ = _get_old_movie_tag_links(old_tags, movie_tag_table, db_session)
+    expected_bags, _ = _get_old_movies(movies_table, tag_links, db_session)
+
+    movie_bags, _ = update._reflect_data(after_id=1)
+
+    check.equal(list(movie_bags), expected_bags[1:])
+    check.equal(update.count_old_movies("DBv0"), len(expected_bags))
+
+
 def test__reflect_data_with_bad_tag_count(
     create_test_database, db_session, monkeypatch, log_error
 ):
@@ -153,22 +175,18 @@ def test__reflect_data_with_bad_tag_count(
 def test__reflect_data_with_bad_movie_tag_link_count(
     create_test_database, db_session, monkeypatch, log_error
 ):
-    _, tag_table, movie_tag_table, movies_table = create_test_database
-    old_tags = _get_old_tags(tag_table, db_session)
-    tag_links, _ = _get_old_movie_tag_links(old_tags, movie_tag_table, db_session)
-
     # noinspection DuplicatedCode
     monkeypatch.setattr(
         update,
         "_reflect_old_movie_tag_links",
-        partial(_reflect_old_movie_tag_links_badly, tag_links),
+        _reflect_old_movie_tag_links_badly,
     )
 
     with check:
         with pytest.raises(
             update.DatabaseUpdateCheckZeroError, match=update.CHECK_ZERO_MOVIE_TAG_LINKS
         ):
-            update._reflect_data()
+            list(update._reflect_data()[0])
 
     check.equal(
         log_error,
@@ -187,23 +205,13 @@ def test__reflect_data_with_bad_movie_tag_link_count(
 def test__reflect_data_with_bad_movie_count(
     create_test_database, db_session, monkeypatch, log_error
 ):
-    # noinspection DuplicatedCode
-    _, tag_table, movie_tag_table, movies_table = create_test_database
-    old_tags = _get_old_tags(tag_table, db_session)
-    tag_links, _ = _get_old_movie_tag_links(old_tags, movie_tag_table, db_session)
-    expected_bags, _ = _get_old_movies(movies_table, tag_links, db_session)
-
-    monkeypatch.setattr(
-        update,
-        "_reflect_old_movie",
-        partial(_reflect_old_movie_badly, expected_bags),
-    )
+    monkeypatch.setattr(update, "_reflect_old_movie", _reflect_old_movie_badly)
 
     with check:
         with pytest.raises(
             update.DatabaseUpdateCheckZeroError, match=update.CHECK_ZERO_MOVIES
         ):
-            update._reflect_data()
+            list(update._reflect_data()[0])
 
     check.equal(
         log_error,
@@ -236,12 +244,15 @@ def test__reflect_old_movie_tag_links(create_test_database, db_session):
         old_tags, movie_tag_table, db_session
     )
 
-    expanded_links, check_count = update._reflect_old_movie_tag_links(
-        old_tags, db_session, metadata_obj
+    expanded_links = update._reflect_old_movie_tag_links(
+        old_tags, db_session, movie_tag_table, movie_ids=[1, 2, 3]
+    )
+    chunk_links = update._reflect_old_movie_tag_links(
+        old_tags, db_session, movie_tag_table, movie_ids=[1]
     )
 
     check.equal(expanded_links, expected_links)
-    check.equal(check_count, len(expanded_links))
+    check.equal(chunk_links, {1: expected_links[1]})
 
 
 def test__reflect_old_movie(create_test_database, db_session):
@@ -251,13 +262,11 @@ def test__reflect_old_movie(create_test_database, db_session):
         old_tags, movie_tag_table, db_session
     )
     expected_bags, expected_count = _get_old_movies(movies_table, tag_links, db_session)
+    old_movies = db_session.execute(select(movies_table)).all()
 
-    movie_bags, check_count = update._reflect_old_movie(
-        tag_links, db_session, metadata_obj
-    )
+    movie_bags = update._reflect_old_movie(tag_links, old_movies)
 
     check.equal(movie_bags, expected_bags)
-    check.equal(check_count, expected_count)
 
 
 def reflect_database_v0(
@@ -275,11 +284,13 @@ def reflect_database_v0(
         Mock of update._reflect_database_v0.
     """
 
-    def func(old_version_fn):
+    # noinspection PyUnusedLocal
+    def func(old_version_fn, *, after_id):
         """Mocks update._reflect_database_v0.
 
         Args:
             old_version_fn
+            after_id
 
         Returns:
             Mock movie_bags
@@ -292,7 +303,8 @@ def reflect_database_v0(
 
 
 def _get_data(expected_bags, old_tags):
-    def func():
+    # noinspection PyUnusedLocal
+    def func(*, after_id):
         """..."""
         return expected_bags, old_tags
 
@@ -355,16 +367,14 @@ def _reflect_old_tags_badly(old_tags, session, metadata_obj) -> tuple[Any, float
 
 # noinspection PyUnusedLocal
 def _reflect_old_movie_tag_links_badly(
-    tag_links, old_tags, session, metadata_obj
-) -> tuple[dict[int, str], float]:
-    return tag_links, math.nan
+    tags, session, movie_tags_table, *, movie_ids
+) -> dict[int, set[str]]:
+    return {}
 
 
 # noinspection PyUnusedLocal
-def _reflect_old_movie_badly(
-    expected_bags, movie_tags, session, metadata_obj
-) -> tuple[dict[int, str], float]:
-    return expected_bags, math.nan
+def _reflect_old_movie_badly(movie_tags, old_movies) -> list[MovieBag]:
+    return []
 
 
 @pytest.fixture(scope="function")
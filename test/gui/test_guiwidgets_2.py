@@ -117,6 +117,20 @@ def test_gui_askopenfilename(monkeypatch):
     assert calls == [(dict(parent=parent, filetypes=filetypes))]
 
 
+def test_gui_asksaveasfilename(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        guiwidgets_2.filedialog,
+        "asksaveasfilename",
+        lambda **kwargs: calls.append(kwargs),
+    )
+    parent = DummyTk()
+    filetypes = (("test filetypes",),)
+    # noinspection PyTypeChecker
+    guiwidgets_2.gui_asksaveasfilename(parent, filetypes, ".test")
+    assert calls == [dict(parent=parent, filetypes=filetypes, defaultextension=".test")]
+
+
 # noinspection PyMissingOrEmptyDocstring
 @pytest.fixture
 def dummy_entry_fields():
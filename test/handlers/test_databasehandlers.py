@@ -13,6 +13,8 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from unittest.mock import MagicMock, call
 
 import pytest
@@ -23,6 +25,8 @@ from config import MovieKeyTypedDict
 from globalconstants import MovieTD, MovieInteger, MovieBag
 import handlers
 
+SUBMIT_DB_WORK = handlers.database._submit_db_work
+
 
 # noinspection
 def test_gui_add_movie(monkeypatch, config_current, test_tags):
@@ -624,7 +628,7 @@ def test_db_edit_tag_with_old_tag_not_found(monkeypatch, messagebox, config_curr
     new_tag_text = notes_1 = "new_tag_text"
     db_edit_tag = MagicMock(name="db_edit_tag")
     monkeypatch.setattr(handlers.database.tables, "edit_tag", db_edit_tag)
-    db_edit_tag.side_effect = handlers.database.tables.NoResultFound
+    db_edit_tag.side_effect = handlers.database.tables.NoResultFound()
     notes_0 = handlers.database.tables.TAG_NOT_FOUND
     db_edit_tag.side_effect.__notes__ = [notes_0, notes_1]
     gui_search_tag = MagicMock(name="gui_search_tag")
@@ -679,6 +683,68 @@ def test_db_delete_tag(monkeypatch):
     delete_tag.assert_called_once_with(tag_text=tag_text)
 
 
+def test_gui_export_movies(monkeypatch, messagebox, config_current):
+    filename = "movies.jsonl"
+    asksaveasfilename = MagicMock(name="asksaveasfilename", return_value=filename)
+    monkeypatch.setattr(
+        handlers.database.guiwidgets_2, "gui_asksaveasfilename", asksaveasfilename
+    )
+    export_movies = MagicMock(name="export_movies")
+    export_movies.return_value = handlers.database.export.ExportStats(
+        rows=42, seconds=2.0
+    )
+    monkeypatch.setattr(handlers.database.export, "export_movies", export_movies)
+
+    handlers.database.gui_export_movies()
+
+    with check:
+        asksaveasfilename.assert_called_once_with(
+            config.current.tk_root,
+            handlers.database.EXPORT_FILETYPES,
+            defaultextension=".jsonl",
+        )
+    with check:
+        export_movies.assert_called_once_with(handlers.database.Path(filename))
+    with check:
+        messagebox.assert_called_once_with(
+            config.current.tk_root,
+            message=handlers.database.EXPORT_DONE_MSG,
+            detail="42 movies at 21 movies per second.",
+        )
+
+
+def test_gui_export_movies_cancelled(monkeypatch, config_current):
+    monkeypatch.setattr(
+        handlers.database.guiwidgets_2,
+        "gui_asksaveasfilename",
+        MagicMock(name="asksaveasfilename", return_value=""),
+    )
+    export_movies = MagicMock(name="export_movies")
+    monkeypatch.setattr(handlers.database.export, "export_movies", export_movies)
+
+    handlers.database.gui_export_movies()
+
+    export_movies.assert_not_called()
+
+
+def test_gui_export_movies_with_unknown_format(monkeypatch, messagebox, config_current):
+    filename = "movies.xml"
+    monkeypatch.setattr(
+        handlers.database.guiwidgets_2,
+        "gui_asksaveasfilename",
+        MagicMock(name="asksaveasfilename", return_value=filename),
+    )
+    monkeypatch.setattr(handlers.database.export.logging, "error", MagicMock())
+
+    handlers.database.gui_export_movies()
+
+    messagebox.assert_called_once_with(
+        config.current.tk_root,
+        message=handlers.database.export.UNKNOWN_FORMAT,
+        detail=f"{filename}.",
+    )
+
+
 def test_gui_edit_movie(monkeypatch, config_current, test_tags):
     widget_edit_movie = MagicMock(name="widget_edit_movie")
     monkeypatch.setattr(
@@ -705,6 +771,175 @@ def test_gui_edit_movie(monkeypatch, config_current, test_tags):
         )
 
 
+def test_submit_db_work_delivers_result_on_tk_thread(db_work):
+    on_done = MagicMock(name="on_done")
+
+    SUBMIT_DB_WORK(lambda: 42, on_done)
+    db_work.drain()
+
+    check.equal(on_done.call_args.args[0].result(), 42)
+    check.equal(
+        db_work.tk_root.config.call_args_list,
+        [call(cursor=handlers.database.BUSY_CURSOR), call(cursor="")],
+    )
+    check.equal(handlers.database._db_work_pending, 0)
+
+
+def test_submit_db_work_drops_superseded_work(db_work):
+    on_done = MagicMock(name="on_done")
+
+    for result in ("first", "second"):
+        SUBMIT_DB_WORK(lambda result=result: result, on_done, supersede="search")
+    db_work.drain()
+
+    check.equal([args[0].result() for args, _ in on_done.call_args_list], ["second"])
+    check.equal(handlers.database._db_latest_work, {})
+
+
+def test_submit_db_work_drops_work_for_destroyed_tk_root(db_work):
+    on_done = MagicMock(name="on_done")
+
+    SUBMIT_DB_WORK(lambda: 42, on_done)
+    db_work.tk_root.winfo_exists.side_effect = handlers.database.TclError
+    db_work.drain()
+
+    on_done.assert_not_called()
+
+
+def test_db_consumer_polls_until_work_is_done(db_work):
+    on_done = MagicMock(name="on_done")
+    SUBMIT_DB_WORK(lambda: 42, on_done)
+    db_work.tk_root.after.reset_mock()
+    handlers.database._db_work_pending += 1
+
+    db_work.drain()
+
+    on_done.assert_called_once()
+    db_work.tk_root.after.assert_called_once_with(
+        handlers.database.DB_WORK_POLL,
+        handlers.database._db_consumer,
+        db_work.tk_root,
+    )
+
+
+def test_submit_db_work_runs_writes_in_order(db_work):
+    on_done = MagicMock(name="on_done")
+    writes = []
+    release = threading.Event()
+
+    def write(ix):
+        """Records a write. The first write is slow."""
+        if ix == 0:
+            release.wait(5)
+        writes.append((ix, threading.current_thread().name))
+
+    for ix in range(3):
+        SUBMIT_DB_WORK(lambda ix=ix: write(ix), on_done, write=True)
+    release.set()
+    db_work.drain()
+
+    check.equal([ix for ix, _ in writes], [0, 1, 2])
+    check.equal(len({name for _, name in writes}), 1)
+    check.equal(on_done.call_count, 3)
+
+
+def test_shutdown_db_writes_waits_for_writes(db_work):
+    writes = []
+    release = threading.Event()
+
+    def write():
+        """Records a slow write."""
+        release.wait(0.2)
+        writes.append(True)
+
+    SUBMIT_DB_WORK(write, MagicMock(name="on_done"), write=True)
+    handlers.database.shutdown_db_writes()
+
+    check.equal(writes, [True])
+    with pytest.raises(RuntimeError):
+        handlers.database._db_write_executor.submit(write)
+    db_work.drain()
+
+
+def test_db_consumer_recovers_from_failed_on_done(db_work):
+    on_done = MagicMock(name="on_done", side_effect=[ValueError("failed"), None])
+    SUBMIT_DB_WORK(lambda: 1, on_done)
+    SUBMIT_DB_WORK(lambda: 2, on_done)
+    db_work.tk_root.after.reset_mock()
+
+    with pytest.raises(ValueError):
+        db_work.drain()
+
+    check.equal(handlers.database._db_work_pending, 1)
+    check.is_not_none(handlers.database._db_consumer_id)
+    db_work.tk_root.after.assert_called_once_with(
+        handlers.database.DB_WORK_POLL,
+        handlers.database._db_consumer,
+        db_work.tk_root,
+    )
+
+    handlers.database._db_consumer(db_work.tk_root)
+
+    check.equal(on_done.call_count, 2)
+    check.equal(handlers.database._db_work_pending, 0)
+    check.equal(db_work.tk_root.config.call_args, call(cursor=""))
+
+
+@pytest.fixture(scope="function", autouse=True)
+def inline_db_work(monkeypatch):
+    """This fixture runs the database work of the handlers on the calling thread
+    and delivers the completed future immediately.
+
+    Args:
+        monkeypatch:
+    """
+
+    # noinspection PyUnusedLocal
+    def submit_db_work(work, on_done, **kwargs):
+        fut = Future()
+        try:
+            fut.set_result(work())
+        except Exception as exc:
+            fut.set_exception(exc)
+        on_done(fut)
+
+    monkeypatch.setattr(handlers.database, "_submit_db_work", submit_db_work)
+
+
+@pytest.fixture(scope="function")
+def db_work(monkeypatch):
+    """This fixture provides a threadpool and a mock Tk root for tests of the
+    database work dispatcher.
+
+    The drain method of the returned object waits for the submitted work and
+    runs the consumer once.
+    """
+    tk_root = MagicMock(name="tk_root")
+    monkeypatch.setattr(
+        handlers.database.config,
+        "current",
+        MagicMock(name="current", tk_root=tk_root),
+    )
+    monkeypatch.setattr(handlers.database, "_db_work_pending", 0)
+    monkeypatch.setattr(handlers.database, "_db_consumer_id", None)
+    monkeypatch.setattr(handlers.database, "_db_latest_work", {})
+    executor = ThreadPoolExecutor()
+    handlers.database.config.current.threadpool_executor = executor
+    write_executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(handlers.database, "_db_write_executor", write_executor)
+
+    def drain():
+        # Shutting down waits for the futures' done callbacks which queue the
+        # completions.
+        executor.shutdown()
+        write_executor.shutdown()
+        handlers.database._db_consumer(tk_root)
+
+    yield MagicMock(name="db_work", tk_root=tk_root, drain=drain)
+    executor.shutdown()
+    write_executor.shutdown()
+
+
 @pytest.fixture(scope="function")
 def config_current(monkeypatch):
     """This fixture patches a call to current.tk_root to suppress initiation of tk/tcl.
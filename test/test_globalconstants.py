@@ -13,6 +13,8 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+from itertools import islice
+
 from pytest_check import check
 
 from globalconstants import MovieInteger
@@ -44,6 +46,26 @@ class TestMovieInteger:
         with check.raises(ValueError):
             MovieInteger("2022-2024-2026")
 
+    def test_ranges(self):
+        mint = MovieInteger("2025-2027, 2020-2022, 2021, 2029, 2023, 2031-2030")
+        check.equal(mint.ranges, [(2020, 2023), (2025, 2027), (2029, 2031)])
+        check.equal(MovieInteger(42).ranges, [(42, 42)])
+
+    def test_range_limits_are_compared_as_integers(self):
+        mint = MovieInteger("80-190")
+        check.equal(mint.ranges, [(80, 190)])
+        check.equal(len(mint), 111)
+
+    def test_wide_range(self):
+        mint = MovieInteger("1-1000000, 2000000")
+        check.equal(len(mint), 1000001)
+        check.is_true(1 in mint)
+        check.is_true(999999 in mint)
+        check.is_true(2000000 in mint)
+        check.is_false(1000001 in mint)
+        check.is_false(0 in mint)
+        check.equal(list(islice(mint, 3)), [1, 2, 3])
+
     def test_bad_range(self):
         with check.raises(ValueError):
             MovieInteger("2020-garbage")
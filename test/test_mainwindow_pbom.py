@@ -140,7 +140,7 @@ class TestMainWindow:
                 )
 
             # Movie menu
-            check.equal(cut.movie_menu.add_command.call_count, 7)
+            check.equal(cut.movie_menu.add_command.call_count, 8)
             with check:
                 cut.movie_menu.assert_has_calls(
                     [
@@ -173,6 +173,11 @@ class TestMainWindow:
                             label="Delete Tag…",
                             command=mainwindow.handlers.database.gui_search_tag,
                         ),
+                        call.add_separator(),
+                        call.add_command(
+                            label="Export Movies…",
+                            command=mainwindow.handlers.database.gui_export_movies,
+                        ),
                     ]
                 )
 
@@ -17,10 +17,11 @@ import io
 from contextlib import contextmanager
 from functools import partial
 from typing import Tuple
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, call
 
 import pytest
 from pytest_check import check
+from sqlalchemy import create_engine
 
 import config
 import moviedb
@@ -189,10 +190,16 @@ class TestLoadConfigFile:
 
 
 def test_close_down(monkeypatch):
-    delete_all_orphans = MagicMock(name="delete_all_orphans")
+    calls = MagicMock(name="calls")
+    monkeypatch.setattr(
+        moviedb.handlers.database, "shutdown_db_writes", calls.shutdown_db_writes
+    )
+    delete_all_orphans = calls.delete_all_orphans
     monkeypatch.setattr(
         moviedb.database.tables, "delete_all_orphans", delete_all_orphans
     )
+    log_stats = MagicMock(name="log_stats")
+    monkeypatch.setattr(moviedb.database.tables, "log_stats", log_stats)
     save_config_file = MagicMock(name="save_config_file")
     monkeypatch.setattr(moviedb, "save_config_file", save_config_file)
     logging = MagicMock(name="logging")
@@ -202,6 +209,13 @@ def test_close_down(monkeypatch):
 
     with check:
         delete_all_orphans.assert_called_once_with()
+    check.equal(
+        calls.mock_calls[:2],
+        [call.shutdown_db_writes(), call.delete_all_orphans()],
+        msg="The writes must finish before the orphans are deleted.",
+    )
+    with check:
+        log_stats.assert_called_once_with()
     with check:
         save_config_file.assert_called_once_with()
     with check:
@@ -210,6 +224,74 @@ def test_close_down(monkeypatch):
         logging.shutdown.assert_called_once_with()
 
 
+def test_start_engine_and_close_down_with_readonly_profile(monkeypatch, tmp_path):
+    environment = moviedb.database.environment
+    tables = moviedb.database.tables
+    database_dir = tmp_path / (environment.DATABASE_STEM + environment.schema.VERSION)
+    database_dir.mkdir()
+    database_fn = database_dir / (
+        environment.DATABASE_STEM + environment.schema.VERSION + ".sqlite3"
+    )
+    engine = create_engine(f"sqlite+pysqlite:///{database_fn}")
+    environment.schema.Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        # An orphan which the close down would delete from a writable database.
+        connection.exec_driver_sql(
+            "INSERT INTO person (name, created, updated) VALUES ('Orphan', 0, 0)"
+        )
+    engine.dispose()
+    environment._getcreate_metadata(tmp_path)
+    monkeypatch.setattr(
+        environment, "_getcreate_directories", lambda *args: (tmp_path, database_dir)
+    )
+    persistent = config.PersistentConfig("Test", "Test.0.dev")
+    persistent.sqlite_profile = environment.READONLY_SQLITE_PROFILE
+    persistent.backup_on_start = False
+    monkeypatch.setattr(config, "persistent", persistent)
+    monkeypatch.setattr(environment.logging, "info", lambda *args: None)
+    save_config_file = MagicMock(name="save_config_file")
+    monkeypatch.setattr(moviedb, "save_config_file", save_config_file)
+    monkeypatch.setattr(moviedb, "logging", MagicMock(name="logging"))
+    monkeypatch.setattr(moviedb.handlers.database, "shutdown_db_writes", lambda: None)
+    hold_session_factory = tables.session_factory
+    hold_async_session_factory = moviedb.database.atables.session_factory
+
+    try:
+        environment.start_engine()
+        movie_bags = tables.select_all_movies()
+        moviedb.close_down()
+    finally:
+        tables.session_factory.kw["bind"].dispose()
+        tables.session_factory = hold_session_factory
+        moviedb.database.atables.session_factory = hold_async_session_factory
+
+    check.equal(movie_bags, [])
+    with check:
+        save_config_file.assert_called_once_with()
+    with engine.connect() as connection:
+        people = connection.exec_driver_sql("SELECT name FROM person").scalars()
+        check.equal(list(people), ["Orphan"])
+    engine.dispose()
+
+
+def test_start_engine_with_readonly_profile_needs_a_database(monkeypatch, tmp_path):
+    environment = moviedb.database.environment
+    monkeypatch.setattr(
+        environment, "_getcreate_directories", lambda *args: (tmp_path, tmp_path)
+    )
+    persistent = config.PersistentConfig("Test", "Test.0.dev")
+    persistent.sqlite_profile = environment.READONLY_SQLITE_PROFILE
+    monkeypatch.setattr(config, "persistent", persistent)
+    monkeypatch.setattr(environment.logging, "error", lambda *args: None)
+
+    with pytest.raises(
+        environment.ReadonlyProfileError, match=environment.READONLY_NO_DATABASE_MSG
+    ):
+        environment.start_engine()
+
+    check.equal(list(tmp_path.iterdir()), [])
+
+
 def test_save_config_file(monkeypatch):
     persistent = moviedb.config.PersistentConfig(
         program_name="test_program", program_version="42"